@@ -92,6 +92,8 @@ def build_faiss_index(config: Config, embeddings_count: int) -> None:
             m=config.m_pq,
             nbits=config.nbits_pq,
             use_gpu=use_gpu,
+            quant=config.index_quantization,
+            fastscan=config.pq_fastscan,
         )
     index.save()
 
@@ -86,7 +86,9 @@ def build_index(ctx, force):
             nlist=config.nlist,
             m=config.m_pq,
             nbits=config.nbits_pq,
-            use_gpu=config.device == "cuda"
+            use_gpu=config.device == "cuda",
+            quant=config.index_quantization,
+            fastscan=config.pq_fastscan
         )
 
     click.echo("Saving index...")
@@ -212,7 +214,9 @@ def run_pipeline(ctx, image_dir, resume):
             nlist=config.nlist,
             m=config.m_pq,
             nbits=config.nbits_pq,
-            use_gpu=config.device == "cuda"
+            use_gpu=config.device == "cuda",
+            quant=config.index_quantization,
+            fastscan=config.pq_fastscan
         )
     faiss_index.save()
 
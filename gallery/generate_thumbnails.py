@@ -23,6 +23,7 @@ import time
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from gallery.gallery_db import GalleryDB, path_to_thumbnail_name
+from src.image_processor import image_size
 
 # Configuration
 INPUT_FILE = Path(__file__).parent.parent / "village_landscape_FULL.txt"
@@ -103,9 +104,12 @@ def generate_thumbnail(original_path: str, thumbnail_dir: Path) -> dict:
 
         # Skip if thumbnail already exists
         if thumb_path.exists():
-            # Get existing thumbnail info
-            with Image.open(thumb_path) as img:
-                result['width'], result['height'] = img.size
+            # Get existing thumbnail info (header-only size read)
+            size = image_size(thumb_path)
+            if size is None:
+                result['error'] = "Unreadable thumbnail"
+                return result
+            result['width'], result['height'] = size
             result['file_size'] = thumb_path.stat().st_size
             result['thumbnail_path'] = thumb_name
             result['success'] = True
@@ -53,59 +53,68 @@ class DashboardHandler(http.server.SimpleHTTPRequestHandler):
             cur.execute('SELECT COUNT(*) FROM images WHERE perceptual_hash IS NOT NULL')
             with_phash = cur.fetchone()[0]
             
-            # SHA-256 duplicates
+            # Duplicate groups: O(1) from the trigger-maintained summary when present
             try:
-                cur.execute('''
-                    SELECT COUNT(*) FROM (
-                        SELECT sha256_hash 
-                        FROM images 
-                        WHERE sha256_hash IS NOT NULL
-                        GROUP BY sha256_hash 
-                        HAVING COUNT(*) > 1
-                    )
-                ''')
-                sha256_dup_groups = cur.fetchone()[0]
+                cur.execute('SELECT key, value FROM stats_summary')
+                summary = dict(cur.fetchall())
+                sha256_dup_groups = summary['sha256_dup_groups']
+                sha256_duplicates = summary['sha256_rows'] - summary['sha256_distinct']
+                phash_dup_groups = summary['phash_dup_groups']
+                phash_duplicates = summary['phash_rows'] - summary['phash_distinct']
+            except (sqlite3.OperationalError, KeyError):
+                # SHA-256 duplicates
+                try:
+                    cur.execute('''
+                        SELECT COUNT(*) FROM (
+                            SELECT sha256_hash 
+                            FROM images 
+                            WHERE sha256_hash IS NOT NULL
+                            GROUP BY sha256_hash 
+                            HAVING COUNT(*) > 1
+                        )
+                    ''')
+                    sha256_dup_groups = cur.fetchone()[0]
                 
-                cur.execute('''
-                    SELECT SUM(cnt - 1) FROM (
-                        SELECT COUNT(*) as cnt
-                        FROM images 
-                        WHERE sha256_hash IS NOT NULL
-                        GROUP BY sha256_hash 
-                        HAVING COUNT(*) > 1
-                    )
-                ''')
-                sha256_duplicates = cur.fetchone()[0] or 0
-            except:
-                sha256_dup_groups = 0
-                sha256_duplicates = 0
+                    cur.execute('''
+                        SELECT SUM(cnt - 1) FROM (
+                            SELECT COUNT(*) as cnt
+                            FROM images 
+                            WHERE sha256_hash IS NOT NULL
+                            GROUP BY sha256_hash 
+                            HAVING COUNT(*) > 1
+                        )
+                    ''')
+                    sha256_duplicates = cur.fetchone()[0] or 0
+                except:
+                    sha256_dup_groups = 0
+                    sha256_duplicates = 0
             
-            # Perceptual duplicates
-            try:
-                cur.execute('''
-                    SELECT COUNT(*) FROM (
-                        SELECT perceptual_hash 
-                        FROM images 
-                        WHERE perceptual_hash IS NOT NULL
-                        GROUP BY perceptual_hash 
-                        HAVING COUNT(*) > 1
-                    )
-                ''')
-                phash_dup_groups = cur.fetchone()[0]
+                # Perceptual duplicates
+                try:
+                    cur.execute('''
+                        SELECT COUNT(*) FROM (
+                            SELECT perceptual_hash 
+                            FROM images 
+                            WHERE perceptual_hash IS NOT NULL
+                            GROUP BY perceptual_hash 
+                            HAVING COUNT(*) > 1
+                        )
+                    ''')
+                    phash_dup_groups = cur.fetchone()[0]
                 
-                cur.execute('''
-                    SELECT SUM(cnt - 1) FROM (
-                        SELECT COUNT(*) as cnt
-                        FROM images 
-                        WHERE perceptual_hash IS NOT NULL
-                        GROUP BY perceptual_hash 
-                        HAVING COUNT(*) > 1
-                    )
-                ''')
-                phash_duplicates = cur.fetchone()[0] or 0
-            except:
-                phash_dup_groups = 0
-                phash_duplicates = 0
+                    cur.execute('''
+                        SELECT SUM(cnt - 1) FROM (
+                            SELECT COUNT(*) as cnt
+                            FROM images 
+                            WHERE perceptual_hash IS NOT NULL
+                            GROUP BY perceptual_hash 
+                            HAVING COUNT(*) > 1
+                        )
+                    ''')
+                    phash_duplicates = cur.fetchone()[0] or 0
+                except:
+                    phash_dup_groups = 0
+                    phash_duplicates = 0
             
             # Recent images (last 5)
             cur.execute('''
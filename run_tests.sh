@@ -31,3 +31,6 @@ echo ""
 echo "To run only integration tests:"
 echo "  pytest tests/ -m integration"
 echo ""
+echo "To run tests in parallel (pytest-xdist):"
+echo "  ./run_tests.sh -n auto"
+echo ""
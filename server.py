@@ -2,7 +2,7 @@
 """FastAPI HTTP server for semantic image search."""
 
 from fastapi import FastAPI, File, UploadFile, Query, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from pathlib import Path
@@ -21,6 +21,11 @@ from src.pipeline import IndexingPipeline
 from src.faiss_index import FAISSIndex
 from src.embeddings import EmbeddingCache
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # orjson not installed, fall back to stdlib json responses
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -34,7 +39,9 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Local Semantic Image Search API",
     description="Privacy-preserving local image search using CLIP embeddings and FAISS",
-    version="0.1.0"
+    version="0.1.0",
+    # orjson encodes large result lists several times faster than stdlib json
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
 # Global search engine (initialized on startup)
@@ -62,6 +69,17 @@ class SearchResponse(BaseModel):
     results: List[dict]
 
 
+class BatchTextSearchRequest(BaseModel):
+    """Request model for batched text search."""
+    queries: List[str]
+    top_k: int = 20
+
+
+class BatchSearchResponse(BaseModel):
+    """Response model for batched text search (one entry per query, in order)."""
+    searches: List[SearchResponse]
+
+
 class StatsResponse(BaseModel):
     """Response model for stats."""
     total_images: int
@@ -108,6 +126,7 @@ async def root():
         "version": "0.1.0",
         "endpoints": {
             "search_text": "/search/text?q=<query>&top_k=<n>",
+            "search_text_batch": "/search/text/batch (POST with {queries, top_k})",
             "search_image": "/search/image (POST with image file)",
             "stats": "/stats",
             "health": "/health"
@@ -130,8 +149,8 @@ async def health():
 
 
 @app.get("/stats", response_model=StatsResponse)
-async def get_stats():
-    """Get indexing statistics."""
+def get_stats():
+    """Get indexing statistics (sync route: the COUNT scans run in the threadpool)."""
     global search_engine, config
 
     logger.info("GET /stats - Fetching statistics...")
@@ -194,6 +213,39 @@ async def search_by_text(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/search/text/batch", response_model=BatchSearchResponse)
+def search_by_text_batch(request: BatchTextSearchRequest):
+    """Search several text queries with one encoder call and one index search."""
+    global search_engine
+
+    logger.info(f"POST /search/text/batch - {len(request.queries)} queries, top_k={request.top_k}")
+    if search_engine is None:
+        logger.error("Batch text search failed: Search engine not initialized")
+        raise HTTPException(status_code=503, detail="Search engine not initialized")
+    if not 1 <= request.top_k <= 100:
+        raise HTTPException(status_code=422, detail="top_k must be between 1 and 100")
+
+    try:
+        all_results = search_engine.search_by_texts(request.queries, top_k=request.top_k)
+
+        searches = []
+        for query, results in zip(request.queries, all_results):
+            results_dict = [r.to_dict() for r in results]
+            for result in results_dict:
+                result['folders'] = extract_folder_tags(result.get('file_path', ''))
+            searches.append(SearchResponse(
+                query=query,
+                num_results=len(results),
+                results=results_dict
+            ))
+
+        logger.info(f"✓ Batch text search complete: {len(searches)} queries")
+        return BatchSearchResponse(searches=searches)
+    except Exception as e:
+        logger.error(f"✗ Batch text search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/search/image", response_model=SearchResponse)
 async def search_by_image(
     file: UploadFile = File(..., description="Query image"),
@@ -1076,7 +1128,9 @@ def run_indexing(folder_path: str):
                 nlist=config.nlist,
                 m=config.m_pq,
                 nbits=config.nbits_pq,
-                use_gpu=config.device == "cuda"
+                use_gpu=config.device == "cuda",
+                quant=config.index_quantization,
+                fastscan=config.pq_fastscan
             )
         faiss_index.save()
 
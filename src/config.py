@@ -21,6 +21,7 @@ class Config(BaseModel):
     db_path: Path = Field(default=Path("data/metadata.db"), description="SQLite database path")
     index_path: Path = Field(default=Path("data/faiss.index"), description="FAISS index path")
     embeddings_path: Path = Field(default=Path("data/embeddings.npy"), description="Full embeddings cache")
+    embedding_dtype: str = Field(default="float32", description="Embeddings cache dtype: 'float32' or 'float16' (half size)")
     thumbnails_dir: Path = Field(default=Path("data/thumbnails"), description="Thumbnails directory")
 
     # Model settings
@@ -28,9 +29,16 @@ class Config(BaseModel):
     pretrained: str = Field(default="openai", description="Pretrained weights")
     device: str = Field(default="cuda" if os.environ.get("CUDA_VISIBLE_DEVICES") else "cpu", description="Device (cuda/cpu)")
     batch_size: int = Field(default=32, description="Batch size for embedding generation")
+    compile_model: bool = Field(default=True, description="torch.compile the image encoder when running on CUDA")
 
     # Image processing
     thumbnail_size: tuple[int, int] = Field(default=(384, 384), description="Thumbnail size")
+    scan_thumbnails: bool = Field(default=True, description="Generate thumbnails in the scan worker processes")
+    thumbnail_postprocess_cmd: Optional[list[str]] = Field(
+        default=None,
+        description="Command run once after a scan with the new thumbnail paths appended "
+                    "(e.g. ['jpegoptim', '--strip-all', '--quiet'])"
+    )
     image_extensions: list[str] = Field(
         default=[".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"],
         description="Supported image extensions"
@@ -42,6 +50,8 @@ class Config(BaseModel):
     m_pq: int = Field(default=64, description="Number of PQ sub-vectors")
     nbits_pq: int = Field(default=8, description="Bits per PQ code")
     nprobe: int = Field(default=32, description="Number of clusters to search")
+    index_quantization: str = Field(default="pq", description="IVF vector codec: 'pq' or 'sq8' (int8)")
+    pq_fastscan: bool = Field(default=True, description="Use SIMD IVF-PQ FastScan (4-bit codes) for 'pq'")
 
     # Search settings
     top_k_ivf: int = Field(default=1000, description="Retrieve from IVF-PQ")
@@ -49,6 +59,7 @@ class Config(BaseModel):
 
     # Processing
     num_workers: int = Field(default=4, description="Number of worker threads")
+    scan_workers: int = Field(default=16, description="Threads walking directories during scan")
     checkpoint_interval: int = Field(default=1000, description="Save progress every N images")
 
     # Duplicate detection
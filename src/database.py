@@ -2,16 +2,24 @@
 
 import sqlite3
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Union
 from datetime import datetime
 import json
 import time
 
+import numpy as np
+
 
 class ImageDatabase:
     """Manages SQLite database for image metadata."""
 
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Union[Path, str]):
+        """
+        Open (or create) the metadata database.
+
+        Args:
+            db_path: Database file, or ":memory:" for a private in-memory database
+        """
         self.db_path = db_path
         self.conn: Optional[sqlite3.Connection] = None
         self._init_db()
@@ -36,6 +44,10 @@ class ImageDatabase:
         # Optimize for concurrent access
         self.conn.execute("PRAGMA synchronous = NORMAL")  # Faster, still safe with WAL
 
+        # Keep temp tables/indices in RAM and read the DB file through mmap (256 MB)
+        self.conn.execute("PRAGMA temp_store = MEMORY")
+        self.conn.execute("PRAGMA mmap_size = 268435456")
+
         cursor = self.conn.cursor()
 
         # Main images table
@@ -179,6 +191,196 @@ class ImageDatabase:
 
         self.conn.commit()
 
+        self._init_stats_summary()
+
+    # Hash columns whose duplicate groups are tracked in hash_counts, by kind
+    _HASH_KINDS = (('sha256', 'sha256_hash'), ('phash', 'perceptual_hash'))
+
+    def _init_stats_summary(self):
+        """
+        Create trigger-maintained counters so stats reads are O(1).
+
+        stats_summary holds running totals (images, embedded, hashed, failed,
+        duplicate groups) and hash_counts holds rows per hash value; triggers
+        on images/failed_images keep both current. A partial index over
+        hash_counts rows with cnt > 1 lets duplicate listings read only the
+        duplicated hashes. Seeded once from the existing rows the first time
+        a database is opened.
+        """
+        cursor = self.conn.cursor()
+        exists = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_hash_counts_dups'"
+        if cursor.execute(exists).fetchone():
+            return
+
+        # Serialize with other processes opening the same database
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if cursor.execute(exists).fetchone():
+                self.conn.rollback()
+                return
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS stats_summary (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS hash_counts (
+                    kind TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    cnt INTEGER NOT NULL,
+                    PRIMARY KEY (kind, hash)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("DELETE FROM stats_summary")
+            cursor.execute("DELETE FROM hash_counts")
+
+            # Seed from current contents (before the triggers exist)
+            cursor.execute("""
+                INSERT INTO stats_summary (key, value)
+                SELECT 'total', COUNT(*) FROM images
+                UNION ALL SELECT 'with_embedding', COUNT(*) FROM images WHERE embedding_index IS NOT NULL
+                UNION ALL SELECT 'failed', COUNT(*) FROM failed_images
+            """)
+            for kind, column in self._HASH_KINDS:
+                cursor.execute(f"""
+                    INSERT INTO hash_counts (kind, hash, cnt)
+                    SELECT '{kind}', {column}, COUNT(*) FROM images
+                    WHERE {column} IS NOT NULL GROUP BY {column}
+                """)
+                cursor.execute(f"""
+                    INSERT INTO stats_summary (key, value)
+                    SELECT '{kind}_rows', COALESCE(SUM(cnt), 0) FROM hash_counts WHERE kind = '{kind}'
+                    UNION ALL SELECT '{kind}_distinct', COUNT(*) FROM hash_counts WHERE kind = '{kind}'
+                    UNION ALL SELECT '{kind}_dup_groups', COUNT(*) FROM hash_counts
+                              WHERE kind = '{kind}' AND cnt > 1
+                """)
+
+            def bump(key: str, delta: str, when: str = "1") -> str:
+                return f"UPDATE stats_summary SET value = value + ({delta}) WHERE key = '{key}' AND ({when});"
+
+            def add_hash(kind: str, value: str) -> str:
+                return f"""
+                    INSERT INTO hash_counts (kind, hash, cnt)
+                    SELECT '{kind}', {value}, 1 WHERE {value} IS NOT NULL
+                    ON CONFLICT (kind, hash) DO UPDATE SET cnt = cnt + 1;
+                """
+
+            def remove_hash(kind: str, value: str) -> str:
+                return f"""
+                    UPDATE hash_counts SET cnt = cnt - 1 WHERE kind = '{kind}' AND hash = {value};
+                    DELETE FROM hash_counts WHERE kind = '{kind}' AND hash = {value} AND cnt = 0;
+                """
+
+            insert_body = [bump('total', '1'), bump('with_embedding', '1', 'NEW.embedding_index IS NOT NULL')]
+            delete_body = [bump('total', '-1'), bump('with_embedding', '-1', 'OLD.embedding_index IS NOT NULL')]
+            for kind, column in self._HASH_KINDS:
+                insert_body.append(add_hash(kind, f'NEW.{column}'))
+                delete_body.append(remove_hash(kind, f'OLD.{column}'))
+
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_images_stats_{kind}
+                    AFTER UPDATE OF {column} ON images
+                    WHEN OLD.{column} IS NOT NEW.{column}
+                    BEGIN
+                        {remove_hash(kind, f'OLD.{column}')}
+                        {add_hash(kind, f'NEW.{column}')}
+                    END
+                """)
+
+                # Per-kind totals follow hash_counts itself
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_hash_counts_{kind}_insert
+                    AFTER INSERT ON hash_counts WHEN NEW.kind = '{kind}'
+                    BEGIN
+                        {bump(f'{kind}_rows', 'NEW.cnt')}
+                        {bump(f'{kind}_distinct', '1')}
+                        {bump(f'{kind}_dup_groups', '1', 'NEW.cnt > 1')}
+                    END
+                """)
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_hash_counts_{kind}_update
+                    AFTER UPDATE OF cnt ON hash_counts WHEN NEW.kind = '{kind}'
+                    BEGIN
+                        {bump(f'{kind}_rows', 'NEW.cnt - OLD.cnt')}
+                        {bump(f'{kind}_dup_groups', '(NEW.cnt > 1) - (OLD.cnt > 1)')}
+                    END
+                """)
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_hash_counts_{kind}_delete
+                    AFTER DELETE ON hash_counts WHEN OLD.kind = '{kind}'
+                    BEGIN
+                        {bump(f'{kind}_rows', '-OLD.cnt')}
+                        {bump(f'{kind}_distinct', '-1')}
+                        {bump(f'{kind}_dup_groups', '-1', 'OLD.cnt > 1')}
+                    END
+                """)
+
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_images_stats_embedding
+                AFTER UPDATE OF embedding_index ON images
+                WHEN (OLD.embedding_index IS NULL) != (NEW.embedding_index IS NULL)
+                BEGIN
+                    UPDATE stats_summary
+                    SET value = value + (NEW.embedding_index IS NOT NULL) - (OLD.embedding_index IS NOT NULL)
+                    WHERE key = 'with_embedding';
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_images_stats_delete
+                AFTER DELETE ON images
+                BEGIN
+                    {' '.join(delete_body)}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_failed_stats_insert
+                AFTER INSERT ON failed_images
+                BEGIN
+                    {bump('failed', '1')}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_failed_stats_delete
+                AFTER DELETE ON failed_images
+                BEGIN
+                    {bump('failed', '-1')}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_images_stats_insert
+                AFTER INSERT ON images
+                BEGIN
+                    {' '.join(insert_body)}
+                END
+            """)
+            # Created last: its presence marks the summary as complete
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_hash_counts_dups
+                ON hash_counts(kind, cnt) WHERE cnt > 1
+            """)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def get_stats_summary(self) -> Dict[str, int]:
+        """
+        Get trigger-maintained image statistics without scanning images.
+
+        Returns:
+            Dict with total, with_embedding, failed, and per hash kind
+            (sha256, phash): <kind>_rows, <kind>_dup_groups and <kind>_duplicates
+            (extra copies beyond the first of each hash)
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT key, value FROM stats_summary")
+        summary = {row[0]: row[1] for row in cursor.fetchall()}
+        for kind, _ in self._HASH_KINDS:
+            summary[f'{kind}_duplicates'] = summary[f'{kind}_rows'] - summary.pop(f'{kind}_distinct')
+        return summary
+
     def _commit_with_retry(self, max_retries=10, delay=1.0):
         """Commit with retry logic for database locks.
         
@@ -235,6 +437,67 @@ class ImageDatabase:
             self._commit_with_retry()
         return cursor.lastrowid
     
+    def add_images_bulk(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert many new image records in a single transaction.
+
+        Rows whose file_path is already registered are skipped (not updated).
+
+        Args:
+            rows: Dicts with file_path, file_name, file_size, width, height, format
+                  and optionally thumbnail_path, perceptual_hash, sha256_hash
+
+        Returns:
+            Number of rows inserted
+        """
+        if not rows:
+            return 0
+
+        now = datetime.utcnow().isoformat()
+        params = [
+            {
+                'thumbnail_path': None,
+                'perceptual_hash': None,
+                'sha256_hash': None,
+                **row,
+                'now': now,
+            }
+            for row in rows
+        ]
+
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+            INSERT OR IGNORE INTO images (
+                file_path, file_name, file_size, width, height, format,
+                thumbnail_path, perceptual_hash, sha256_hash, processed_at, updated_at
+            ) VALUES (
+                :file_path, :file_name, :file_size, :width, :height, :format,
+                :thumbnail_path, :perceptual_hash, :sha256_hash, :now, :now
+            )
+        """, params)
+        self._commit_with_retry()
+        return cursor.rowcount
+
+    def set_embedding_indices(self, pairs: List[Tuple[int, int]], auto_commit: bool = True):
+        """
+        Assign embedding indices to existing images in one statement batch.
+
+        Args:
+            pairs: (embedding_index, image_id) tuples
+            auto_commit: If True, commits immediately. If False, caller must commit manually.
+        """
+        if not pairs:
+            return
+
+        now = datetime.utcnow().isoformat()
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+            UPDATE images SET embedding_index = ?, processed_at = ?, updated_at = ?
+            WHERE id = ?
+        """, [(emb_idx, now, now, image_id) for emb_idx, image_id in pairs])
+        if auto_commit:
+            self._commit_with_retry()
+
     def commit(self):
         """Manually commit pending transactions."""
         self._commit_with_retry()
@@ -274,26 +537,43 @@ class ImageDatabase:
         cursor.execute(query)
         return [dict(row) for row in cursor.fetchall()]
 
-    def get_total_images(self) -> int:
-        """Get total number of images in database."""
+    def _get_summary_value(self, key: str) -> int:
+        """Read one trigger-maintained counter from stats_summary."""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM images")
+        cursor.execute("SELECT value FROM stats_summary WHERE key = ?", (key,))
         return cursor.fetchone()[0]
 
+    def get_total_images(self) -> int:
+        """Get total number of images in database (O(1), trigger-maintained)."""
+        return self._get_summary_value('total')
+
     def get_processed_count(self) -> int:
-        """Get count of processed images."""
+        """Get count of processed images (O(1), trigger-maintained)."""
+        return self._get_summary_value('with_embedding')
+
+    def get_next_embedding_index(self) -> int:
+        """Get the first embedding index past every assigned one (MAX + 1, via idx_embedding_index).
+
+        Differs from get_processed_count() when indices have gaps, e.g. after
+        parallel workers or deleted images.
+        """
         cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM images WHERE embedding_index IS NOT NULL")
+        cursor.execute("SELECT COALESCE(MAX(embedding_index), -1) + 1 FROM images")
         return cursor.fetchone()[0]
 
-    def add_failed_image(self, file_path: str, error_message: str):
-        """Log a failed image processing attempt."""
+    def add_failed_image(self, file_path: str, error_message: str, auto_commit: bool = True):
+        """Log a failed image processing attempt.
+
+        Args:
+            auto_commit: If True, commits immediately. If False, caller must commit manually.
+        """
         cursor = self.conn.cursor()
         cursor.execute("""
             INSERT INTO failed_images (file_path, error_message)
             VALUES (?, ?)
         """, (file_path, error_message))
-        self._commit_with_retry()
+        if auto_commit:
+            self._commit_with_retry()
 
     def update_processing_status(self, job_name: str, total_files: int = 0,
                                 processed_files: int = 0, failed_files: int = 0,
@@ -508,31 +788,30 @@ class ImageDatabase:
         Returns:
             List of (image_id, duplicate_of_id, hash_distance) tuples
         """
-        import imagehash
+        from .hash_distance import phashes_to_uint64, hamming_all
 
         cursor = self.conn.cursor()
         cursor.execute("""
             SELECT id, perceptual_hash, file_path
             FROM images
-            WHERE perceptual_hash IS NOT NULL
+            WHERE perceptual_hash IS NOT NULL AND perceptual_hash != ''
             ORDER BY id
         """)
 
         images = cursor.fetchall()
         duplicates = []
-
-        # Compare each image with every other image
-        for i, img1 in enumerate(images):
-            for img2 in images[i+1:]:
-                if img1['perceptual_hash'] and img2['perceptual_hash']:
-                    # Calculate hamming distance between hashes
-                    hash1 = imagehash.hex_to_hash(img1['perceptual_hash'])
-                    hash2 = imagehash.hex_to_hash(img2['perceptual_hash'])
-                    distance = hash1 - hash2
-
-                    if distance <= hash_threshold:
-                        # img2 is duplicate of img1 (img1 is older/lower id)
-                        duplicates.append((img2['id'], img1['id'], distance))
+        if not images:
+            return duplicates
+
+        ids = [img['id'] for img in images]
+        hashes = phashes_to_uint64(img['perceptual_hash'] for img in images)
+
+        # Compare each image with every later image (XOR + popcount on packed hashes)
+        for i in range(len(images) - 1):
+            distances = hamming_all(hashes[i], hashes[i + 1:])
+            for offset in np.flatnonzero(distances <= hash_threshold):
+                # Later image is duplicate of images[i] (older/lower id)
+                duplicates.append((ids[i + 1 + offset], ids[i], int(distances[offset])))
 
         return duplicates
 
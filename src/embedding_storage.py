@@ -16,16 +16,20 @@ def save_embeddings_incremental(
     embeddings_path: Path,
     new_embeddings: np.ndarray,
     embedding_indices: List[int],
-    lock_path: Optional[Path] = None
+    lock_path: Optional[Path] = None,
+    dtype: np.dtype = np.float32
 ) -> None:
     """
     Thread-safe incremental embedding save operation.
     
     This function:
-    1. Loads existing embeddings.npy (if exists)
-    2. Expands array to fit new indices if needed
-    3. Inserts new embeddings at their correct indices
-    4. Saves back to disk
+    1. Memory-maps existing embeddings.npy (if exists)
+    2. If the new indices fit, writes them into the file in place
+    3. Otherwise streams existing rows into a larger pre-sized memmap,
+       writes the new rows there and atomically replaces the file
+    
+    Only the new rows (plus a one-off copy when growing) are written, instead
+    of loading, copying and re-saving the whole array on every batch.
     
     Uses file locking to prevent conflicts between parallel workers.
     
@@ -34,6 +38,7 @@ def save_embeddings_incremental(
         new_embeddings: New embeddings to add (shape: [N, embedding_dim])
         embedding_indices: List of embedding_index values for each embedding
         lock_path: Optional path for lock file (defaults to embeddings_path + '.lock')
+        dtype: dtype for a newly created file (an existing file keeps its dtype)
     """
     if lock_path is None:
         lock_path = embeddings_path.with_suffix('.npy.lock')
@@ -43,47 +48,59 @@ def save_embeddings_incremental(
     
     try:
         with lock.acquire(timeout=300):  # Wait up to 5 minutes for lock
-            # Load existing embeddings if they exist
+            # Memory-map existing embeddings if they exist
             if embeddings_path.exists():
-                existing_embeddings = np.load(embeddings_path)
-                logger.debug(f"Loaded {len(existing_embeddings)} existing embeddings")
+                existing_embeddings = np.load(embeddings_path, mmap_mode='r+')
+                logger.debug(f"Mapped {len(existing_embeddings)} existing embeddings")
             else:
                 existing_embeddings = None
                 logger.info("No existing embeddings found, creating new file")
             
             # Determine required array size
-            max_idx = max(embedding_indices) if embedding_indices else -1
+            indices = np.asarray(embedding_indices, dtype=np.int64)
+            required_size = int(indices.max()) + 1 if len(indices) else 0
             embedding_dim = new_embeddings.shape[1] if len(new_embeddings) > 0 else None
+            tmp_path = None
             
             if existing_embeddings is not None:
                 embedding_dim = existing_embeddings.shape[1]
                 current_size = len(existing_embeddings)
-                required_size = max_idx + 1
                 
                 if required_size > current_size:
-                    # Need to expand array
+                    # Need to expand array: copy existing rows into a larger file
                     logger.info(f"Expanding embeddings array from {current_size} to {required_size}")
-                    full_embeddings = np.zeros((required_size, embedding_dim), dtype=existing_embeddings.dtype)
+                    tmp_path = embeddings_path.with_suffix('.tmp.npy')
+                    full_embeddings = np.lib.format.open_memmap(
+                        tmp_path, mode='w+', dtype=existing_embeddings.dtype,
+                        shape=(required_size, embedding_dim)
+                    )
                     full_embeddings[:current_size] = existing_embeddings
+                    del existing_embeddings
                 else:
-                    full_embeddings = existing_embeddings.copy()
+                    full_embeddings = existing_embeddings
             else:
                 # Create new array
                 if embedding_dim is None:
                     raise ValueError("Cannot create new embeddings file without embedding dimension")
-                required_size = max_idx + 1
                 logger.info(f"Creating new embeddings array with size {required_size}")
-                full_embeddings = np.zeros((required_size, embedding_dim), dtype=np.float32)
+                tmp_path = embeddings_path.with_suffix('.tmp.npy')
+                full_embeddings = np.lib.format.open_memmap(
+                    tmp_path, mode='w+', dtype=dtype,
+                    shape=(required_size, embedding_dim)
+                )
             
             # Insert new embeddings at their indices
-            for emb, idx in zip(new_embeddings, embedding_indices):
-                if not np.all(full_embeddings[idx] == 0):
-                    logger.warning(f"Overwriting existing embedding at index {idx} (possible duplicate)")
-                full_embeddings[idx] = emb
+            for idx in indices[np.any(full_embeddings[indices] != 0, axis=1)]:
+                logger.warning(f"Overwriting existing embedding at index {idx} (possible duplicate)")
+            full_embeddings[indices] = new_embeddings
             
-            # Save updated embeddings
-            np.save(embeddings_path, full_embeddings)
-            logger.info(f"💾 Saved {len(new_embeddings)} embeddings to {embeddings_path} (total: {len(full_embeddings)})")
+            # Flush updated embeddings (and publish the new file if one was built)
+            total = len(full_embeddings)
+            full_embeddings.flush()
+            del full_embeddings
+            if tmp_path is not None:
+                tmp_path.replace(embeddings_path)
+            logger.info(f"💾 Saved {len(new_embeddings)} embeddings to {embeddings_path} (total: {total})")
             
     except filelock.Timeout:
         logger.error(f"Timeout waiting for lock on {lock_path} - another worker may be saving")
@@ -4,19 +4,37 @@ import torch
 import open_clip
 from PIL import Image
 from pathlib import Path
-from typing import Union, List, Optional, TYPE_CHECKING
+from typing import Union, List, Optional, Sequence, TYPE_CHECKING
+import contextlib
+import io
 import numpy as np
 
 if TYPE_CHECKING:
     from .config import Config
 
 
+class StagedBatch:
+    """A preprocessed image batch whose copy to the GPU may still be in flight."""
+
+    __slots__ = ('tensor', 'ready')
+
+    def __init__(self, tensor: torch.Tensor, ready: Optional["torch.cuda.Event"] = None):
+        self.tensor = tensor
+        self.ready = ready
+
+    def __len__(self) -> int:
+        return self.tensor.shape[0]
+
+
 class EmbeddingModel:
     """Wrapper for OpenCLIP model for generating embeddings."""
 
     def __init__(self, model_name: str = "hf-hub:timm/ViT-SO400M-14-SigLIP-384",
                  pretrained: str = "webli",
-                 device: str = "cuda"):
+                 device: str = "cuda",
+                 compile: bool = False,
+                 compile_batch_size: Optional[int] = None,
+                 mixed_precision: bool = True):
         """
         Initialize the embedding model.
 
@@ -24,6 +42,12 @@ class EmbeddingModel:
             model_name: OpenCLIP model identifier
             pretrained: Pretrained weights identifier
             device: Device to run on ('cuda' or 'cpu')
+            compile: torch.compile the image encoder (CUDA only; falls back
+                     to eager mode if compilation fails)
+            compile_batch_size: Pad smaller image batches to this size so the
+                                compiled graph is reused instead of recompiled
+            mixed_precision: Run forward passes under FP16 autocast (CUDA only);
+                             outputs are normalized in FP32
         """
         self.device = device if torch.cuda.is_available() else "cpu"
 
@@ -51,49 +75,140 @@ class EmbeddingModel:
 
         print(f"Model loaded. Embedding dimension: {self.embedding_dim}")
 
-    @torch.no_grad()
-    def encode_images(self, images: List[Union[str, Path, Image.Image]],
+        self.mixed_precision = mixed_precision and self.device == "cuda"
+
+        # Side stream for host-to-device copies, so the next batch uploads
+        # while the current one is being encoded
+        self._copy_stream = torch.cuda.Stream() if self.device == "cuda" else None
+
+        # CUDA graphs ("reduce-overhead") need fixed input shapes, hence the padding
+        self._compiled_encode_image = None
+        self.compile_batch_size = compile_batch_size
+        if compile and self.device == "cuda" and hasattr(torch, "compile"):
+            try:
+                self._compiled_encode_image = torch.compile(
+                    self.model.encode_image, mode="reduce-overhead", fullgraph=False
+                )
+            except Exception as e:
+                print(f"torch.compile unavailable, using eager mode: {e}")
+
+    def _autocast(self):
+        """FP16 autocast context on CUDA, no-op otherwise."""
+        if self.mixed_precision:
+            return torch.autocast(device_type="cuda", dtype=torch.float16)
+        return contextlib.nullcontext()
+
+    def _encode_image_tensor(self, image_tensor: torch.Tensor) -> torch.Tensor:
+        """Run the image encoder, through the compiled graph when available."""
+        if self._compiled_encode_image is None:
+            return self.model.encode_image(image_tensor)
+
+        n = image_tensor.shape[0]
+        if self.compile_batch_size and n < self.compile_batch_size:
+            pad = image_tensor.new_zeros((self.compile_batch_size - n, *image_tensor.shape[1:]))
+            image_tensor = torch.cat([image_tensor, pad])
+        try:
+            # Clone: CUDA-graph outputs are overwritten by the next replay
+            return self._compiled_encode_image(image_tensor)[:n].clone()
+        except Exception as e:
+            # Compilation happens lazily on first call; fall back for good on failure
+            print(f"Compiled image encoder failed, using eager mode: {e}")
+            self._compiled_encode_image = None
+            return self.model.encode_image(image_tensor[:n])
+
+    def _stack_images(self, images: List[Union[str, Path, Image.Image, torch.Tensor]]) -> torch.Tensor:
+        """Preprocess images (unless already tensors) and stack them on the host."""
+        processed_images = []
+        for img in images:
+            if isinstance(img, torch.Tensor):
+                processed_images.append(img)  # Preprocessed by the caller
+                continue
+            if isinstance(img, (str, Path)):
+                img = Image.open(img).convert('RGB')
+            processed_images.append(self.preprocess(img))
+        return torch.stack(processed_images)
+
+    def stage_images(self, images: List[Union[str, Path, Image.Image, torch.Tensor]]
+                     ) -> Union[StagedBatch, List]:
+        """
+        Start uploading a batch to the GPU ahead of encode_images.
+
+        The copy runs on a side stream from pinned memory, so staging batch N+1
+        before encoding batch N overlaps the transfer with the forward pass.
+        On CPU the images are returned unchanged.
+
+        Args:
+            images: List of image paths, PIL Images, or preprocessed tensors
+
+        Returns:
+            StagedBatch to pass to encode_images (or the input list on CPU)
+        """
+        if self._copy_stream is None:
+            return images
+
+        host_tensor = self._stack_images(images).pin_memory()
+        with torch.cuda.stream(self._copy_stream):
+            tensor = host_tensor.to(self.device, non_blocking=True)
+            ready = torch.cuda.Event()
+            ready.record(self._copy_stream)
+        return StagedBatch(tensor, ready)
+
+    def _encode_batch(self, image_tensor: torch.Tensor, normalize: bool) -> np.ndarray:
+        """Encode a device tensor batch and return FP32 numpy embeddings."""
+        # Generate embeddings (FP16 forward on CUDA, FP32 from here on)
+        with self._autocast():
+            embeddings = self._encode_image_tensor(image_tensor)
+        embeddings = embeddings.float()
+
+        # Normalize if requested
+        if normalize:
+            embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+
+        return embeddings.cpu().numpy()
+
+    @torch.inference_mode()
+    def encode_images(self, images: Union[List[Union[str, Path, Image.Image]], StagedBatch],
                      batch_size: int = 32,
                      normalize: bool = True) -> np.ndarray:
         """
         Encode a batch of images to embeddings.
 
         Args:
-            images: List of image paths or PIL Images
+            images: List of image paths, PIL Images, or tensors already
+                    passed through self.preprocess; or a StagedBatch from
+                    stage_images (encoded as a single batch)
             batch_size: Batch size for processing
             normalize: Whether to normalize embeddings to unit length
 
         Returns:
             numpy array of shape (N, embedding_dim)
         """
+        if isinstance(images, StagedBatch):
+            image_tensor = images.tensor
+            if images.ready is not None:
+                # Wait for the upload, and keep the allocator from recycling
+                # the copy-stream buffer while the compute stream still reads it
+                compute_stream = torch.cuda.current_stream()
+                compute_stream.wait_event(images.ready)
+                image_tensor.record_stream(compute_stream)
+            return self._encode_batch(image_tensor, normalize)
+
         all_embeddings = []
 
         for i in range(0, len(images), batch_size):
-            batch = images[i:i + batch_size]
-
-            # Load and preprocess images
-            processed_images = []
-            for img in batch:
-                if isinstance(img, (str, Path)):
-                    img = Image.open(img).convert('RGB')
-                processed_images.append(self.preprocess(img))
-
-            # Stack into batch tensor
-            image_tensor = torch.stack(processed_images).to(self.device)
-
-            # Generate embeddings
-            embeddings = self.model.encode_image(image_tensor)
-
-            # Normalize if requested
-            if normalize:
-                embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+            # Stack into batch tensor (pinned host memory lets the GPU copy run async)
+            image_tensor = self._stack_images(images[i:i + batch_size])
+            if self.device == "cuda":
+                image_tensor = image_tensor.pin_memory().to(self.device, non_blocking=True)
+            else:
+                image_tensor = image_tensor.to(self.device)
 
-            all_embeddings.append(embeddings.cpu().numpy())
+            all_embeddings.append(self._encode_batch(image_tensor, normalize))
 
         # Concatenate all batches
         return np.vstack(all_embeddings)
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def encode_image(self, image: Union[str, Path, Image.Image],
                     normalize: bool = True) -> np.ndarray:
         """
@@ -109,14 +224,17 @@ class EmbeddingModel:
         embeddings = self.encode_images([image], batch_size=1, normalize=normalize)
         return embeddings[0]
 
-    @torch.no_grad()
-    def encode_text(self, texts: Union[str, List[str]],
+    @torch.inference_mode()
+    def encode_text(self, texts: Union[str, Sequence[str]],
                    normalize: bool = True) -> np.ndarray:
         """
         Encode text queries to embeddings.
 
+        A list of texts is tokenized in one call and encoded in one forward
+        pass, so batching queries costs about the same as a single one.
+
         Args:
-            texts: Single text or list of texts
+            texts: Single text or sequence of texts
             normalize: Whether to normalize embeddings to unit length
 
         Returns:
@@ -125,22 +243,26 @@ class EmbeddingModel:
         import logging
         logger = logging.getLogger(__name__)
         
-        logger.info(f"encode_text: Starting encoding for {len(texts) if isinstance(texts, list) else 1} text(s)")
-        
         if isinstance(texts, str):
             texts = [texts]
             single = True
         else:
+            # Materialize tuples/generators: one list, one tokenize call
+            texts = list(texts)
             single = False
 
+        logger.info(f"encode_text: Starting encoding for {len(texts)} text(s)")
+
         logger.info("encode_text: Tokenizing text...")
         # Tokenize
         text_tokens = self.tokenizer(texts).to(self.device)
         logger.info(f"encode_text: Tokenized, shape: {text_tokens.shape}")
 
         logger.info("encode_text: Generating embeddings with model...")
-        # Generate embeddings
-        embeddings = self.model.encode_text(text_tokens)
+        # Generate embeddings (FP16 forward on CUDA, FP32 from here on)
+        with self._autocast():
+            embeddings = self.model.encode_text(text_tokens)
+        embeddings = embeddings.float()
         logger.info(f"encode_text: Generated embeddings, shape: {embeddings.shape}")
 
         logger.info("encode_text: Normalizing embeddings...")
@@ -154,6 +276,16 @@ class EmbeddingModel:
 
         return embeddings[0] if single else embeddings
 
+    def warmup(self):
+        """
+        Run one text and one image forward pass.
+
+        The first call pays for CUDA context/kernel setup (and compilation when
+        enabled); servers call this at startup so the first query doesn't.
+        """
+        self.encode_text("warmup")
+        self.encode_images([Image.new('RGB', (64, 64), color='white')], batch_size=1)
+
     def get_embedding_dim(self) -> int:
         """Get the embedding dimension."""
         return self.embedding_dim
@@ -162,37 +294,122 @@ class EmbeddingModel:
 class EmbeddingCache:
     """Manages embedding storage and retrieval."""
 
-    def __init__(self, cache_path: Path):
+    def __init__(self, cache_path: Path, dtype: str = "float32"):
         """
         Initialize embedding cache.
 
         Args:
             cache_path: Path to save/load embeddings (.npy file)
+            dtype: dtype embeddings are stored as ('float32' or 'float16')
         """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unknown embedding dtype: {dtype} (expected 'float32' or 'float16')")
         self.cache_path = cache_path
-        self.embeddings: Optional[np.ndarray] = None
+        self.dtype = np.dtype(dtype)
+        self._embeddings: Optional[np.ndarray] = None
+        # Arrays appended since the last materialization (joined on access)
+        self._pending: List[np.ndarray] = []
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """All embeddings as one array; pending appends are joined here, once."""
+        if self._pending:
+            parts = self._pending if self._embeddings is None else [self._embeddings, *self._pending]
+            self._embeddings = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            self._pending = []
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, value: Optional[np.ndarray]):
+        self._embeddings = value
+        self._pending = []
 
     def save(self, embeddings: np.ndarray):
-        """Save embeddings to disk."""
+        """Save embeddings to disk in the cache dtype."""
+        embeddings = embeddings.astype(self.dtype, copy=False)
         np.save(self.cache_path, embeddings)
         self.embeddings = embeddings
         print(f"Saved {len(embeddings)} embeddings to {self.cache_path}")
 
-    def load(self) -> np.ndarray:
-        """Load embeddings from disk."""
+    def load(self, mmap_mode: Optional[str] = None) -> np.ndarray:
+        """
+        Load embeddings from disk.
+
+        Args:
+            mmap_mode: Passed to np.load; 'r' memory-maps the file read-only
+                       instead of reading it into RAM
+        """
         if self.cache_path.exists():
-            self.embeddings = np.load(self.cache_path)
+            self.embeddings = np.load(self.cache_path, mmap_mode=mmap_mode)
             print(f"Loaded {len(self.embeddings)} embeddings from {self.cache_path}")
             return self.embeddings
         else:
             raise FileNotFoundError(f"Embedding cache not found at {self.cache_path}")
 
+    def resize(self, rows: int, dim: int) -> np.memmap:
+        """
+        Grow or shrink the .npy file to `rows` rows and memory-map it read-write.
+
+        Existing rows are kept where they are: only the header's shape and the
+        file length change, so appending to a large cache copies nothing. New
+        rows read as zeros. Falls back to copying into a new file if the
+        header cannot be rewritten in place.
+
+        Args:
+            rows: Number of rows the file should hold
+            dim: Embedding dimension
+
+        Returns:
+            Read-write memmap of shape (rows, dim)
+        """
+        if not self.cache_path.exists():
+            return np.lib.format.open_memmap(self.cache_path, mode='w+', dtype=self.dtype, shape=(rows, dim))
+
+        with open(self.cache_path, 'r+b') as f:
+            version = np.lib.format.read_magic(f)
+            if version in ((1, 0), (2, 0)):
+                read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                               else np.lib.format.read_array_header_2_0)
+                write_header = (np.lib.format.write_array_header_1_0 if version == (1, 0)
+                                else np.lib.format.write_array_header_2_0)
+                shape, fortran_order, dtype = read_header(f)
+                offset = f.tell()
+
+                header = io.BytesIO()
+                write_header(header, {
+                    'descr': np.lib.format.dtype_to_descr(dtype),
+                    'fortran_order': False,
+                    'shape': (rows, dim),
+                })
+                # numpy pads headers so the row count can grow without moving the data
+                if not fortran_order and shape[1:] == (dim,) and len(header.getvalue()) == offset:
+                    f.seek(0)
+                    f.write(header.getvalue())
+                    f.truncate(offset + rows * dim * dtype.itemsize)
+                    return np.memmap(self.cache_path, dtype=dtype, mode='r+', offset=offset, shape=(rows, dim))
+
+        # Header can't be patched in place: copy into a resized file
+        existing = np.load(self.cache_path, mmap_mode='r')
+        tmp_path = self.cache_path.with_suffix('.tmp.npy')
+        resized = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=existing.dtype, shape=(rows, dim))
+        keep = min(rows, len(existing))
+        resized[:keep] = existing[:keep]
+        resized.flush()
+        del resized, existing
+        tmp_path.replace(self.cache_path)
+        return np.load(self.cache_path, mmap_mode='r+')
+
     def add_embeddings(self, new_embeddings: np.ndarray):
-        """Add new embeddings to the cache."""
-        if self.embeddings is None:
-            self.embeddings = new_embeddings
-        else:
-            self.embeddings = np.vstack([self.embeddings, new_embeddings])
+        """
+        Add new embeddings to the cache.
+
+        Appends are queued and concatenated in a single copy the next time
+        `embeddings` is read, so repeated small adds are amortized O(1)
+        instead of re-copying the whole cache each time. That copy
+        materializes a cache loaded with mmap_mode='r' in RAM; use resize()
+        to grow the file in place instead.
+        """
+        self._pending.append(np.atleast_2d(new_embeddings))
 
     def get_embeddings(self, indices: List[int]) -> np.ndarray:
         """Get embeddings by indices."""
@@ -202,7 +419,8 @@ class EmbeddingCache:
 
     def __len__(self) -> int:
         """Get number of embeddings in cache."""
-        return len(self.embeddings) if self.embeddings is not None else 0
+        base = len(self._embeddings) if self._embeddings is not None else 0
+        return base + sum(len(chunk) for chunk in self._pending)
 
 
 def create_embedding_model(config: 'Config') -> Union['EmbeddingModel', 'GeminiEmbeddingModel']:
@@ -3,7 +3,45 @@
 import faiss
 import numpy as np
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional, Union
+
+try:
+    import numba
+except ImportError:
+    numba = None  # numba not installed, re-rank with NumPy/BLAS only
+
+# Training vectors per IVF centroid (FAISS warns below 39, gains nothing above 256)
+TRAIN_SAMPLES_PER_CENTROID = 256
+
+# Scratch memory reserved on the GPU for search/training (2 GB)
+GPU_TEMP_MEMORY = 2 * 1024 * 1024 * 1024
+
+
+# Largest candidate count re-ranked by the fused numba kernel; above this the
+# gather + BLAS matvec path amortizes its temporaries and wins
+RERANK_NUMBA_MAX = 256
+
+
+def _as_float32(array: np.ndarray) -> np.ndarray:
+    """Return a C-contiguous FP32 array, copying only if the input isn't one already."""
+    if array.dtype != np.float32 or not array.flags['C_CONTIGUOUS']:
+        array = np.ascontiguousarray(array, dtype=np.float32)
+    return array
+
+
+if numba is not None:
+    @numba.njit(cache=True, fastmath=True)
+    def _rerank_numba(embeddings, query, candidates, k):
+        """Dot products straight from the candidate rows (no gathered copy), then top-k."""
+        scores = np.empty(candidates.shape[0], dtype=np.float32)
+        for i in range(candidates.shape[0]):
+            row = candidates[i]
+            s = np.float32(0.0)
+            for j in range(query.shape[0]):
+                s += embeddings[row, j] * query[j]
+            scores[i] = s
+        order = np.argsort(-scores)[:k]
+        return scores[order], candidates[order]
 
 
 class FAISSIndex:
@@ -21,12 +59,33 @@ class FAISSIndex:
         self.index_path = index_path
         self.index: Optional[faiss.Index] = None
         self.is_trained = False
+        self.on_gpu = False
+        self._is_ivf = False
+        self._gpu_res = None
+
+    def _get_gpu_resources(self):
+        """Create GPU resources once and reuse them across builds and searches."""
+        if self._gpu_res is None:
+            self._gpu_res = faiss.StandardGpuResources()
+            self._gpu_res.setTempMemory(GPU_TEMP_MEMORY)
+        return self._gpu_res
+
+    def _to_gpu(self, index: faiss.Index) -> faiss.Index:
+        """Clone an index to GPU 0 with FP16 lookup tables and precomputed PQ tables."""
+        co = faiss.GpuClonerOptions()
+        co.useFloat16 = True
+        co.usePrecomputed = True
+        return faiss.index_cpu_to_gpu(self._get_gpu_resources(), 0, index, co)
 
     def build_ivf_pq_index(self, embeddings: np.ndarray,
                           nlist: int = 4096,
                           m: int = 64,
                           nbits: int = 8,
-                          use_gpu: bool = False) -> None:
+                          use_gpu: bool = False,
+                          quant: str = "pq",
+                          keep_on_gpu: bool = False,
+                          fastscan: bool = True,
+                          bbs: int = 32) -> None:
         """
         Build IVF-PQ index for memory-efficient search.
 
@@ -36,71 +95,119 @@ class FAISSIndex:
             m: Number of PQ sub-vectors
             nbits: Bits per PQ code
             use_gpu: Whether to use GPU for training (if available)
+            quant: Vector codec - "pq" (product quantization) or
+                   "sq8" (int8 scalar quantization, higher recall, 4x compression)
+            keep_on_gpu: Leave the built index on the GPU for searching
+            fastscan: Use IndexIVFPQFastScan (SIMD 4-bit PQ codes, 3-5x faster
+                      search); forces nbits=4, consider raising m to compensate
+            bbs: FastScan block size (multiple of 32)
         """
         n, d = embeddings.shape
         assert d == self.embedding_dim, f"Embedding dim mismatch: {d} vs {self.embedding_dim}"
+        if quant not in ("pq", "sq8"):
+            raise ValueError(f"Unknown quantization: {quant} (expected 'pq' or 'sq8')")
 
-        print(f"Building IVF-PQ index with nlist={nlist}, m={m}, nbits={nbits}")
-        print(f"Training on {n} vectors...")
+        # k-means only needs ~256 samples per centroid, so train on a random
+        # subset instead of the full matrix
+        train_size = min(n, TRAIN_SAMPLES_PER_CENTROID * nlist)
+
+        print(f"Building IVF-{quant.upper()} index with nlist={nlist}, m={m}, nbits={nbits}")
+        print(f"Training on {train_size} of {n} vectors...")
 
         # Create quantizer (IVF)
         quantizer = faiss.IndexFlatIP(d)  # Inner product (cosine sim for normalized vectors)
 
-        # Create IVF-PQ index
-        self.index = faiss.IndexIVFPQ(quantizer, d, nlist, m, nbits)
+        if quant == "sq8":
+            # Create IVF-SQ8 index (int8 codes, inner product metric)
+            self.index = faiss.IndexIVFScalarQuantizer(
+                quantizer, d, nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+        elif fastscan:
+            # Create IVF-PQ FastScan index (4-bit codes scanned with SIMD lookups)
+            if nbits != 4:
+                print(f"FastScan uses 4-bit PQ codes (ignoring nbits={nbits})")
+            self.index = faiss.IndexIVFPQFastScan(
+                quantizer, d, nlist, m, 4, faiss.METRIC_INNER_PRODUCT, bbs
+            )
+        else:
+            # Create IVF-PQ index
+            self.index = faiss.IndexIVFPQ(quantizer, d, nlist, m, nbits)
 
         # Convert to GPU if requested and available
-        if use_gpu and faiss.get_num_gpus() > 0:
+        gpu = use_gpu and faiss.get_num_gpus() > 0
+        if gpu:
             print("Using GPU for training...")
-            res = faiss.StandardGpuResources()
-            self.index = faiss.index_cpu_to_gpu(res, 0, self.index)
+            self.index = self._to_gpu(self.index)
 
         # Ensure float32
-        embeddings = embeddings.astype(np.float32)
+        embeddings = _as_float32(embeddings)
 
         # Train the index
         print("Training index...")
-        self.index.train(embeddings)
+        if train_size < n:
+            sample = np.random.default_rng(0).choice(n, train_size, replace=False)
+            sample.sort()
+            self.index.train(embeddings[sample])
+        else:
+            self.index.train(embeddings)
         self.is_trained = True
 
         # Add vectors
         print("Adding vectors to index...")
         self.index.add(embeddings)
 
-        # Convert back to CPU if using GPU
-        if use_gpu and faiss.get_num_gpus() > 0:
+        # Convert back to CPU unless the index should stay on the GPU
+        if gpu and not keep_on_gpu:
             self.index = faiss.index_gpu_to_cpu(self.index)
+        self.on_gpu = gpu and keep_on_gpu
+        self._is_ivf = True
 
         print(f"Index built with {self.index.ntotal} vectors")
 
-    def build_flat_index(self, embeddings: np.ndarray, use_gpu: bool = False) -> None:
+    def build_flat_index(self, embeddings: np.ndarray, use_gpu: bool = False,
+                         keep_on_gpu: bool = False, quant: str = "flat") -> None:
         """
         Build flat (exact) index for smaller datasets.
 
         Args:
             embeddings: Embeddings to index (N, embedding_dim)
             use_gpu: Whether to use GPU
+            keep_on_gpu: Leave the built index on the GPU for searching
+            quant: Vector storage - "flat" (float32) or "sq8" (int8 scalar
+                   quantization, 4x smaller, brute-force scan on CPU)
         """
         n, d = embeddings.shape
         assert d == self.embedding_dim, f"Embedding dim mismatch: {d} vs {self.embedding_dim}"
-
-        print(f"Building flat index for {n} vectors...")
-
-        # Create flat index with inner product (cosine similarity for normalized vectors)
-        self.index = faiss.IndexFlatIP(d)
-
-        # Convert to GPU if requested
-        if use_gpu and faiss.get_num_gpus() > 0:
-            res = faiss.StandardGpuResources()
-            self.index = faiss.index_cpu_to_gpu(res, 0, self.index)
+        if quant not in ("flat", "sq8"):
+            raise ValueError(f"Unknown quantization: {quant} (expected 'flat' or 'sq8')")
+
+        print(f"Building {'SQ8' if quant == 'sq8' else 'flat'} index for {n} vectors...")
+        embeddings = _as_float32(embeddings)
+
+        if quant == "sq8":
+            # int8 codes with per-dimension ranges trained on the data (inner product)
+            self.index = faiss.IndexScalarQuantizer(
+                d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+            self.index.train(embeddings)
+            gpu = False  # No GPU flat scalar-quantizer index
+        else:
+            # Create flat index with inner product (cosine similarity for normalized vectors)
+            self.index = faiss.IndexFlatIP(d)
+
+            # Convert to GPU if requested
+            gpu = use_gpu and faiss.get_num_gpus() > 0
+            if gpu:
+                self.index = self._to_gpu(self.index)
 
         # Add vectors
-        embeddings = embeddings.astype(np.float32)
         self.index.add(embeddings)
 
-        # Convert back to CPU
-        if use_gpu and faiss.get_num_gpus() > 0:
+        # Convert back to CPU unless the index should stay on the GPU
+        if gpu and not keep_on_gpu:
             self.index = faiss.index_gpu_to_cpu(self.index)
+        self.on_gpu = gpu and keep_on_gpu
+        self._is_ivf = False
 
         self.is_trained = True
         print(f"Flat index built with {self.index.ntotal} vectors")
@@ -125,17 +232,51 @@ class FAISSIndex:
         if query_embeddings.ndim == 1:
             query_embeddings = query_embeddings.reshape(1, -1)
 
-        query_embeddings = query_embeddings.astype(np.float32)
+        query_embeddings = _as_float32(query_embeddings)
 
-        # Set nprobe for IVF indices
-        if isinstance(self.index, faiss.IndexIVFPQ) or isinstance(self.index, faiss.IndexIVFFlat):
-            self.index.nprobe = nprobe
+        # Set nprobe for IVF indices (GPU indices are searched in place)
+        if self._is_ivf:
+            if self.on_gpu:
+                faiss.GpuParameterSpace().set_index_parameter(self.index, "nprobe", nprobe)
+            else:
+                self.index.nprobe = nprobe
 
         # Search
         distances, indices = self.index.search(query_embeddings, k)
 
         return distances, indices
 
+    def range_search(self, query_embedding: np.ndarray, min_score: float,
+                     nprobe: int = 32) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find every vector whose similarity to the query exceeds a threshold.
+
+        The threshold is applied inside the index scan, so no fixed-size
+        top-k heap is kept. GPU indices have no range search; callers should
+        fall back to search() when on_gpu is set.
+
+        Args:
+            query_embedding: Query vector (embedding_dim,)
+            min_score: Inner-product (cosine) similarity lower bound (exclusive)
+            nprobe: Number of clusters to probe (for IVF indices)
+
+        Returns:
+            Tuple of (scores, indices), sorted by descending score
+        """
+        if self.index is None:
+            raise RuntimeError("Index not built. Call build_*_index first.")
+
+        query_embedding = _as_float32(query_embedding.reshape(1, -1))
+
+        if self._is_ivf:
+            self.index.nprobe = nprobe
+
+        # Inner-product metric: FAISS keeps results with similarity > radius
+        _, scores, indices = self.index.range_search(query_embedding, min_score)
+
+        order = np.argsort(-scores, kind='stable')
+        return scores[order], indices[order]
+
     def save(self, path: Optional[Path] = None):
         """Save index to disk."""
         if self.index is None:
@@ -145,7 +286,8 @@ class FAISSIndex:
         if save_path is None:
             raise ValueError("No path specified for saving")
 
-        faiss.write_index(self.index, str(save_path))
+        index = faiss.index_gpu_to_cpu(self.index) if self.on_gpu else self.index
+        faiss.write_index(index, str(save_path))
         print(f"Index saved to {save_path}")
 
     def load(self, path: Optional[Path] = None):
@@ -159,8 +301,36 @@ class FAISSIndex:
 
         self.index = faiss.read_index(str(load_path))
         self.is_trained = True
+        self.on_gpu = False
+        self._is_ivf = isinstance(self.index, faiss.IndexIVF)
         print(f"Index loaded from {load_path} with {self.index.ntotal} vectors")
 
+    def move_to_gpu(self) -> bool:
+        """
+        Move a built or loaded index to GPU 0 for searching.
+
+        Falls back to the CPU index when no GPU is available, faiss was built
+        without GPU support, or the index type has no GPU implementation
+        (e.g. IVF-PQ FastScan).
+
+        Returns:
+            True if the index is now on the GPU
+        """
+        if self.index is None:
+            raise RuntimeError("Index not built. Call build_*_index first.")
+        if self.on_gpu:
+            return True
+        if not hasattr(faiss, 'StandardGpuResources') or faiss.get_num_gpus() == 0:
+            return False
+
+        try:
+            self.index = self._to_gpu(self.index)
+        except RuntimeError as e:
+            print(f"Keeping index on CPU ({e})")
+            return False
+        self.on_gpu = True
+        return True
+
     def add_vectors(self, embeddings: np.ndarray):
         """
         Add new vectors to existing index.
@@ -174,7 +344,7 @@ class FAISSIndex:
         if not self.is_trained:
             raise RuntimeError("Index not trained. Build index first.")
 
-        embeddings = embeddings.astype(np.float32)
+        embeddings = _as_float32(embeddings)
         self.index.add(embeddings)
         print(f"Added {len(embeddings)} vectors. Total: {self.index.ntotal}")
 
@@ -182,16 +352,23 @@ class FAISSIndex:
 class HybridSearch:
     """Hybrid search combining IVF-PQ approximate search with exact re-ranking."""
 
-    def __init__(self, ivf_index: FAISSIndex, embeddings_cache: np.ndarray):
+    def __init__(self, ivf_index: FAISSIndex, embeddings_cache: Union[np.ndarray, Path]):
         """
         Initialize hybrid search.
 
         Args:
             ivf_index: IVF-PQ index for approximate search
-            embeddings_cache: Full precision embeddings for re-ranking
+            embeddings_cache: FP32 or FP16 embeddings for re-ranking, or path to
+                              a .npy file which is memory-mapped read-only
+                              (candidate rows are upcast to FP32 for scoring)
         """
         self.ivf_index = ivf_index
-        self.embeddings_cache = embeddings_cache.astype(np.float32)
+        if isinstance(embeddings_cache, (str, Path)):
+            # Only the candidate rows touched by re-ranking become resident
+            embeddings_cache = np.load(embeddings_cache, mmap_mode='r')
+        if not embeddings_cache.flags['C_CONTIGUOUS']:
+            embeddings_cache = np.ascontiguousarray(embeddings_cache)
+        self.embeddings_cache = embeddings_cache
 
     def search(self, query_embedding: np.ndarray,
               k: int = 100,
@@ -209,22 +386,75 @@ class HybridSearch:
         Returns:
             Tuple of (distances, indices) for top-k results
         """
-        # Ensure query is 2D
-        if query_embedding.ndim == 1:
-            query_embedding = query_embedding.reshape(1, -1)
-
-        query_embedding = query_embedding.astype(np.float32)
+        # Flatten once to a contiguous FP32 vector (no copy if already one);
+        # FAISSIndex.search adds the batch dimension itself
+        query_vector = np.ascontiguousarray(query_embedding.reshape(-1), dtype=np.float32)
 
         # Step 1: Get approximate top-k candidates from IVF-PQ
         _, candidate_indices = self.ivf_index.search(
-            query_embedding,
+            query_vector,
             k=min(k_approximate, self.ivf_index.index.ntotal),
             nprobe=nprobe
         )
 
-        # Flatten candidate indices
-        candidate_indices = candidate_indices[0]
+        return self._rerank(query_vector, candidate_indices[0], k)
+
+    def search_batch(self, query_embeddings: np.ndarray,
+                     k: int = 100,
+                     k_approximate: int = 1000,
+                     nprobe: int = 32) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Hybrid search for several queries with a single IVF-PQ search call.
+
+        Args:
+            query_embeddings: Query vectors (N, embedding_dim)
+            k: Final number of results per query
+            k_approximate: Number of candidates from IVF-PQ per query
+            nprobe: Number of IVF clusters to probe
+
+        Returns:
+            List of (distances, indices) per query, as returned by search()
+        """
+        queries = np.ascontiguousarray(
+            query_embeddings.reshape(-1, query_embeddings.shape[-1]), dtype=np.float32
+        )
 
+        # One batched index search; FAISS parallelizes across queries
+        _, candidate_indices = self.ivf_index.search(
+            queries,
+            k=min(k_approximate, self.ivf_index.index.ntotal),
+            nprobe=nprobe
+        )
+
+        return [self._rerank(query, candidates, k)
+                for query, candidates in zip(queries, candidate_indices)]
+
+    def range_search(self, query_embedding: np.ndarray, min_score: float,
+                     k_approximate: int = 1000,
+                     nprobe: int = 32) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hybrid search keeping only candidates whose exact score exceeds a threshold.
+
+        The IVF scores are approximate, so the threshold is applied after
+        exact re-ranking rather than inside the IVF scan.
+
+        Args:
+            query_embedding: Query vector (embedding_dim,)
+            min_score: Cosine similarity lower bound (exclusive)
+            k_approximate: Number of candidates from IVF-PQ
+            nprobe: Number of IVF clusters to probe
+
+        Returns:
+            Tuple of (distances, indices), sorted by descending score
+        """
+        scores, indices = self.search(query_embedding, k=k_approximate,
+                                      k_approximate=k_approximate, nprobe=nprobe)
+        keep = scores > min_score
+        return scores[keep], indices[keep]
+
+    def _rerank(self, query_vector: np.ndarray, candidate_indices: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-rank one query's IVF candidates by exact cosine similarity."""
         # Remove invalid indices (-1)
         candidate_indices = candidate_indices[candidate_indices >= 0]
 
@@ -237,18 +467,26 @@ class HybridSearch:
         if len(valid_candidate_indices) == 0:
             # No valid candidates, return empty results
             return np.array([]), np.array([], dtype=np.int64)
-        
-        candidate_embeddings = self.embeddings_cache[valid_candidate_indices]
 
-        # Compute exact cosine similarities (assuming normalized embeddings)
-        similarities = np.dot(candidate_embeddings, query_embedding.T).squeeze()
+        # Small FP32 candidate sets: one fused loop, no temporaries
+        if (numba is not None and self.embeddings_cache.dtype == np.float32
+                and len(valid_candidate_indices) <= RERANK_NUMBA_MAX):
+            return _rerank_numba(np.asarray(self.embeddings_cache), query_vector,
+                                 np.ascontiguousarray(valid_candidate_indices, dtype=np.int64), k)
+
+        # Gather candidate rows into one packed FP32 block for BLAS
+        candidate_embeddings = np.ascontiguousarray(
+            self.embeddings_cache[valid_candidate_indices], dtype=np.float32
+        )
 
-        # Sort by similarity (descending)
-        sorted_idx = np.argsort(-similarities)
+        # Compute exact cosine similarities (assuming normalized embeddings)
+        similarities = candidate_embeddings @ query_vector
 
-        # Get top-k
-        top_k_idx = sorted_idx[:k]
-        top_k_distances = similarities[top_k_idx]
-        top_k_indices = valid_candidate_indices[top_k_idx]
+        # Select top-k with a linear-time partition, then sort only those k
+        if k < len(similarities):
+            top_k_idx = np.argpartition(-similarities, k)[:k]
+            top_k_idx = top_k_idx[np.argsort(-similarities[top_k_idx])]
+        else:
+            top_k_idx = np.argsort(-similarities)
 
-        return top_k_distances, top_k_indices
+        return similarities[top_k_idx], valid_candidate_indices[top_k_idx]
@@ -2,6 +2,7 @@
 
 from typing import Union, List, Optional
 from pathlib import Path
+import faiss
 import numpy as np
 import logging
 from PIL import Image
@@ -77,12 +78,6 @@ class GeminiEmbeddingModel:
                 
                 logger.info(f"Gemini: Received embedding, shape: {embedding.shape}")
                 
-                # Normalize if requested
-                if normalize:
-                    norm = np.linalg.norm(embedding)
-                    if norm > 0:
-                        embedding = embedding / norm
-                
                 all_embeddings.append(embedding)
                 
             except Exception as e:
@@ -90,6 +85,10 @@ class GeminiEmbeddingModel:
                 raise RuntimeError(f"Failed to get embedding from Gemini API: {e}")
 
         embeddings_array = np.vstack(all_embeddings)
+
+        # Normalize all rows at once if requested (in-place, zero vectors left as-is)
+        if normalize:
+            faiss.normalize_L2(embeddings_array)
         logger.info(f"Gemini: Text encoding complete, shape: {embeddings_array.shape}")
 
         return embeddings_array[0] if single else embeddings_array
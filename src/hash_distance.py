@@ -0,0 +1,70 @@
+"""Fast Hamming distance between 64-bit perceptual hashes."""
+
+from typing import Iterable
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None  # numba not installed, use the NumPy implementation
+
+
+# Bit counts for every byte value (fallback for NumPy < 2.0)
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def phashes_to_uint64(hex_hashes: Iterable[str]) -> np.ndarray:
+    """
+    Pack 16-character hex perceptual hashes (8x8 phash) into uint64 values.
+
+    Args:
+        hex_hashes: Hex strings as stored in images.perceptual_hash
+
+    Returns:
+        numpy array of dtype uint64
+    """
+    return np.array([int(h, 16) for h in hex_hashes], dtype=np.uint64)
+
+
+def _hamming_all_numpy(query: np.uint64, corpus: np.ndarray) -> np.ndarray:
+    """XOR + popcount over the corpus with NumPy."""
+    xor = np.bitwise_xor(corpus, query)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(xor).astype(np.uint8)
+    return _POPCOUNT_TABLE[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _hamming_all_numba(query, corpus):
+        """XOR + SWAR popcount (LLVM lowers it to POPCNT) in a parallel loop."""
+        out = np.empty(corpus.shape[0], dtype=np.uint8)
+        m1 = np.uint64(0x5555555555555555)
+        m2 = np.uint64(0x3333333333333333)
+        m4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+        h01 = np.uint64(0x0101010101010101)
+        for i in numba.prange(corpus.shape[0]):
+            x = query ^ corpus[i]
+            x = x - ((x >> np.uint64(1)) & m1)
+            x = (x & m2) + ((x >> np.uint64(2)) & m2)
+            x = (x + (x >> np.uint64(4))) & m4
+            out[i] = np.uint8((x * h01) >> np.uint64(56))
+        return out
+
+
+def hamming_all(query: int, corpus: np.ndarray) -> np.ndarray:
+    """
+    Hamming distance from one 64-bit hash to every hash in a corpus.
+
+    Args:
+        query: Query hash (as returned by phashes_to_uint64)
+        corpus: uint64 array of hashes
+
+    Returns:
+        uint8 array of distances (0-64), one per corpus entry
+    """
+    query = np.uint64(query)
+    corpus = np.ascontiguousarray(corpus, dtype=np.uint64)
+    if numba is not None:
+        return _hamming_all_numba(query, corpus)
+    return _hamming_all_numpy(query, corpus)
@@ -2,9 +2,129 @@
 
 from PIL import Image
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 import hashlib
-import imagehash
+import mmap
+import os
+import numpy as np
+import scipy.fftpack
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None  # xxhash not installed, fall back to MD5 for thumbnail names
+
+try:
+    import imagesize
+except ImportError:
+    imagesize = None  # imagesize not installed, read dimensions via Image.open
+
+# Largest thumbnail edge (px) that is downscaled with BILINEAR instead of LANCZOS
+SMALL_THUMBNAIL_MAX = 384
+
+# JPEG draft decodes keep at least this multiple of the thumbnail size, so the
+# final resample still has real pixels to average (same as Pillow's reducing_gap)
+THUMBNAIL_DRAFT_FACTOR = 2
+
+# Number of get_image_info results kept per ImageProcessor
+IMAGE_INFO_CACHE_SIZE = 4096
+
+# pHash works on a 32x32 grayscale image and keeps the 8x8 lowest DCT frequencies
+PHASH_IMG_SIZE = 32
+PHASH_HASH_SIZE = 8
+
+
+def path_hash(file_path: Path) -> str:
+    """
+    Hash a file path into a stable thumbnail filename stem.
+
+    Uses xxh3-128 when available (non-cryptographic, ~10x faster than MD5);
+    both produce 32 hex characters.
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(str(file_path).encode())
+    return hashlib.md5(str(file_path).encode()).hexdigest()
+
+
+def image_size(file_path: Path) -> Optional[Tuple[int, int]]:
+    """
+    Read image dimensions from the header without decoding pixels.
+
+    Uses imagesize (reads only the bytes holding the size) when installed and
+    the format is supported, otherwise falls back to Image.open.
+
+    Args:
+        file_path: Path to image file
+
+    Returns:
+        (width, height) or None if the file is not a readable image
+    """
+    if imagesize is not None:
+        try:
+            width, height = imagesize.get(str(file_path))
+            if width > 0 and height > 0:
+                return width, height
+        except Exception:
+            pass  # Unsupported or malformed header, let PIL decide
+
+    try:
+        with Image.open(file_path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def _thumbnail_is_current(thumbnail_path: Path, file_path: Path,
+                          source_mtime_ns: Optional[int] = None) -> bool:
+    """True if the thumbnail exists and is no older than its source image.
+
+    Pass source_mtime_ns when the source was already stat'ed to skip a second stat.
+    """
+    try:
+        if source_mtime_ns is None:
+            source_mtime_ns = os.stat(file_path).st_mtime_ns
+        return thumbnail_path.stat().st_mtime_ns >= source_mtime_ns
+    except OSError:
+        return False
+
+
+def perceptual_hash(img: Image.Image) -> str:
+    """
+    Compute the 64-bit perceptual hash of an image as 16 hex characters.
+
+    Produces the same value as str(imagehash.phash(img, hash_size=8)): the DCT
+    is the same scipy.fftpack call in the same axis order, so coefficients that
+    tie with the median (flat or gradient images) round exactly as they do for
+    the hashes already stored. Only the ImageHash object and its string-join hex
+    encoding are skipped; the bits are packed with NumPy.
+
+    Args:
+        img: PIL image (any mode)
+
+    Returns:
+        Hex string representation of the perceptual hash
+    """
+    gray = img.convert('L').resize((PHASH_IMG_SIZE, PHASH_IMG_SIZE), Image.Resampling.LANCZOS)
+    pixels = np.asarray(gray)
+    dct = scipy.fftpack.dct(scipy.fftpack.dct(pixels, axis=0), axis=1)
+    low_freq = dct[:PHASH_HASH_SIZE, :PHASH_HASH_SIZE]
+    bits = low_freq > np.median(low_freq)
+    return np.packbits(bits).tobytes().hex()
+
+
+def _sha256_fileobj(f) -> str:
+    """Hex SHA-256 of a binary file object, read from its current position."""
+    if hasattr(hashlib, 'file_digest'):
+        # Python 3.11+: hashes in C with a large buffer (SHA-NI via OpenSSL)
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+    # Read file in 1 MiB chunks to keep syscall overhead low
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+        sha256.update(chunk)
+    return sha256.hexdigest()
 
 
 class ImageProcessor:
@@ -22,6 +142,16 @@ class ImageProcessor:
         self.thumbnail_size = thumbnail_size
         self.thumbnail_dir.mkdir(parents=True, exist_ok=True)
 
+        # BILINEAR is visually indistinguishable from LANCZOS for small
+        # thumbnails and ~3x faster
+        if max(thumbnail_size) <= SMALL_THUMBNAIL_MAX:
+            self.resample = Image.Resampling.BILINEAR
+        else:
+            self.resample = Image.Resampling.LANCZOS
+
+        # LRU of header metadata keyed by (path, mtime_ns, size)
+        self._info_cache: "OrderedDict[tuple, Optional[dict]]" = OrderedDict()
+
     def is_valid_image(self, file_path: Path) -> bool:
         """
         Check if file is a valid image.
@@ -43,21 +173,130 @@ class ImageProcessor:
         """
         Get image metadata.
 
+        Results are cached per (path, mtime, size), so repeated lookups of an
+        unchanged file skip re-parsing the header.
+
         Args:
             file_path: Path to image file
 
         Returns:
             Dictionary with image info or None if invalid
         """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+
+        key = (str(file_path), st.st_mtime_ns, st.st_size)
+        if key in self._info_cache:
+            self._info_cache.move_to_end(key)
+            info = self._info_cache[key]
+            return dict(info) if info is not None else None
+
         try:
             with Image.open(file_path) as img:
-                return {
+                info = {
                     'width': img.width,
                     'height': img.height,
                     'format': img.format,
                     'mode': img.mode
                 }
         except Exception:
+            info = None
+
+        self._info_cache[key] = info
+        if len(self._info_cache) > IMAGE_INFO_CACHE_SIZE:
+            self._info_cache.popitem(last=False)
+        return dict(info) if info is not None else None
+
+    def process_for_indexing(self, file_path: Path, include_file_stats: bool = False,
+                             make_thumbnail: bool = False) -> dict:
+        """
+        Read image metadata and perceptual hash from a single open of the file.
+
+        Unlike get_image_info, errors opening the file are not swallowed so the
+        caller can record why the image was rejected.
+
+        Args:
+            file_path: Path to image file
+            include_file_stats: Also return file_size (fstat of the open file)
+                                and sha256_hash, reusing the same file handle
+            make_thumbnail: Also write the thumbnail from the pixels already
+                            decoded for the perceptual hash (one JPEG decode)
+
+        Returns:
+            Dictionary with width, height, format, mode and perceptual_hash
+            (None if hashing failed), plus file_size and sha256_hash if requested
+            and thumbnail_path (None if it failed) if make_thumbnail
+
+        Raises:
+            PIL.UnidentifiedImageError: If the file is not a recognized image
+            OSError: If the file cannot be read
+        """
+        with open(file_path, 'rb') as f:
+            # One fstat on the open handle serves file_size and the thumbnail check
+            st = os.fstat(f.fileno())
+            with Image.open(f) as img:
+                info = {
+                    'width': img.width,
+                    'height': img.height,
+                    'format': img.format,
+                    'mode': img.mode,
+                }
+                try:
+                    info['perceptual_hash'] = perceptual_hash(img)
+                except Exception as e:
+                    print(f"Failed to compute perceptual hash for {file_path}: {e}")
+                    info['perceptual_hash'] = None
+
+                # Last use of the decoded image: the thumbnail may resize it in place
+                if make_thumbnail:
+                    info['thumbnail_path'] = self._thumbnail_from_image(
+                        img, file_path, source_mtime_ns=st.st_mtime_ns
+                    )
+
+            if include_file_stats:
+                info['file_size'] = st.st_size
+                try:
+                    f.seek(0)
+                    info['sha256_hash'] = _sha256_fileobj(f)
+                except Exception as e:
+                    print(f"Failed to compute SHA-256 for {file_path}: {e}")
+                    info['sha256_hash'] = None
+        return info
+
+    def _thumbnail_path(self, file_path: Path) -> Path:
+        """Thumbnail location for a source image (named by a hash of its path)."""
+        return self.thumbnail_dir / f"{path_hash(file_path)}.jpg"
+
+    def _save_thumbnail(self, img: Image.Image, thumbnail_path: Path, quality: int = 85):
+        """Downscale an opened image (in place if already RGB) and save it as a JPEG thumbnail."""
+        # Let libjpeg decode at 1/2-1/8 scale (DCT scaling) before the pixels
+        # are loaded; no-op for other formats or images already decoded
+        img.draft('RGB', (self.thumbnail_size[0] * THUMBNAIL_DRAFT_FACTOR,
+                          self.thumbnail_size[1] * THUMBNAIL_DRAFT_FACTOR))
+
+        # Convert to RGB if necessary
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        # Calculate aspect-preserving thumbnail size
+        img.thumbnail(self.thumbnail_size, self.resample)
+
+        # Save as JPEG (single-pass Huffman coding, baseline, 4:2:0 chroma)
+        img.save(thumbnail_path, 'JPEG', quality=quality, optimize=False, progressive=False,
+                 subsampling=2)
+
+    def _thumbnail_from_image(self, img: Image.Image, file_path: Path,
+                              source_mtime_ns: Optional[int] = None) -> Optional[Path]:
+        """Write file_path's thumbnail from an already opened image, unless it is up to date."""
+        try:
+            thumbnail_path = self._thumbnail_path(file_path)
+            if not _thumbnail_is_current(thumbnail_path, file_path, source_mtime_ns):
+                self._save_thumbnail(img, thumbnail_path)
+            return thumbnail_path
+        except Exception as e:
+            print(f"Failed to generate thumbnail for {file_path}: {e}")
             return None
 
     def generate_thumbnail(self, file_path: Path, quality: int = 85) -> Optional[Path]:
@@ -73,25 +312,14 @@ class ImageProcessor:
         """
         try:
             # Generate unique filename using hash of original path
-            path_hash = hashlib.md5(str(file_path).encode()).hexdigest()
-            thumbnail_name = f"{path_hash}.jpg"
-            thumbnail_path = self.thumbnail_dir / thumbnail_name
+            thumbnail_path = self._thumbnail_path(file_path)
 
-            # Skip if thumbnail already exists
-            if thumbnail_path.exists():
+            # Skip if the thumbnail exists and the source hasn't changed since
+            if _thumbnail_is_current(thumbnail_path, file_path):
                 return thumbnail_path
 
-            # Open and convert to RGB
             with Image.open(file_path) as img:
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-
-                # Calculate aspect-preserving thumbnail size
-                img.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
-
-                # Save as JPEG
-                img.save(thumbnail_path, 'JPEG', quality=quality, optimize=True)
+                self._save_thumbnail(img, thumbnail_path, quality)
 
             return thumbnail_path
 
@@ -131,8 +359,7 @@ class ImageProcessor:
             with Image.open(file_path) as img:
                 # Use perceptual hash (phash) - better precision for true duplicates
                 # Detects images with identical visual content across formats/compressions
-                phash = imagehash.phash(img, hash_size=8)
-                return str(phash)
+                return perceptual_hash(img)
         except Exception as e:
             print(f"Failed to compute perceptual hash for {file_path}: {e}")
             return None
@@ -149,16 +376,41 @@ class ImageProcessor:
             Hex string representation of SHA-256 hash or None if failed
         """
         try:
-            sha256 = hashlib.sha256()
             with open(file_path, 'rb') as f:
-                # Read file in chunks for memory efficiency
-                for chunk in iter(lambda: f.read(8192), b''):
-                    sha256.update(chunk)
-            return sha256.hexdigest()
+                return _sha256_fileobj(f)
         except Exception as e:
             print(f"Failed to compute SHA-256 for {file_path}: {e}")
             return None
 
+    def compute_sha256_hash_batch(self, file_paths: List[Path], max_workers: int = 8) -> List[Optional[str]]:
+        """
+        Compute SHA-256 hashes for several files at once.
+
+        Each file is memory-mapped and hashed in a single call, which releases
+        the GIL, so the files are hashed concurrently on a small thread pool.
+
+        Args:
+            file_paths: Paths to files
+            max_workers: Number of files hashed concurrently
+
+        Returns:
+            Hex SHA-256 per path (None where hashing failed), in input order
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self._sha256_mmap, file_paths))
+
+    def _sha256_mmap(self, file_path: Path) -> Optional[str]:
+        """Hash one file through a read-only mmap (no copy into Python bytes)."""
+        try:
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return hashlib.sha256().hexdigest()  # mmap rejects empty files
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return hashlib.sha256(mm).hexdigest()
+        except (OSError, ValueError):
+            # Fall back to the streaming path (also logs the failure)
+            return self.compute_sha256_hash(file_path)
+
     def create_centered_thumbnail(self, file_path: Path, quality: int = 85) -> Optional[Path]:
         """
         Create a center-cropped square thumbnail.
@@ -172,15 +424,18 @@ class ImageProcessor:
         """
         try:
             # Generate unique filename
-            path_hash = hashlib.md5(str(file_path).encode()).hexdigest()
-            thumbnail_name = f"{path_hash}_square.jpg"
+            thumbnail_name = f"{path_hash(file_path)}_square.jpg"
             thumbnail_path = self.thumbnail_dir / thumbnail_name
 
-            # Skip if exists
-            if thumbnail_path.exists():
+            # Skip if the thumbnail exists and the source hasn't changed since
+            if _thumbnail_is_current(thumbnail_path, file_path):
                 return thumbnail_path
 
             with Image.open(file_path) as img:
+                # Reduced-scale JPEG decode; the short side stays >= 2x the target
+                draft_edge = max(self.thumbnail_size) * THUMBNAIL_DRAFT_FACTOR
+                img.draft('RGB', (draft_edge, draft_edge))
+
                 # Convert to RGB
                 if img.mode != 'RGB':
                     img = img.convert('RGB')
@@ -193,14 +448,15 @@ class ImageProcessor:
                 right = left + size
                 bottom = top + size
 
-                # Crop to square
-                img = img.crop((left, top, right, bottom))
-
-                # Resize to target size
-                img = img.resize(self.thumbnail_size, Image.Resampling.LANCZOS)
+                # Crop to square and resize in one pass; reducing_gap pre-shrinks
+                # with a box reduce() so the resample filter runs on ~2x the target
+                img = img.resize(self.thumbnail_size, self.resample,
+                                 box=(left, top, right, bottom),
+                                 reducing_gap=THUMBNAIL_DRAFT_FACTOR)
 
                 # Save
-                img.save(thumbnail_path, 'JPEG', quality=quality, optimize=True)
+                img.save(thumbnail_path, 'JPEG', quality=quality, optimize=False, progressive=False,
+                         subsampling=2)
 
             return thumbnail_path
 
@@ -209,6 +465,71 @@ class ImageProcessor:
             return None
 
 
+def extension_set(extensions: list[str]) -> frozenset:
+    """
+    Normalize file extensions into a lowercase, dot-prefixed frozenset.
+
+    Args:
+        extensions: Extensions with or without the leading dot (e.g., ['.jpg', 'PNG'])
+
+    Returns:
+        frozenset such as {'.jpg', '.png'}
+    """
+    return frozenset(ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions)
+
+
+def walk_image_entries(root_dir: Path, extensions: list[str]) -> Iterator[os.DirEntry]:
+    """
+    Iteratively walk a directory tree with os.scandir, yielding image entries.
+
+    File/directory checks use the type information returned by readdir, so no
+    stat() call is made per entry (rglob + is_file() stats every file). No
+    Path objects are created; callers that only need strings use entry.path.
+
+    Args:
+        root_dir: Root directory to scan
+        extensions: List of file extensions to include (e.g., ['.jpg', '.png'])
+
+    Returns:
+        Iterator of DirEntry objects; DirEntry.stat() is cached per entry
+    """
+    ext_set = extension_set(extensions)
+    stack = [str(root_dir)]
+
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        # Suffix check on the name string first (no stat, no PurePath)
+                        name = entry.name
+                        dot = name.rfind('.')
+                        if dot > 0 and name[dot:].lower() in ext_set and entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError:
+            continue  # Unreadable directory
+
+
+def walk_images(root_dir: Path, extensions: list[str]) -> Iterator[Tuple[Path, os.DirEntry]]:
+    """
+    Iteratively walk a directory tree with os.scandir, yielding image files.
+
+    Args:
+        root_dir: Root directory to scan
+        extensions: List of file extensions to include (e.g., ['.jpg', '.png'])
+
+    Returns:
+        Iterator of (path, DirEntry) tuples; DirEntry.stat() is cached per entry
+    """
+    for entry in walk_image_entries(root_dir, extensions):
+        yield Path(entry.path), entry
+
+
 def scan_images(root_dir: Path, extensions: list[str]) -> list[Path]:
     """
     Recursively scan directory for image files.
@@ -220,11 +541,4 @@ def scan_images(root_dir: Path, extensions: list[str]) -> list[Path]:
     Returns:
         List of image file paths
     """
-    image_files = []
-    extensions_lower = [ext.lower() for ext in extensions]
-
-    for file_path in root_dir.rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() in extensions_lower:
-            image_files.append(file_path)
-
-    return sorted(image_files)
+    return sorted(path for path, _ in walk_images(root_dir, extensions))
@@ -2,9 +2,16 @@
 
 from pathlib import Path
 from typing import Optional, List
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from tqdm import tqdm
+from PIL import UnidentifiedImageError
+import faiss
 import numpy as np
 import logging
+import queue
+import subprocess
+import threading
 import time
 from datetime import timedelta
 
@@ -25,6 +32,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Thumbnail paths passed per thumbnail_postprocess_cmd invocation (stays under ARG_MAX)
+POSTPROCESS_BATCH = 1000
+
+
+def _scan_one(image_processor: ImageProcessor, file_path: Path,
+              make_thumbnail: bool = False) -> dict:
+    """
+    Read metadata, perceptual hash, SHA-256 and size for one file.
+
+    Module-level so it can run in a ProcessPoolExecutor worker.
+
+    Args:
+        image_processor: Processor used to open and hash the image
+        file_path: Image file to scan
+        make_thumbnail: Also write the file's thumbnail (in this worker)
+
+    Returns:
+        Row dict for ImageDatabase.add_images_bulk, or a dict with
+        'file_path' and 'error' if the file could not be processed
+    """
+    try:
+        # Image info, perceptual hash (visual duplicates), size, SHA-256
+        # (exact duplicates) and thumbnail all from one open of the file
+        try:
+            # Thumbnails (if enabled) are cut from the same decode, in parallel
+            # across workers (disable with scan_thumbnails: false on slow drives)
+            info = image_processor.process_for_indexing(
+                file_path, include_file_stats=True, make_thumbnail=make_thumbnail
+            )
+        except (UnidentifiedImageError, OSError):
+            return {'file_path': str(file_path), 'error': "Invalid image format"}
+
+        thumbnail_path = info.get('thumbnail_path')
+
+        return {
+            'file_path': str(file_path),
+            'file_name': file_path.name,
+            'file_size': info['file_size'],
+            'width': info['width'],
+            'height': info['height'],
+            'format': info['format'],
+            'thumbnail_path': str(thumbnail_path) if thumbnail_path else None,
+            'perceptual_hash': info['perceptual_hash'],
+            'sha256_hash': info['sha256_hash'],
+        }
+    except Exception as e:
+        return {'file_path': str(file_path), 'error': str(e)}
+
 
 class IndexingPipeline:
     """Pipeline for processing images and building search index."""
@@ -43,7 +98,7 @@ class IndexingPipeline:
             config.thumbnail_size
         )
         self.embedding_model = None
-        self.embedding_cache = EmbeddingCache(config.embeddings_path)
+        self.embedding_cache = EmbeddingCache(config.embeddings_path, config.embedding_dtype)
 
     def initialize_model(self):
         """Lazy load the embedding model."""
@@ -51,7 +106,9 @@ class IndexingPipeline:
             self.embedding_model = EmbeddingModel(
                 model_name=self.config.model_name,
                 pretrained=self.config.pretrained,
-                device=self.config.device
+                device=self.config.device,
+                compile=self.config.compile_model,
+                compile_batch_size=self.config.batch_size
             )
 
     def scan_and_register_images(self, image_dir: Path) -> int:
@@ -71,7 +128,8 @@ class IndexingPipeline:
         image_files = scan_images_smart(
             root_dir=image_dir,
             extensions=self.config.image_extensions,
-            db_connection=self.db.conn
+            db_connection=self.db.conn,
+            scan_workers=self.config.scan_workers
         )
         logger.info(f"Found {len(image_files)} images to process")
 
@@ -79,53 +137,43 @@ class IndexingPipeline:
         failed = 0
         skipped = 0
         start_processing = time.time()
-        
-        # Batch size for commits (commit every N images for better performance)
-        batch_size = 100
-
-        for idx, file_path in enumerate(tqdm(image_files, desc="Registering images", unit="img")):
-            try:
-                # Double-check if already registered (smart scanner should filter these out)
-                existing = self.db.get_image_by_path(str(file_path))
-                if existing:
-                    skipped += 1
-                    continue
 
-                # Get image info
-                info = self.image_processor.get_image_info(file_path)
-                if not info:
-                    self.db.add_failed_image(str(file_path), "Invalid image format")
+        # Rows are inserted with one executemany + commit per batch; failures
+        # are written without committing and ride along with the next batch.
+        # The smart scanner already drops registered paths; any that slip through
+        # are ignored by INSERT OR IGNORE and counted as skipped.
+        batch_size = 1000
+        pending = []
+        new_thumbnails = []
+
+        # Open/hash files and write thumbnails in worker processes (pHash DCT,
+        # SHA-256 and thumbnail resize are CPU-bound and independent per file);
+        # SQLite writes stay on this thread
+        scan_one = partial(_scan_one, self.image_processor,
+                           make_thumbnail=self.config.scan_thumbnails)
+        num_workers = self.config.num_workers
+        executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else None
+        results = executor.map(scan_one, image_files, chunksize=64) if executor else map(scan_one, image_files)
+
+        try:
+            for idx, result in enumerate(tqdm(results, total=len(image_files), desc="Registering images", unit="img")):
+                if 'error' in result:
+                    logger.error(f"Error processing {result['file_path']}: {result['error']}")
+                    self.db.add_failed_image(result['file_path'], result['error'], auto_commit=False)
                     failed += 1
                     continue
 
-                # Generate thumbnail - DISABLED for performance (filesystem issues on external drive)
-                # thumbnail_path = self.image_processor.generate_thumbnail(file_path)
-                thumbnail_path = None  # Skip thumbnails for speed
-
-                # Compute perceptual hash for visual duplicate detection
-                perceptual_hash = self.image_processor.compute_perceptual_hash(file_path)
-                
-                # Compute SHA-256 hash for exact file duplicate detection
-                sha256_hash = self.image_processor.compute_sha256_hash(file_path)
-
-                # Add to database (batch mode - no auto-commit)
-                self.db.add_image(
-                    file_path=str(file_path),
-                    file_name=file_path.name,
-                    file_size=file_path.stat().st_size,
-                    width=info['width'],
-                    height=info['height'],
-                    format=info['format'],
-                    thumbnail_path=str(thumbnail_path) if thumbnail_path else None,
-                    perceptual_hash=perceptual_hash,
-                    sha256_hash=sha256_hash,
-                    auto_commit=False  # Batch mode
-                )
-                registered += 1
-                
-                # Commit every batch_size images
-                if registered % batch_size == 0:
-                    self.db.commit()
+                # Queue for bulk insert
+                pending.append(result)
+                if result['thumbnail_path']:
+                    new_thumbnails.append(result['thumbnail_path'])
+
+                # Insert and commit every batch_size images
+                if len(pending) >= batch_size:
+                    inserted = self.db.add_images_bulk(pending)
+                    registered += inserted
+                    skipped += len(pending) - inserted
+                    pending = []
 
                 # Log progress every 10000 images
                 if (idx + 1) % 10000 == 0:
@@ -135,20 +183,45 @@ class IndexingPipeline:
                     eta_seconds = remaining / rate if rate > 0 else 0
                     eta = timedelta(seconds=int(eta_seconds))
                     logger.info(f"Progress: {idx+1}/{len(image_files)} | Rate: {rate:.1f} img/s | ETA: {eta}")
-
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {e}")
-                self.db.add_failed_image(str(file_path), str(e))
-                failed += 1
-        
-        # Final commit for any remaining images
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+        # Insert any remaining images (and commit trailing failures)
+        inserted = self.db.add_images_bulk(pending)
+        registered += inserted
+        skipped += len(pending) - inserted
         self.db.commit()
 
+        if self.config.thumbnail_postprocess_cmd and new_thumbnails:
+            self._postprocess_thumbnails(new_thumbnails)
+
         total_time = time.time() - start_time
         logger.info(f"Registration complete in {timedelta(seconds=int(total_time))}")
         logger.info(f"Registered: {registered} new images | Skipped: {skipped} | Failed: {failed}")
         return registered
 
+    def _postprocess_thumbnails(self, thumbnail_paths: List[str]):
+        """
+        Run the configured post-processing command over thumbnails written by a scan.
+
+        Paths are passed in batches, so the process start-up is paid once per
+        POSTPROCESS_BATCH thumbnails rather than once per file. Failures are
+        logged; the thumbnails written by the scan are still usable.
+
+        Args:
+            thumbnail_paths: Thumbnail files to post-process
+        """
+        cmd = list(self.config.thumbnail_postprocess_cmd)
+        logger.info(f"Post-processing {len(thumbnail_paths)} thumbnails with {cmd[0]}...")
+        for start in range(0, len(thumbnail_paths), POSTPROCESS_BATCH):
+            batch = thumbnail_paths[start:start + POSTPROCESS_BATCH]
+            try:
+                subprocess.run(cmd + batch, check=True, stdout=subprocess.DEVNULL)
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.warning(f"Thumbnail post-processing failed: {e}")
+                return
+
     def generate_embeddings_parallel(self, worker_id: int = 0, num_workers: int = 1, resume: bool = True) -> int:
         """
         Generate embeddings for unprocessed images (parallel-safe version).
@@ -186,8 +259,6 @@ class IndexingPipeline:
         logger.info(f"Worker {worker_id}: Processing {total} images in batches of {self.config.batch_size}")
         logger.info(f"Worker {worker_id}: Device: {self.config.device} | Model: {self.config.model_name}")
 
-        all_embeddings = []
-        all_indices = []  # Store embedding indices for each embedding
         processed = 0
         failed = 0
         start_time = time.time()
@@ -195,98 +266,82 @@ class IndexingPipeline:
         # Import thread-safe save function
         from src.embedding_storage import save_embeddings_incremental
 
-        # Process in batches
-        batch_images = []
-        batch_records = []
-        save_interval = 100  # Save every 100 images to prevent loss
+        # Process in batches; upcoming batches are decoded and preprocessed on
+        # worker threads while the current batch is being encoded
+        progress = tqdm(total=total, desc=f"Worker {worker_id} embeddings", unit="img")
+        preprocess = getattr(self.embedding_model, 'preprocess', None)
 
-        for i, record in enumerate(tqdm(unprocessed, desc=f"Worker {worker_id} embeddings", unit="img")):
-            try:
-                # Load image
-                img_path = Path(record['file_path'])
-                img = self.image_processor.load_image(img_path)
+        for chunk_records, batch_records, failed_records, staged in self._staged_batches(unprocessed, preprocess):
+            progress.update(len(chunk_records))
 
-                if img is None:
-                    self.db.add_failed_image(str(img_path), "Failed to load image")
-                    failed += 1
-                    continue
+            for record in failed_records:
+                self.db.add_failed_image(record['file_path'], "Failed to load image")
+                failed += 1
 
-                batch_images.append(img)
-                batch_records.append(record)
+            if not batch_records:
+                continue
 
-                # Process batch when full or at end
-                if len(batch_images) >= self.config.batch_size or i == len(unprocessed) - 1:
-                    # Generate embeddings
-                    embeddings = self.embedding_model.encode_images(
-                        batch_images,
-                        batch_size=len(batch_images)
+            try:
+                if isinstance(staged, Exception):
+                    raise staged
+
+                # Generate embeddings (unit-norm rows, as stored on disk)
+                embeddings = np.ascontiguousarray(self.embedding_model.encode_images(
+                    staged,
+                    batch_size=len(batch_records)
+                ), dtype=np.float32)
+                faiss.normalize_L2(embeddings)
+
+                # Update database with embedding indices (one transaction per batch)
+                # Use a single transaction to allocate sequential indices safely
+
+                # Start transaction - get the starting index once for the whole batch
+                cursor.execute("SELECT COALESCE(MAX(embedding_index), -1) FROM images")
+                max_idx = cursor.fetchone()[0]
+                batch_indices = [max_idx + 1 + j for j in range(len(batch_records))]
+
+                self.db.set_embedding_indices(
+                    [(emb_idx, rec['id']) for emb_idx, rec in zip(batch_indices, batch_records)],
+                    auto_commit=False
+                )
+
+                # Commit entire batch as one transaction (thread-safe)
+                self.db.commit()
+
+                # CRITICAL: Save embeddings to disk IMMEDIATELY (incremental, thread-safe)
+                try:
+                    save_embeddings_incremental(
+                        embeddings_path=self.config.embeddings_path,
+                        new_embeddings=embeddings,
+                        embedding_indices=batch_indices,
+                        dtype=self.embedding_cache.dtype
                     )
+                except Exception as save_error:
+                    logger.error(f"Worker {worker_id}: Failed to save embeddings: {save_error}")
+                    # Continue processing even if save fails - will retry later
 
-                    # Update database with embedding indices (one transaction per batch)
-                    # Use a single transaction to allocate sequential indices safely
-                    batch_indices = []
-                    
-                    # Start transaction - get the starting index once for the whole batch
-                    cursor.execute("SELECT COALESCE(MAX(embedding_index), -1) FROM images")
-                    max_idx = cursor.fetchone()[0]
-                    
-                    for j, rec in enumerate(batch_records):
-                        emb_idx = max_idx + 1 + j
-                        
-                        self.db.add_image(
-                            file_path=rec['file_path'],
-                            file_name=rec['file_name'],
-                            file_size=rec['file_size'],
-                            width=rec['width'],
-                            height=rec['height'],
-                            format=rec['format'],
-                            thumbnail_path=rec['thumbnail_path'],
-                            embedding_index=emb_idx,
-                            auto_commit=False
-                        )
-                        
-                        batch_indices.append(emb_idx)
-                    
-                    # Commit entire batch as one transaction (thread-safe)
-                    self.db.commit()
-
-                    # CRITICAL: Save embeddings to disk IMMEDIATELY (incremental, thread-safe)
-                    try:
-                        save_embeddings_incremental(
-                            embeddings_path=self.config.embeddings_path,
-                            new_embeddings=embeddings,
-                            embedding_indices=batch_indices
-                        )
-                    except Exception as save_error:
-                        logger.error(f"Worker {worker_id}: Failed to save embeddings: {save_error}")
-                        # Continue processing even if save fails - will retry later
-
-                    all_embeddings.append(embeddings)
-                    all_indices.extend(batch_indices)
-                    processed += len(batch_images)
-
-                    # Clear batch
-                    batch_images = []
-                    batch_records = []
-
-                    # Log progress every 1000 images
-                    if processed % 1000 == 0:
-                        elapsed = time.time() - start_time
-                        rate = processed / elapsed
-                        remaining = total - processed
-                        eta_seconds = remaining / rate if rate > 0 else 0
-                        eta = timedelta(seconds=int(eta_seconds))
-                        logger.info(f"Worker {worker_id}: {processed}/{total} | Rate: {rate:.1f} img/s | ETA: {eta} | Failed: {failed}")
+                processed += len(batch_records)
+
+                # Log progress every 1000 images
+                if processed % 1000 == 0:
+                    elapsed = time.time() - start_time
+                    rate = processed / elapsed
+                    remaining = total - processed
+                    eta_seconds = remaining / rate if rate > 0 else 0
+                    eta = timedelta(seconds=int(eta_seconds))
+                    logger.info(f"Worker {worker_id}: {processed}/{total} | Rate: {rate:.1f} img/s | ETA: {eta} | Failed: {failed}")
 
             except Exception as e:
-                logger.error(f"Worker {worker_id}: Error processing {record['file_path']}: {e}")
-                self.db.add_failed_image(record['file_path'], str(e))
-                failed += 1
+                logger.error(f"Worker {worker_id}: Error processing batch of {len(batch_records)} images: {e}")
+                for rec in batch_records:
+                    self.db.add_failed_image(rec['file_path'], str(e))
+                failed += len(batch_records)
+
+        progress.close()
 
         # Final summary - embeddings already saved incrementally above
-        if all_embeddings:
-            total_embeddings = sum(len(e) for e in all_embeddings)
-            logger.info(f"Worker {worker_id}: Generated {total_embeddings} embeddings (already saved to disk)")
+        if processed:
+            logger.info(f"Worker {worker_id}: Generated {processed} embeddings (already saved to disk)")
 
         total_time = time.time() - start_time
         logger.info(f"Worker {worker_id}: Complete in {timedelta(seconds=int(total_time))}")
@@ -336,109 +391,116 @@ class IndexingPipeline:
             processed_files=start_idx
         )
 
-        all_embeddings = []
         processed = 0
         failed = 0
         start_time = time.time()
 
-        # Get next embedding index
-        next_embedding_idx = self.db.get_processed_count()
+        # Grow the embeddings file in place (existing rows + one row per
+        # unprocessed image) so batches are written straight into their final slice
+        embeddings_path = self.config.embeddings_path
+        original_rows = len(np.load(embeddings_path, mmap_mode='r')) if embeddings_path.exists() else None
 
-        # Process in batches
-        batch_images = []
-        batch_records = []
+        # Next embedding index: past every row already on disk and every index
+        # already assigned (indices can have gaps), so no live row is overwritten
+        next_embedding_idx = max(original_rows or 0, self.db.get_next_embedding_index())
+        if original_rows is None:
+            logger.info("No existing embeddings found, saving fresh")
+        else:
+            logger.info(f"Appending at row {next_embedding_idx} of {original_rows} existing embeddings")
+        allocated_rows = next_embedding_idx + total
+        out = self.embedding_cache.resize(allocated_rows, self.embedding_model.get_embedding_dim())
+
+        # Process in batches; images for upcoming batches are decoded and
+        # preprocessed on worker threads, and the next batch is uploaded to the
+        # GPU, while the current batch is being encoded
+        consumed = 0
+        progress = tqdm(total=total, desc="Generating embeddings", unit="img")
+        preprocess = getattr(self.embedding_model, 'preprocess', None)
+
+        for chunk_records, batch_records, failed_records, staged in self._staged_batches(unprocessed, preprocess):
+            consumed += len(chunk_records)
+            progress.update(len(chunk_records))
+
+            for record in failed_records:
+                self.db.add_failed_image(record['file_path'], "Failed to load image")
+                failed += 1
+
+            if not batch_records:
+                continue
 
-        for i, record in enumerate(tqdm(unprocessed, desc="Generating embeddings", unit="img")):
             try:
-                # Load image
-                img_path = Path(record['file_path'])
-                img = self.image_processor.load_image(img_path)
+                if isinstance(staged, Exception):
+                    raise staged
 
-                if img is None:
-                    self.db.add_failed_image(str(img_path), "Failed to load image")
-                    failed += 1
-                    continue
+                # Generate embeddings
+                embeddings = self.embedding_model.encode_images(
+                    staged,
+                    batch_size=len(batch_records)
+                )
+
+                # Update database with embedding indices
+                self.db.set_embedding_indices([
+                    (next_embedding_idx + j, rec['id'])
+                    for j, rec in enumerate(batch_records)
+                ])
+
+                # Guarantee unit-norm rows on disk so queries never need re-normalizing
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+                faiss.normalize_L2(embeddings)
+                out[next_embedding_idx:next_embedding_idx + len(embeddings)] = embeddings
+                next_embedding_idx += len(batch_records)
+                processed += len(batch_records)
+
+                # Checkpoint
+                if processed % self.config.checkpoint_interval == 0:
+                    elapsed = time.time() - start_time
+                    rate = processed / elapsed
+                    remaining = total - processed
+                    eta_seconds = remaining / rate if rate > 0 else 0
+                    eta = timedelta(seconds=int(eta_seconds))
 
-                batch_images.append(img)
-                batch_records.append(record)
+                    logger.info(f"Checkpoint: {processed}/{total} | Rate: {rate:.1f} img/s | ETA: {eta} | Failed: {failed}")
 
-                # Process batch when full or at end
-                if len(batch_images) >= self.config.batch_size or i == len(unprocessed) - 1:
-                    # Generate embeddings
-                    embeddings = self.embedding_model.encode_images(
-                        batch_images,
-                        batch_size=len(batch_images)
+                    self.db.update_processing_status(
+                        job_name=job_name,
+                        total_files=total,
+                        processed_files=start_idx + processed,
+                        failed_files=failed,
+                        last_checkpoint=str(consumed - 1)
                     )
 
-                    # Update database with embedding indices
-                    for j, rec in enumerate(batch_records):
-                        self.db.add_image(
-                            file_path=rec['file_path'],
-                            file_name=rec['file_name'],
-                            file_size=rec['file_size'],
-                            width=rec['width'],
-                            height=rec['height'],
-                            format=rec['format'],
-                            thumbnail_path=rec['thumbnail_path'],
-                            embedding_index=next_embedding_idx + j
-                        )
-
-                    all_embeddings.append(embeddings)
-                    next_embedding_idx += len(batch_images)
-                    processed += len(batch_images)
-
-                    # Clear batch
-                    batch_images = []
-                    batch_records = []
-
-                    # Checkpoint
-                    if processed % self.config.checkpoint_interval == 0:
-                        elapsed = time.time() - start_time
-                        rate = processed / elapsed
-                        remaining = total - processed
-                        eta_seconds = remaining / rate if rate > 0 else 0
-                        eta = timedelta(seconds=int(eta_seconds))
-
-                        logger.info(f"Checkpoint: {processed}/{total} | Rate: {rate:.1f} img/s | ETA: {eta} | Failed: {failed}")
-
-                        self.db.update_processing_status(
-                            job_name=job_name,
-                            total_files=total,
-                            processed_files=start_idx + processed,
-                            failed_files=failed,
-                            last_checkpoint=str(i)
-                        )
-
-                    # Log progress every 5000 images
-                    if processed % 5000 == 0 and processed % self.config.checkpoint_interval != 0:
-                        elapsed = time.time() - start_time
-                        rate = processed / elapsed
-                        remaining = total - processed
-                        eta_seconds = remaining / rate if rate > 0 else 0
-                        eta = timedelta(seconds=int(eta_seconds))
-                        logger.info(f"Progress: {processed}/{total} | Rate: {rate:.1f} img/s | ETA: {eta}")
+                # Log progress every 5000 images
+                if processed % 5000 == 0 and processed % self.config.checkpoint_interval != 0:
+                    elapsed = time.time() - start_time
+                    rate = processed / elapsed
+                    remaining = total - processed
+                    eta_seconds = remaining / rate if rate > 0 else 0
+                    eta = timedelta(seconds=int(eta_seconds))
+                    logger.info(f"Progress: {processed}/{total} | Rate: {rate:.1f} img/s | ETA: {eta}")
 
             except Exception as e:
-                logger.error(f"Error processing {record['file_path']}: {e}")
-                self.db.add_failed_image(record['file_path'], str(e))
-                failed += 1
-
-        # Combine all embeddings
-        if all_embeddings:
-            logger.info("Combining and saving embeddings...")
-            final_embeddings = np.vstack(all_embeddings)
-
-            # Load existing embeddings if they exist
-            try:
-                existing_embeddings = self.embedding_cache.load()
-                logger.info(f"Merging with {len(existing_embeddings)} existing embeddings")
-                final_embeddings = np.vstack([existing_embeddings, final_embeddings])
-            except FileNotFoundError:
-                logger.info("No existing embeddings found, saving fresh")
-
-            # Save combined embeddings
-            self.embedding_cache.save(final_embeddings)
-            logger.info(f"Saved {len(final_embeddings)} total embeddings")
+                logger.error(f"Error processing batch of {len(batch_records)} images: {e}")
+                for rec in batch_records:
+                    self.db.add_failed_image(rec['file_path'], str(e))
+                failed += len(batch_records)
+
+        progress.close()
+
+        # Trim rows reserved for failed images (or undo the resize if nothing was
+        # embedded); never below the rows the file had before this run
+        out.flush()
+        del out
+        if processed:
+            logger.info("Saving embeddings...")
+            if next_embedding_idx < allocated_rows:
+                self.embedding_cache.resize(max(next_embedding_idx, original_rows or 0),
+                                            self.embedding_model.get_embedding_dim())
+            self.embedding_cache.load(mmap_mode='r')
+            logger.info(f"Saved {next_embedding_idx} total embeddings")
+        elif original_rows is None:
+            embeddings_path.unlink()
+        else:
+            self.embedding_cache.resize(original_rows, self.embedding_model.get_embedding_dim())
 
         # Mark job as completed
         self.db.update_processing_status(
@@ -457,6 +519,118 @@ class IndexingPipeline:
 
         return processed
 
+    def _prefetch_image_batches(self, records: List[dict], transform=None):
+        """
+        Yield (records, images) batches while decoding the following batches ahead.
+
+        A producer thread loads images with a pool of config.num_workers threads
+        (PIL releases the GIL while decoding) and hands finished batches to a
+        bounded queue, so the embedding model never waits on disk I/O.
+        Images that fail to load are yielded as None.
+
+        Args:
+            records: Image records with a 'file_path' key
+            transform: Optional callable applied to each loaded image on the
+                       worker threads (e.g. the model's preprocess)
+
+        Returns:
+            Iterator of (batch_records, batch_images) tuples
+        """
+        batch_size = self.config.batch_size
+
+        def load(path: Path):
+            img = self.image_processor.load_image(path)
+            if img is not None and transform is not None:
+                try:
+                    img = transform(img)
+                except Exception as e:
+                    logger.error(f"Failed to preprocess {path}: {e}")
+                    return None
+            return img
+
+        batches: queue.Queue = queue.Queue(maxsize=2)
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, self.config.num_workers)) as pool:
+                    for start in range(0, len(records), batch_size):
+                        if stop.is_set():
+                            return
+                        chunk = records[start:start + batch_size]
+                        images = list(pool.map(
+                            load,
+                            (Path(rec['file_path']) for rec in chunk)
+                        ))
+                        batches.put((chunk, images))
+            except Exception as e:
+                batches.put(e)
+            finally:
+                batches.put(done)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Unblock and stop the producer if the consumer exits early
+            stop.set()
+            while producer.is_alive():
+                try:
+                    batches.get_nowait()
+                except queue.Empty:
+                    producer.join(timeout=0.1)
+
+    def _staged_batches(self, records: List[dict], transform=None):
+        """
+        Yield prefetched batches with the following batch already staged on the device.
+
+        Wraps _prefetch_image_batches: images that failed to load are split out,
+        and batch N+1 is handed to the model's stage_images before batch N is
+        yielded, so its host-to-device copy overlaps batch N's forward pass.
+        A staging error is yielded in place of the staged batch so the caller
+        can fail that batch alone.
+
+        Args:
+            records: Image records with a 'file_path' key
+            transform: Optional callable applied to each loaded image
+
+        Returns:
+            Iterator of (chunk_records, batch_records, failed_records, staged) tuples
+        """
+        pending = None
+        for chunk_records, chunk_images in self._prefetch_image_batches(records, transform):
+            batch_records = []
+            batch_images = []
+            failed_records = []
+            for record, img in zip(chunk_records, chunk_images):
+                if img is None:
+                    failed_records.append(record)
+                else:
+                    batch_records.append(record)
+                    batch_images.append(img)
+
+            staged = None
+            if batch_images:
+                try:
+                    staged = self.embedding_model.stage_images(batch_images)
+                except Exception as e:
+                    staged = e
+
+            if pending is not None:
+                yield pending
+            pending = (chunk_records, batch_records, failed_records, staged)
+
+        if pending is not None:
+            yield pending
+
     def get_stats(self) -> dict:
         """Get indexing statistics."""
         total = self.db.get_total_images()
@@ -15,6 +15,10 @@ from .image_processor import ImageProcessor
 class SearchResult:
     """Container for search results."""
 
+    # Fixed attribute layout: no per-instance __dict__
+    __slots__ = ('image_id', 'file_path', 'file_name', 'score', 'thumbnail_path',
+                 'width', 'height', 'embedding_index')
+
     def __init__(self, image_id: int, file_path: str, score: float,
                  thumbnail_path: Optional[str] = None,
                  width: Optional[int] = None, height: Optional[int] = None,
@@ -64,11 +68,20 @@ class ImageSearchEngine:
         self.db = ImageDatabase(config.db_path)
         self.embedding_model = None
         self.local_model = None  # For image encoding when using Gemini API
-        self.embedding_cache = EmbeddingCache(config.embeddings_path)
+        self.embedding_cache = EmbeddingCache(config.embeddings_path, config.embedding_dtype)
         self.faiss_index = None
         self.hybrid_search = None
         self.image_processor = ImageProcessor(config.thumbnails_dir)
 
+        # Result metadata as parallel arrays indexed by embedding_index
+        # (filled by _load_metadata; id -1 marks an index with no row)
+        self._meta_id: Optional[np.ndarray] = None
+        self._meta_file_path: Optional[np.ndarray] = None
+        self._meta_file_name: Optional[np.ndarray] = None
+        self._meta_thumbnail_path: Optional[np.ndarray] = None
+        self._meta_width: Optional[np.ndarray] = None
+        self._meta_height: Optional[np.ndarray] = None
+
     def initialize(self):
         """Load all necessary components."""
         print("Initializing search engine...")
@@ -92,9 +105,17 @@ class ImageSearchEngine:
                 self.embedding_model = create_embedding_model(self.config)
                 self.local_model = None
 
-        # Load embeddings cache
+            # Pay one-time kernel/JIT setup now instead of on the first query
+            for model in (self.embedding_model, self.local_model):
+                if isinstance(model, EmbeddingModel):
+                    model.warmup()
+
+        # Memory-map embeddings cache (re-ranking only touches candidate rows)
         print("Loading embeddings...")
-        embeddings = self.embedding_cache.load()
+        embeddings = self.embedding_cache.load(mmap_mode='r')
+
+        # Result metadata lookup, so queries don't hit SQLite
+        self._load_metadata()
 
         # Load or build FAISS index
         print("Loading FAISS index...")
@@ -112,10 +133,16 @@ class ImageSearchEngine:
                 nlist=self.config.nlist,
                 m=self.config.m_pq,
                 nbits=self.config.nbits_pq,
-                use_gpu=self.config.device == "cuda"
+                use_gpu=self.config.device == "cuda",
+                quant=self.config.index_quantization,
+                fastscan=self.config.pq_fastscan
             )
             self.faiss_index.save()
 
+        # Search the index on the GPU when one is configured (re-ranking stays on CPU)
+        if self.config.device == "cuda" and self.faiss_index.move_to_gpu():
+            print("FAISS index moved to GPU")
+
         # Initialize hybrid search if requested
         if self.use_hybrid:
             print("Initializing hybrid search...")
@@ -150,21 +177,7 @@ class ImageSearchEngine:
         query_embedding = self.embedding_model.encode_text(query, normalize=True)
         logger.info(f"Text encoding complete, embedding shape: {query_embedding.shape}")
         
-        # Handle dimension mismatch (e.g., Gemini 768-dim vs index 512-dim)
-        if hasattr(query_embedding, 'shape') and len(query_embedding.shape) > 0:
-            query_dim = query_embedding.shape[0] if query_embedding.ndim == 1 else query_embedding.shape[1]
-            index_dim = self.config.embedding_dim
-            
-            if query_dim != index_dim:
-                logger.warning(
-                    f"⚠️ Dimension mismatch: query={query_dim}, index={index_dim}. "
-                    f"Attempting dimension adaptation..."
-                )
-                from .dimension_adapter import create_adapter_if_needed
-                adapter = create_adapter_if_needed(query_dim, index_dim)
-                if adapter:
-                    query_embedding = adapter.adapt(query_embedding)
-                    logger.info(f"Dimension adapted: {query_dim} → {index_dim}")
+        query_embedding = self._adapt_query_dim(query_embedding)
 
         # Search
         if self.use_hybrid and self.hybrid_search:
@@ -188,6 +201,119 @@ class ImageSearchEngine:
 
         return results
 
+    def search_by_texts(self, queries: List[str], top_k: int = 20) -> List[List[SearchResult]]:
+        """
+        Search for images using several text queries at once.
+
+        All queries go through one encode_text call and one index search,
+        which amortizes the per-call encoder and FAISS overhead.
+
+        Args:
+            queries: Text descriptions
+            top_k: Number of results to return per query
+
+        Returns:
+            List of SearchResult lists, one per query (in query order)
+        """
+        if not queries:
+            return []
+
+        if self.embedding_model is None:
+            self.initialize()
+
+        query_embeddings = self.embedding_model.encode_text(list(queries), normalize=True)
+        query_embeddings = self._adapt_query_dim(np.atleast_2d(query_embeddings))
+
+        if self.use_hybrid and self.hybrid_search:
+            hits = self.hybrid_search.search_batch(
+                query_embeddings,
+                k=top_k,
+                k_approximate=self.config.top_k_ivf,
+                nprobe=self.config.nprobe
+            )
+        else:
+            scores, indices = self.faiss_index.search(
+                query_embeddings,
+                k=top_k,
+                nprobe=self.config.nprobe
+            )
+            hits = zip(scores, indices)
+
+        return [self._build_results(indices, scores) for scores, indices in hits]
+
+    def search_by_text_range(self, query: str, min_score: float, max_score: float = 1.0,
+                             limit: Optional[int] = None) -> List[SearchResult]:
+        """
+        Search for images whose similarity to a text query falls in a range.
+
+        The lower bound is pushed into the index via range search instead of
+        fetching a fixed top-k and filtering it afterwards.
+
+        Args:
+            query: Text description
+            min_score: Lowest similarity to return (exclusive)
+            max_score: Highest similarity to return (inclusive)
+            limit: Maximum number of results (None = all matches)
+
+        Returns:
+            List of SearchResult objects, best score first
+        """
+        if self.embedding_model is None:
+            self.initialize()
+
+        query_embedding = self.embedding_model.encode_text(query, normalize=True)
+        query_embedding = self._adapt_query_dim(query_embedding)
+
+        if self.use_hybrid and self.hybrid_search:
+            scores, indices = self.hybrid_search.range_search(
+                query_embedding,
+                min_score,
+                k_approximate=self.config.top_k_ivf,
+                nprobe=self.config.nprobe
+            )
+        elif self.faiss_index.on_gpu:
+            # GPU indices have no range search: take the IVF top-k and filter
+            scores, indices = self.faiss_index.search(
+                query_embedding,
+                k=self.config.top_k_ivf,
+                nprobe=self.config.nprobe
+            )
+            keep = (indices[0] >= 0) & (scores[0] > min_score)
+            scores, indices = scores[0][keep], indices[0][keep]
+        else:
+            scores, indices = self.faiss_index.range_search(
+                query_embedding,
+                min_score,
+                nprobe=self.config.nprobe
+            )
+
+        keep = scores <= max_score
+        scores, indices = scores[keep][:limit], indices[keep][:limit]
+
+        return self._build_results(indices, scores)
+
+    def _adapt_query_dim(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Project query embeddings to the index dimension if they differ (e.g., Gemini 768 vs 512)."""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if hasattr(query_embedding, 'shape') and len(query_embedding.shape) > 0:
+            query_dim = query_embedding.shape[0] if query_embedding.ndim == 1 else query_embedding.shape[1]
+            index_dim = self.config.embedding_dim
+            
+            if query_dim != index_dim:
+                logger.warning(
+                    f"⚠️ Dimension mismatch: query={query_dim}, index={index_dim}. "
+                    f"Attempting dimension adaptation..."
+                )
+                from .dimension_adapter import create_adapter_if_needed
+                adapter = create_adapter_if_needed(query_dim, index_dim)
+                if adapter:
+                    query_embedding = adapter.adapt(query_embedding)
+                    logger.info(f"Dimension adapted: {query_dim} → {index_dim}")
+
+        return query_embedding
+
     def search_by_image(self, image_path: Union[str, Path],
                        top_k: int = 20) -> List[SearchResult]:
         """
@@ -239,13 +365,15 @@ class ImageSearchEngine:
         return results
 
     def search_by_embedding(self, embedding: np.ndarray,
-                          top_k: int = 20) -> List[SearchResult]:
+                          top_k: int = 20,
+                          assume_normalized: bool = False) -> List[SearchResult]:
         """
         Search using a pre-computed embedding.
 
         Args:
             embedding: Query embedding vector
             top_k: Number of results to return
+            assume_normalized: Skip the unit-norm check (caller guarantees it)
 
         Returns:
             List of SearchResult objects
@@ -253,8 +381,13 @@ class ImageSearchEngine:
         if self.faiss_index is None:
             self.initialize()
 
-        # Ensure normalized
-        embedding = embedding / np.linalg.norm(embedding)
+        # Ensure normalized (rescale only if the norm is actually off);
+        # rows read from an FP16 cache are upcast first
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if not assume_normalized:
+            norm_sq = float(np.dot(embedding.ravel(), embedding.ravel()))
+            if abs(norm_sq - 1.0) > 1e-4:
+                embedding = embedding * (1.0 / np.sqrt(norm_sq))
 
         # Search
         if self.use_hybrid and self.hybrid_search:
@@ -278,10 +411,38 @@ class ImageSearchEngine:
 
         return results
 
+    def _load_metadata(self):
+        """Load result metadata for every embedded image into arrays indexed by embedding_index."""
+        rows = self.db.conn.execute("""
+            SELECT embedding_index, id, file_path, file_name, thumbnail_path, width, height
+            FROM images WHERE embedding_index IS NOT NULL
+        """).fetchall()
+
+        n = max((row[0] for row in rows), default=-1) + 1
+        self._meta_id = np.full(n, -1, dtype=np.int64)
+        self._meta_file_path = np.empty(n, dtype=object)
+        self._meta_file_name = np.empty(n, dtype=object)
+        self._meta_thumbnail_path = np.empty(n, dtype=object)
+        self._meta_width = np.empty(n, dtype=object)
+        self._meta_height = np.empty(n, dtype=object)
+
+        for idx, image_id, file_path, file_name, thumbnail_path, width, height in rows:
+            self._meta_id[idx] = image_id
+            self._meta_file_path[idx] = file_path
+            self._meta_file_name[idx] = file_name
+            self._meta_thumbnail_path[idx] = thumbnail_path
+            self._meta_width[idx] = width
+            self._meta_height[idx] = height
+
+        print(f"Loaded metadata for {len(rows)} embedded images")
+
     def _build_results(self, indices: np.ndarray, scores: np.ndarray) -> List[SearchResult]:
         """
         Build SearchResult objects from indices and scores.
 
+        Hits found in the metadata arrays are gathered column-wise with one fancy
+        index per column; only indices missing from the arrays go to the DB.
+
         Args:
             indices: Array of embedding indices
             scores: Array of similarity scores
@@ -289,27 +450,58 @@ class ImageSearchEngine:
         Returns:
             List of SearchResult objects
         """
-        # Get image records
-        image_records = self.db.get_images_by_indices(indices.tolist())
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        scores = np.asarray(scores).ravel()
+        max_valid_index = len(self.embedding_cache.embeddings) - 1 if self.embedding_cache.embeddings is not None else None
 
-        # Create mapping from embedding_index to record
-        index_to_record = {rec['embedding_index']: rec for rec in image_records}
+        # Drop invalid indices from FAISS (-1) and ones beyond available embeddings
+        keep = indices >= 0
+        if max_valid_index is not None:
+            keep &= indices <= max_valid_index
+        indices = indices[keep]
+        scores = scores[keep].tolist()
+
+        # Which hits the metadata arrays cover (id -1 marks an index with no row)
+        cached = np.zeros(len(indices), dtype=bool)
+        if self._meta_id is not None:
+            in_range = indices < len(self._meta_id)
+            cached[in_range] = self._meta_id[indices[in_range]] >= 0
+
+        # Gather each metadata column once for all cached hits
+        hit = indices[cached]
+        columns = zip(
+            hit.tolist(), self._meta_id[hit].tolist(), self._meta_file_path[hit],
+            self._meta_file_name[hit], self._meta_thumbnail_path[hit],
+            self._meta_width[hit], self._meta_height[hit]
+        ) if len(hit) else iter(())
+
+        # Query the DB only for misses
+        index_to_record = {}
+        misses = indices[~cached].tolist()
+        if misses:
+            for rec in self.db.get_images_by_indices(misses):
+                index_to_record[rec['embedding_index']] = rec
 
         # Build results in order
         results = []
-        max_valid_index = len(self.embedding_cache.embeddings) - 1 if self.embedding_cache.embeddings is not None else None
-        
-        for idx, score in zip(indices, scores):
-            if idx < 0:  # Invalid index from FAISS
-                continue
-            
-            # Filter out invalid embedding indices (beyond available embeddings)
-            if max_valid_index is not None and idx > max_valid_index:
+        for idx, is_cached, score in zip(indices.tolist(), cached.tolist(), scores):
+            if is_cached:
+                idx, image_id, file_path, file_name, thumbnail_path, width, height = next(columns)
+                results.append(SearchResult(
+                    image_id=image_id,
+                    file_path=file_path,
+                    score=score,
+                    thumbnail_path=thumbnail_path,
+                    width=width,
+                    height=height,
+                    embedding_index=idx,
+                    file_name=file_name
+                ))
                 continue
 
-            record = index_to_record.get(int(idx))
+            record = index_to_record.get(idx)
             if record:
-                result = SearchResult(
+                results.append(SearchResult(
                     image_id=record['id'],
                     file_path=record['file_path'],
                     score=score,
@@ -318,11 +510,13 @@ class ImageSearchEngine:
                     height=record.get('height'),
                     embedding_index=record.get('embedding_index'),
                     file_name=record.get('file_name')
-                )
-                results.append(result)
+                ))
 
         return results
 
     def close(self):
         """Clean up resources."""
+        # Drop the references to the embeddings memmap so its mapping is released
+        self.hybrid_search = None
+        self.embedding_cache.embeddings = None
         self.db.close()
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 """Simple status server for monitoring processing progress."""
 
-from fastapi import FastAPI
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from typing import Optional
+import asyncio
+import json
 import sqlite3
+import threading
+import time
 from pathlib import Path
 import uvicorn
 
@@ -14,118 +19,131 @@ app = FastAPI(title="Image Processing Status")
 DB_PATH = "/Volumes/My Book/images-finder-data/metadata.db"
 STATIC_DIR = Path(__file__).parent / "static"
 
+# Dashboards poll every few seconds; concurrent polls within the TTL share one query run
+STATS_TTL_SECONDS = 2.0
+_STATS_CACHE = {"t": 0.0, "v": None}
+_STATS_LOCK = asyncio.Lock()
+
+# /stats/stream checks for database commits this often, and sends a keep-alive
+# comment after this long without an event
+STREAM_POLL_SECONDS = 1.0
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+# One long-lived read-only connection; its statement cache keeps the stats
+# queries compiled across requests. Calls come from worker threads, one at a time.
+_CONN = None
+_CONN_LOCK = threading.Lock()
+
 @app.get("/")
 async def root():
-    """Redirect to status page."""
-    return HTMLResponse(content="""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta http-equiv="refresh" content="0; url=/status.html">
-        </head>
-        <body>
-            Redirecting to status page...
-        </body>
-        </html>
-    """)
+    """Redirect to status page (308 is cacheable, so later visits skip this hop)."""
+    return RedirectResponse(url="/status.html", status_code=308)
 
 @app.get("/stats")
-async def get_stats():
-    """Get processing statistics."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("PRAGMA busy_timeout = 5000")  # 5 second timeout for locks
-        cur = conn.cursor()
-        
-        # Total images
-        cur.execute('SELECT COUNT(*) FROM images')
-        total_images = cur.fetchone()[0]
-        
-        # Processed (with embeddings)
-        cur.execute('SELECT COUNT(*) FROM images WHERE embedding_index IS NOT NULL')
-        processed_images = cur.fetchone()[0]
-        
-        # Failed
-        cur.execute('SELECT COUNT(*) FROM failed_images')
-        failed_images = cur.fetchone()[0]
-        
-        # SHA-256 hash progress
-        cur.execute('SELECT COUNT(*) FROM images WHERE sha256_hash IS NOT NULL')
-        with_sha256 = cur.fetchone()[0]
-        
-        # Perceptual hash progress  
-        cur.execute('SELECT COUNT(*) FROM images WHERE perceptual_hash IS NOT NULL')
-        with_phash = cur.fetchone()[0]
-        
-        # SHA-256 duplicates (exact copies)
+async def get_stats(fresh: bool = False):
+    """Get processing statistics (cached for STATS_TTL_SECONDS; ?fresh=1 bypasses)."""
+    if not fresh and _stats_cache_valid():
+        return _STATS_CACHE["v"]
+
+    async with _STATS_LOCK:
+        # Another request may have refreshed the cache while we waited
+        if not fresh and _stats_cache_valid():
+            return _STATS_CACHE["v"]
+
+        # Run the blocking scans off the event loop
+        stats = await asyncio.to_thread(_query_stats)
+        if "error" not in stats:
+            _STATS_CACHE["v"] = stats
+            _STATS_CACHE["t"] = time.monotonic()
+        return stats
+
+
+@app.get("/stats/stream")
+async def stream_stats(request: Request):
+    """Push statistics as server-sent events whenever the database changes."""
+    async def events():
+        last_version = None
+        last_payload = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            # data_version only moves when another connection commits, so an
+            # idle database costs one PRAGMA per tick and no stats queries
+            version = await asyncio.to_thread(_data_version)
+            if version is None or version != last_version:
+                payload = json.dumps(await get_stats(fresh=True))
+                if payload != last_payload:
+                    yield f"data: {payload}\n\n"
+                    last_payload = payload
+                    idle = 0.0
+                last_version = version
+
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+            idle += STREAM_POLL_SECONDS
+            if idle >= STREAM_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+def _data_version() -> Optional[int]:
+    """Get SQLite's data_version for the shared connection (None if unavailable)."""
+    global _CONN
+    with _CONN_LOCK:
         try:
-            cur.execute('''
-                SELECT COUNT(*) FROM (
-                    SELECT sha256_hash 
-                    FROM images 
-                    WHERE sha256_hash IS NOT NULL
-                    GROUP BY sha256_hash 
-                    HAVING COUNT(*) > 1
-                )
-            ''')
-            sha256_dup_groups = cur.fetchone()[0]
-            
-            cur.execute('''
-                SELECT SUM(cnt - 1) FROM (
-                    SELECT COUNT(*) as cnt
-                    FROM images 
-                    WHERE sha256_hash IS NOT NULL
-                    GROUP BY sha256_hash 
-                    HAVING COUNT(*) > 1
-                )
-            ''')
-            sha256_duplicates = cur.fetchone()[0] or 0
-        except:
-            sha256_dup_groups = 0
-            sha256_duplicates = 0
-        
-        # Perceptual duplicates (visual matches)
+            return _get_connection().execute("PRAGMA data_version").fetchone()[0]
+        except Exception:
+            if _CONN is not None:
+                _CONN.close()
+                _CONN = None
+            return None
+
+
+def _stats_cache_valid() -> bool:
+    return (_STATS_CACHE["v"] is not None
+            and time.monotonic() - _STATS_CACHE["t"] < STATS_TTL_SECONDS)
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Open the shared stats connection on first use."""
+    global _CONN
+    if _CONN is None:
+        # Read-only URI: the indexer owns writes (and has put the DB in WAL
+        # mode), so readers never block it and never create an empty DB
+        uri = f"{Path(DB_PATH).as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               isolation_level=None, cached_statements=32)
+        conn.execute("PRAGMA busy_timeout = 5000")  # 5 second timeout for locks
+        conn.execute("PRAGMA mmap_size = 1073741824")  # Read pages via mmap (1 GB)
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -65536")  # ~64 MB page cache
+        _CONN = conn
+    return _CONN
+
+
+def _query_stats():
+    """Run the statistics queries against the database."""
+    with _CONN_LOCK:
+        return _query_stats_locked()
+
+
+def _query_stats_locked():
+    global _CONN
+    try:
+        cur = _get_connection().cursor()
         try:
-            cur.execute('''
-                SELECT COUNT(*) FROM (
-                    SELECT perceptual_hash 
-                    FROM images 
-                    WHERE perceptual_hash IS NOT NULL
-                    GROUP BY perceptual_hash 
-                    HAVING COUNT(*) > 1
-                )
-            ''')
-            phash_dup_groups = cur.fetchone()[0]
-            
-            cur.execute('''
-                SELECT SUM(cnt - 1) FROM (
-                    SELECT COUNT(*) as cnt
-                    FROM images 
-                    WHERE perceptual_hash IS NOT NULL
-                    GROUP BY perceptual_hash 
-                    HAVING COUNT(*) > 1
-                )
-            ''')
-            phash_duplicates = cur.fetchone()[0] or 0
-        except:
-            phash_dup_groups = 0
-            phash_duplicates = 0
-        
-        conn.close()
-        
-        return {
-            "total_images": total_images,
-            "processed_images": processed_images,
-            "failed_images": failed_images,
-            "with_sha256": with_sha256,
-            "with_phash": with_phash,
-            "sha256_duplicate_groups": sha256_dup_groups,
-            "sha256_duplicates": sha256_duplicates,
-            "phash_duplicate_groups": phash_dup_groups,
-            "phash_duplicates": phash_duplicates,
-            "index_ready": False
-        }
+            stats = _summary_stats(cur)
+        except sqlite3.OperationalError:
+            # stats_summary is created when the indexer next opens the database
+            stats = _aggregate_stats(cur)
+        stats["index_ready"] = False
+        return stats
     except Exception as e:
+        # Reconnect on the next call (e.g. the database volume was remounted)
+        if _CONN is not None:
+            _CONN.close()
+            _CONN = None
         return {
             "total_images": 0,
             "processed_images": 0,
@@ -140,6 +158,86 @@ async def get_stats():
             "error": str(e)
         }
 
+
+def _summary_stats(cur) -> dict:
+    """Read the trigger-maintained counters (see ImageDatabase._init_stats_summary)."""
+    cur.execute('SELECT key, value FROM stats_summary')
+    summary = dict(cur.fetchall())
+    return {
+        "total_images": summary["total"],
+        "processed_images": summary["with_embedding"],
+        "failed_images": summary["failed"],
+        "with_sha256": summary["sha256_rows"],
+        "with_phash": summary["phash_rows"],
+        "sha256_duplicate_groups": summary["sha256_dup_groups"],
+        "sha256_duplicates": summary["sha256_rows"] - summary["sha256_distinct"],
+        "phash_duplicate_groups": summary["phash_dup_groups"],
+        "phash_duplicates": summary["phash_rows"] - summary["phash_distinct"],
+    }
+
+
+def _aggregate_stats(cur) -> dict:
+    """Compute the statistics by scanning images (databases without stats_summary)."""
+    # Image counts and hash progress in one statement; each subquery is an
+    # index-only scan over the column's index instead of a pass over the wide rows
+    cur.execute('''
+        SELECT (SELECT COUNT(*) FROM images),
+               (SELECT COUNT(*) FROM images WHERE embedding_index IS NOT NULL),
+               (SELECT COUNT(*) FROM images WHERE sha256_hash IS NOT NULL),
+               (SELECT COUNT(*) FROM images WHERE perceptual_hash IS NOT NULL)
+    ''')
+    total_images, processed_images, with_sha256, with_phash = cur.fetchone()
+    
+    # Failed
+    cur.execute('SELECT COUNT(*) FROM failed_images')
+    failed_images = cur.fetchone()[0]
+    
+    # SHA-256 duplicates (exact copies): group count and extra copies from one GROUP BY
+    try:
+        cur.execute('''
+            WITH g AS (
+                SELECT sha256_hash, COUNT(*) AS c
+                FROM images
+                WHERE sha256_hash IS NOT NULL
+                GROUP BY sha256_hash
+                HAVING c > 1
+            )
+            SELECT COUNT(*), COALESCE(SUM(c - 1), 0) FROM g
+        ''')
+        sha256_dup_groups, sha256_duplicates = cur.fetchone()
+    except:
+        sha256_dup_groups = 0
+        sha256_duplicates = 0
+    
+    # Perceptual duplicates (visual matches)
+    try:
+        cur.execute('''
+            WITH g AS (
+                SELECT perceptual_hash, COUNT(*) AS c
+                FROM images
+                WHERE perceptual_hash IS NOT NULL
+                GROUP BY perceptual_hash
+                HAVING c > 1
+            )
+            SELECT COUNT(*), COALESCE(SUM(c - 1), 0) FROM g
+        ''')
+        phash_dup_groups, phash_duplicates = cur.fetchone()
+    except:
+        phash_dup_groups = 0
+        phash_duplicates = 0
+    
+    return {
+        "total_images": total_images,
+        "processed_images": processed_images,
+        "failed_images": failed_images,
+        "with_sha256": with_sha256,
+        "with_phash": with_phash,
+        "sha256_duplicate_groups": sha256_dup_groups,
+        "sha256_duplicates": sha256_duplicates,
+        "phash_duplicate_groups": phash_dup_groups,
+        "phash_duplicates": phash_duplicates,
+    }
+
 # Mount static files
 if STATIC_DIR.exists():
     app.mount("/", StaticFiles(directory=str(STATIC_DIR), html=True), name="static")
@@ -154,8 +252,9 @@ if __name__ == "__main__":
     print("📊 Status Dashboard:")
     print("   http://localhost:8000/status.html")
     print("")
-    print("🔌 API Endpoint:")
+    print("🔌 API Endpoints:")
     print("   http://localhost:8000/stats")
+    print("   http://localhost:8000/stats/stream (server-sent events)")
     print("")
     print("Press Ctrl+C to stop")
     print("=" * 60)
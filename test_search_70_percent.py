@@ -14,21 +14,27 @@ sys.path.insert(0, str(Path(__file__).parent))
 from src.config import load_config
 from src.search import ImageSearchEngine
 
-def open_image(image_path: Path):
-    """Open image on macOS."""
-    if not image_path.exists():
-        print(f"⚠️  Image not found: {image_path}")
+def open_image(image_paths: List[Path]):
+    """Open images on macOS with a single `open` call."""
+    existing = []
+    for image_path in image_paths:
+        if image_path.exists():
+            existing.append(image_path)
+        else:
+            print(f"⚠️  Image not found: {image_path}")
+    if not existing:
         return False
     
     try:
-        # macOS command to open image
-        subprocess.run(['open', str(image_path)], check=True)
+        # macOS `open` takes many files per invocation (one fork/exec)
+        subprocess.run(['open', '--', *map(str, existing)], check=True)
         return True
     except Exception as e:
         print(f"❌ Error opening image: {e}")
         return False
 
-def search_and_show(query: str, target_score_range: tuple = (0.65, 0.75), top_k: int = 50):
+def search_and_show(query: str, search_engine: ImageSearchEngine,
+                    target_score_range: tuple = (0.65, 0.75), top_k: int = 50):
     """Search and show results around target score range."""
     print("=" * 60)
     print(f"  🔍 חיפוש: '{query}'")
@@ -36,30 +42,11 @@ def search_and_show(query: str, target_score_range: tuple = (0.65, 0.75), top_k:
     print()
     
     try:
-        # Load config
-        config = load_config(Path("config_optimized.yaml"))
-        
-        # Initialize search engine
-        print("טוען מנוע חיפוש...")
-        search_engine = ImageSearchEngine(config)
-        search_engine.initialize()
-        
-        # Search
+        # Search (the score range is applied by the index)
         print(f"מחפש '{query}'...")
-        results = search_engine.search_by_text(query, top_k=top_k)
-        
-        if not results:
-            print("❌ לא נמצאו תוצאות")
-            return []
-        
-        print(f"✅ נמצאו {len(results)} תוצאות")
-        print()
-        
-        # Filter results in target score range
-        target_results = [
-            r for r in results 
-            if target_score_range[0] <= r.score <= target_score_range[1]
-        ]
+        target_results = search_engine.search_by_text_range(
+            query, target_score_range[0], target_score_range[1], limit=top_k
+        )
         
         print(f"תוצאות עם התאמה {target_score_range[0]*100:.0f}-{target_score_range[1]*100:.0f}%:")
         print(f"  נמצאו: {len(target_results)} תוצאות")
@@ -78,13 +65,17 @@ def search_and_show(query: str, target_score_range: tuple = (0.65, 0.75), top_k:
             
             # Ask which to open
             print("פותח את התמונות...")
-            for result in to_show:
-                open_image(Path(result.file_path))
+            open_image([Path(result.file_path) for result in to_show])
             
             return target_results
         else:
             # Show closest results
             print("לא נמצאו תוצאות בטווח המבוקש.")
+            results = search_engine.search_by_text(query, top_k=top_k)
+            if not results:
+                print("❌ לא נמצאו תוצאות")
+                return []
+            
             print("התמונות הקרובות ביותר:")
             print()
             
@@ -122,11 +113,24 @@ def main():
     print("=" * 60)
     print()
     
+    # Load the model and index once for all queries
+    try:
+        config = load_config(Path("config_optimized.yaml"))
+        print("טוען מנוע חיפוש...")
+        search_engine = ImageSearchEngine(config)
+        search_engine.initialize()
+    except Exception as e:
+        print(f"❌ שגיאה: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print()
+    
     all_results = []
     
     for query in queries:
         try:
-            results = search_and_show(query, target_score_range=(0.65, 0.75), top_k=50)
+            results = search_and_show(query, search_engine, target_score_range=(0.65, 0.75), top_k=50)
             all_results.extend(results)
             
             print()
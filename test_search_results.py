@@ -11,6 +11,10 @@ import time
 
 BASE_URL = "http://localhost:8000"
 
+# One pooled keep-alive session for all requests to the local server
+SESSION = requests.Session()
+SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
 def test_query(query: str, top_k: int = 10, min_score: float = 0.3):
     """Test a single query and analyze results."""
     print(f"\n{'='*70}")
@@ -19,7 +23,7 @@ def test_query(query: str, top_k: int = 10, min_score: float = 0.3):
     
     try:
         start_time = time.time()
-        response = requests.get(
+        response = SESSION.get(
             f"{BASE_URL}/search/text",
             params={"q": query, "top_k": top_k},
             timeout=60
@@ -32,9 +36,51 @@ def test_query(query: str, top_k: int = 10, min_score: float = 0.3):
             return False
         
         data = response.json()
-        results = data.get("results", [])
-        
         print(f"⏱️  Response time: {elapsed:.2f} seconds")
+        return analyze_results(data.get("results", []), min_score)
+        
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Network error: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_queries_batch(queries, top_k: int = 10, min_score: float = 0.3):
+    """Run all queries through one /search/text/batch request and analyze each."""
+    try:
+        start_time = time.time()
+        response = SESSION.post(
+            f"{BASE_URL}/search/text/batch",
+            json={"queries": queries, "top_k": top_k},
+            timeout=120
+        )
+        elapsed = time.time() - start_time
+        
+        if response.status_code != 200:
+            print(f"❌ Error: HTTP {response.status_code}")
+            print(f"   {response.text[:200]}")
+            return {query: False for query in queries}
+        
+        print(f"⏱️  Batch response time: {elapsed:.2f} seconds for {len(queries)} queries")
+        
+        results = {}
+        for search in response.json().get("searches", []):
+            print(f"\n{'='*70}")
+            print(f"🔍 Testing Query: '{search['query']}'")
+            print(f"{'='*70}")
+            results[search["query"]] = analyze_results(search.get("results", []), min_score)
+        return results
+        
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Network error: {e}")
+        return {query: False for query in queries}
+
+def analyze_results(results, min_score: float = 0.3):
+    """Print score statistics and top hits for one query's results."""
+    try:
         print(f"📊 Found {len(results)} results")
         
         if not results:
@@ -106,7 +152,7 @@ def test_server_health():
     print("=" * 70)
     
     try:
-        response = requests.get(f"{BASE_URL}/health", timeout=5)
+        response = SESSION.get(f"{BASE_URL}/health", timeout=5)
         if response.status_code == 200:
             print("✅ Server is running")
             return True
@@ -125,7 +171,7 @@ def test_stats():
     print("=" * 70)
     
     try:
-        response = requests.get(f"{BASE_URL}/stats", timeout=5)
+        response = SESSION.get(f"{BASE_URL}/stats", timeout=5)
         if response.status_code == 200:
             data = response.json()
             print(f"Total images: {data.get('total_images', 0):,}")
@@ -171,11 +217,8 @@ def main():
         "building"
     ]
     
-    results = {}
-    for query in test_queries:
-        success = test_query(query, top_k=10, min_score=0.3)
-        results[query] = success
-        time.sleep(1)  # Small delay between queries
+    # One request: the server encodes all queries together and searches the index once
+    results = test_queries_batch(test_queries, top_k=10, min_score=0.3)
     
     # Summary
     print("\n" + "=" * 70)
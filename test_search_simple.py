@@ -10,6 +10,10 @@ import requests
 
 BASE_URL = "http://localhost:8000"
 
+# One pooled keep-alive session for all requests to the local server
+SESSION = requests.Session()
+SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
 def test_query(query: str, top_k: int = 10):
     """Test a text query and analyze results."""
     print(f"\n{'='*70}")
@@ -17,7 +21,7 @@ def test_query(query: str, top_k: int = 10):
     print(f"{'='*70}")
     
     try:
-        response = requests.get(
+        response = SESSION.get(
             f"{BASE_URL}/search/text",
             params={"q": query, "top_k": top_k},
             timeout=60
@@ -6,12 +6,28 @@ Verifies that search works and results are valid images.
 
 import requests
 import os
+import sys
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # orjson not installed, encode request bodies with stdlib json
+
 API_URL = "http://localhost:5001/api/search/text"
 
+# One pooled keep-alive session for all requests to the search server
+SESSION = requests.Session()
+SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16))
+SESSION.headers["Connection"] = "keep-alive"
+
+# Concurrent requests when the server has no batch endpoint (<= pool size)
+SEARCH_WORKERS = 8
+
 # 50 diverse search queries covering many categories
 QUERIES = [
     # Nature & Landscapes
@@ -75,52 +91,118 @@ QUERIES = [
     "colorful balloons",
 ]
 
+BATCH_API_URL = f"{API_URL}/batch"
+
+# Retry throttled requests (HTTP 429/503) with exponential backoff
+THROTTLE_STATUSES = (429, 503)
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 0.1
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def encode_json(payload):
+    """Encode a request body once, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+def post_with_backoff(url, payload, timeout):
+    """POST a JSON body through the shared session, backing off only when the server throttles."""
+    body = encode_json(payload)  # Encoded once, reused across retries
+    for attempt in range(MAX_ATTEMPTS):
+        response = SESSION.post(url, data=body, headers=JSON_HEADERS, timeout=timeout)
+        if response.status_code not in THROTTLE_STATUSES or attempt == MAX_ATTEMPTS - 1:
+            return response
+        time.sleep(BACKOFF_SECONDS * 2 ** attempt)
+
+@lru_cache(maxsize=None)
+def list_dir(directory):
+    """Names in a directory from one scandir pass (None if it can't be listed)."""
+    try:
+        with os.scandir(directory) as entries:
+            return frozenset(entry.name for entry in entries)
+    except OSError:
+        return None
+
+def path_exists(path):
+    """Check a result path against its directory listing instead of a per-file stat."""
+    names = list_dir(os.path.dirname(path))
+    if names is None:
+        return os.path.exists(path)
+    return os.path.basename(path) in names
+
+def check_results(query, results):
+    """Verify one query's results point at existing image files."""
+    if not results:
+        return {"query": query, "status": "no_results", "count": 0}
+
+    # Check if result paths exist
+    valid_count = 0
+    invalid_paths = []
+    scores = []
+
+    for r in results[:5]:  # Check first 5 results
+        path = r.get("path", "")
+        score = r.get("score", 0)
+        scores.append(score)
+
+        if path and path_exists(path):
+            valid_count += 1
+        else:
+            invalid_paths.append(path)
+
+    return {
+        "query": query,
+        "status": "success" if valid_count > 0 else "paths_invalid",
+        "count": len(results),
+        "valid_files": valid_count,
+        "checked": min(5, len(results)),
+        "avg_score": sum(scores) / len(scores) if scores else 0,
+        "top_score": max(scores) if scores else 0,
+        "sample_path": results[0].get("path", "") if results else "",
+        "invalid_paths": invalid_paths[:2] if invalid_paths else []
+    }
+
 def test_search(query, top_k=10):
     """Run a single search and verify results."""
     try:
-        response = requests.post(API_URL, json={"query": query, "top_k": top_k}, timeout=60)
+        response = post_with_backoff(API_URL, {"query": query, "top_k": top_k}, timeout=60)
 
         if response.status_code != 200:
             return {"query": query, "status": "error", "error": f"HTTP {response.status_code}"}
 
         data = response.json()
-        results = data.get("results", [])
-
-        if not results:
-            return {"query": query, "status": "no_results", "count": 0}
-
-        # Check if result paths exist
-        valid_count = 0
-        invalid_paths = []
-        scores = []
-
-        for r in results[:5]:  # Check first 5 results
-            path = r.get("path", "")
-            score = r.get("score", 0)
-            scores.append(score)
-
-            if path and os.path.exists(path):
-                valid_count += 1
-            else:
-                invalid_paths.append(path)
-
-        return {
-            "query": query,
-            "status": "success" if valid_count > 0 else "paths_invalid",
-            "count": len(results),
-            "valid_files": valid_count,
-            "checked": min(5, len(results)),
-            "avg_score": sum(scores) / len(scores) if scores else 0,
-            "top_score": max(scores) if scores else 0,
-            "sample_path": results[0].get("path", "") if results else "",
-            "invalid_paths": invalid_paths[:2] if invalid_paths else []
-        }
+        return check_results(query, data.get("results", []))
 
     except requests.exceptions.Timeout:
         return {"query": query, "status": "timeout"}
     except Exception as e:
         return {"query": query, "status": "error", "error": str(e)}
 
+def test_search_batch(queries, top_k=10):
+    """
+    Run all queries in one batch request and verify each query's results.
+
+    Returns None when the server has no batch endpoint, so the caller can
+    fall back to one request per query.
+    """
+    try:
+        response = post_with_backoff(BATCH_API_URL, {"queries": queries, "top_k": top_k}, timeout=300)
+    except requests.exceptions.RequestException:
+        return None
+
+    if response.status_code in (404, 405):
+        return None
+    if response.status_code != 200:
+        return [{"query": q, "status": "error", "error": f"HTTP {response.status_code}"} for q in queries]
+
+    # One entry per query, in request order
+    searches = response.json().get("searches", [])
+    return [
+        check_results(query, searches[i].get("results", []) if i < len(searches) else [])
+        for i, query in enumerate(queries)
+    ]
+
 def main():
     print("=" * 70)
     print("SEMANTIC SEARCH TEST - 50 Queries")
@@ -129,7 +211,7 @@ def main():
 
     # Check server is up
     try:
-        status = requests.get("http://localhost:5001/api/status", timeout=5)
+        status = SESSION.get("http://localhost:5001/api/status", timeout=5)
         print(f"Server status: {status.status_code}")
     except:
         print("ERROR: Server not responding!")
@@ -142,24 +224,31 @@ def main():
 
     start_time = time.time()
 
-    for i, query in enumerate(QUERIES, 1):
-        print(f"[{i:2d}/50] Testing: {query[:40]:<40}", end=" ")
+    # One round-trip for all queries; older servers get one request per query
+    batch_results = test_search_batch(QUERIES)
+    if batch_results is None:
+        print(f"Batch endpoint not available, running {SEARCH_WORKERS} queries at a time")
+        # Overlap the HTTP round-trips; map() keeps results in query order
+        with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+            batch_results = list(executor.map(test_search, QUERIES))
+
+    # Collect progress lines and write them in one go (one write when piped)
+    lines = []
+    for i, (query, result) in enumerate(zip(QUERIES, batch_results), 1):
+        prefix = f"[{i:2d}/50] Testing: {query[:40]:<40}"
 
-        result = test_search(query)
         results.append(result)
 
         if result["status"] == "success":
             success_count += 1
             total_valid_files += result.get("valid_files", 0)
-            print(f"✅ {result['count']:3d} results, score: {result['top_score']:.3f}")
+            lines.append(f"{prefix} ✅ {result['count']:3d} results, score: {result['top_score']:.3f}")
         else:
             failed_count += 1
-            print(f"❌ {result['status']}: {result.get('error', result.get('invalid_paths', ''))}")
-
-        # Small delay to not overwhelm
-        time.sleep(0.1)
+            lines.append(f"{prefix} ❌ {result['status']}: {result.get('error', result.get('invalid_paths', ''))}")
 
     elapsed = time.time() - start_time
+    sys.stdout.write("\n".join(lines) + "\n")
 
     print()
     print("=" * 70)
@@ -213,8 +302,13 @@ def main():
     print("=" * 70)
 
     # Save detailed results
-    with open("/Users/aviz/images-finder/search_test_results.json", "w") as f:
-        json.dump(results, f, indent=2)
+    results_path = "/Users/aviz/images-finder/search_test_results.json"
+    if orjson is not None:
+        with open(results_path, "wb") as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    else:
+        with open(results_path, "w") as f:
+            json.dump(results, f, indent=2)
     print(f"\nDetailed results saved to search_test_results.json")
 
 if __name__ == "__main__":
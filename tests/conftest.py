@@ -1,16 +1,38 @@
 """Pytest configuration and shared fixtures."""
 
+import os
+
+# Single-threaded BLAS/OpenMP for the tiny test matrices; must be set before
+# numpy/faiss load their thread pools
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+
 import pytest
+import io
 import tempfile
 import shutil
+from functools import lru_cache
 from pathlib import Path
 import numpy as np
+import faiss
+import torch
 from PIL import Image
 import sqlite3
 
 from src.config import Config
 from src.database import ImageDatabase
 from src.embeddings import EmbeddingCache
+from src.faiss_index import FAISSIndex
+
+
+@pytest.fixture(scope="session", autouse=True)
+def faiss_single_thread():
+    """Run FAISS single-threaded: OpenMP spin-up and contention cost more than
+    parallelism gains on 500-vector test indexes."""
+    previous = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+    yield
+    faiss.omp_set_num_threads(previous)
 
 
 @pytest.fixture
@@ -50,37 +72,76 @@ def test_db(test_config):
     db.close()
 
 
+# Constant encoder outputs for mocked CLIP models (shared; never modified in place)
+FAKE_IMAGE_EMBEDDING = torch.zeros(1, 128)
+FAKE_TEXT_EMBEDDING = torch.zeros(1, 128)
+
+SAMPLE_COLORS = ['red', 'green', 'blue', 'yellow', 'cyan']
+
+
+@pytest.fixture(scope="session")
+def sample_image_templates(tmp_path_factory):
+    """Encode the sample JPEGs once per session (one per color)."""
+    template_dir = tmp_path_factory.mktemp("sample_images")
+    templates = []
+    for color in SAMPLE_COLORS:
+        img_path = template_dir / f"{color}.jpg"
+        Image.new('RGB', (256, 256), color=color).save(img_path)
+        templates.append(img_path)
+    return templates
+
+
+@lru_cache(maxsize=None)
+def _encoded_jpeg(size: tuple, color: str) -> bytes:
+    """JPEG bytes for a solid-color image, encoded once per (size, color)."""
+    buf = io.BytesIO()
+    Image.new('RGB', size, color=color).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
 @pytest.fixture
-def sample_image(temp_dir):
+def make_test_images():
+    """Factory writing n identical solid-color JPEGs without re-encoding each one."""
+    def make(directory: Path, n: int, size=(256, 256), color='red', prefix='test', start=0):
+        data = _encoded_jpeg(tuple(size), color)
+        paths = [directory / f"{prefix}_{i}.jpg" for i in range(start, start + n)]
+        for path in paths:
+            path.write_bytes(data)
+        return paths
+    return make
+
+
+@pytest.fixture
+def sample_image(temp_dir, sample_image_templates):
     """Create a sample test image."""
     img_path = temp_dir / "test_image.jpg"
-    img = Image.new('RGB', (256, 256), color='red')
-    img.save(img_path)
+    shutil.copyfile(sample_image_templates[0], img_path)
     return img_path
 
 
 @pytest.fixture
-def sample_images(temp_dir):
+def sample_images(temp_dir, sample_image_templates):
     """Create multiple sample test images."""
     images = []
-    colors = ['red', 'green', 'blue', 'yellow', 'cyan']
 
-    for i, color in enumerate(colors):
+    for i, template in enumerate(sample_image_templates):
         img_path = temp_dir / f"test_image_{i}.jpg"
-        img = Image.new('RGB', (256, 256), color=color)
-        img.save(img_path)
+        shutil.copyfile(template, img_path)
         images.append(img_path)
 
     return images
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_embeddings():
-    """Create sample embeddings for testing."""
-    np.random.seed(42)
-    embeddings = np.random.randn(500, 128).astype(np.float32)  # Increased from 100 to 500
-    # Normalize to unit length
-    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    """Create sample embeddings for testing (shared read-only; .copy() to mutate)."""
+    rng = np.random.default_rng(42)
+    embeddings = rng.standard_normal((500, 128), dtype=np.float32)  # Increased from 100 to 500
+    # Normalize to unit length in place (C-contiguous float32, as FAISS expects)
+    faiss.normalize_L2(embeddings)
+    assert embeddings.flags['C_CONTIGUOUS']
+    # Built once per session, so no test may modify it in place
+    embeddings.setflags(write=False)
     return embeddings
 
 
@@ -92,6 +153,44 @@ def embedding_cache(test_config, sample_embeddings):
     return cache
 
 
+def _copy_index(template):
+    """Wrap a private copy of a built template index (serialize round-trip handles every index type)."""
+    index = FAISSIndex(embedding_dim=template.embedding_dim)
+    index.index = faiss.deserialize_index(faiss.serialize_index(template.index))
+    index.is_trained = True
+    index._is_ivf = template._is_ivf
+    return index
+
+
+@pytest.fixture(scope="session")
+def flat_index_template(sample_embeddings):
+    """Flat index over sample_embeddings, built once per session."""
+    index = FAISSIndex(embedding_dim=128)
+    index.build_flat_index(sample_embeddings, use_gpu=False)
+    return index
+
+
+@pytest.fixture(scope="session", params=[True, False], ids=["fastscan", "pq"])
+def ivf_pq_index_template(request, sample_embeddings):
+    """Trained IVF-PQ index (SIMD FastScan and scalar PQ kernels); built once per session."""
+    index = FAISSIndex(embedding_dim=128)
+    index.build_ivf_pq_index(sample_embeddings, nlist=10, m=16, nbits=8, use_gpu=False,
+                             fastscan=request.param)
+    return index
+
+
+@pytest.fixture
+def flat_index(flat_index_template):
+    """Fresh copy of the flat template for one test."""
+    return _copy_index(flat_index_template)
+
+
+@pytest.fixture
+def ivf_pq_index(ivf_pq_index_template):
+    """Fresh copy of the IVF-PQ template for one test."""
+    return _copy_index(ivf_pq_index_template)
+
+
 @pytest.fixture
 def populated_db(test_db, sample_images):
     """Create a database populated with sample images."""
@@ -104,15 +203,27 @@ def populated_db(test_db, sample_images):
             height=256,
             format="JPEG",
             thumbnail_path=str(img_path),
-            embedding_index=i
+            embedding_index=i,
+            auto_commit=False
         )
+    test_db.commit()  # One transaction for all rows
     return test_db
 
 
 @pytest.fixture
 def mock_clip_model(mocker):
-    """Mock the OpenCLIP model for faster tests."""
+    """Patch OpenCLIP so EmbeddingModel loads a mocked model; yields that model.
+
+    open_clip.tokenize is patched too (one row of tokens per text), so no
+    weights are downloaded. The 128-dim default outputs can be overridden per test.
+    """
     mock_model = mocker.MagicMock()
-    mock_model.encode_image.return_value = np.random.randn(1, 128).astype(np.float32)
-    mock_model.encode_text.return_value = np.random.randn(1, 128).astype(np.float32)
-    return mock_model
+    mock_model.encode_image.return_value = FAKE_IMAGE_EMBEDDING
+    mock_model.encode_text.return_value = FAKE_TEXT_EMBEDDING
+    preprocess = mocker.MagicMock(return_value=torch.zeros(3, 8, 8))
+    mocker.patch(
+        'open_clip.create_model_and_transforms',
+        return_value=(mock_model, None, preprocess)
+    )
+    mocker.patch('open_clip.tokenize', side_effect=lambda texts: torch.zeros(len(texts), 77))
+    yield mock_model
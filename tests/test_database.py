@@ -6,6 +6,14 @@ from datetime import datetime
 from src.database import ImageDatabase
 
 
+@pytest.fixture
+def test_db():
+    """In-memory database (overrides conftest): these tests don't need the file."""
+    db = ImageDatabase(":memory:")
+    yield db
+    db.close()
+
+
 def test_database_initialization(test_db):
     """Test database initialization and schema creation."""
     cursor = test_db.conn.cursor()
@@ -42,6 +50,38 @@ def test_add_image(test_db, sample_image):
     assert image['height'] == 256
 
 
+def test_add_images_bulk(test_db, sample_images):
+    """Test bulk insert skips already-registered paths."""
+    test_db.add_image(
+        file_path=str(sample_images[0]),
+        file_name=sample_images[0].name,
+        file_size=1,
+        width=1,
+        height=1,
+        format="JPEG"
+    )
+
+    rows = [
+        {
+            'file_path': str(path),
+            'file_name': path.name,
+            'file_size': 1024,
+            'width': 256,
+            'height': 256,
+            'format': "JPEG",
+            'sha256_hash': f"hash{i}",
+        }
+        for i, path in enumerate(sample_images)
+    ]
+    inserted = test_db.add_images_bulk(rows)
+
+    assert inserted == len(sample_images) - 1
+    assert test_db.get_total_images() == len(sample_images)
+    assert test_db.get_image_by_path(str(sample_images[0]))['file_size'] == 1
+    assert test_db.get_image_by_path(str(sample_images[2]))['sha256_hash'] == "hash2"
+    assert test_db.add_images_bulk([]) == 0
+
+
 def test_add_duplicate_image(test_db, sample_image):
     """Test adding the same image twice (should update)."""
     # Add first time
@@ -117,6 +157,19 @@ def test_get_images_by_indices(populated_db):
     assert all(img['embedding_index'] in indices for img in images)
 
 
+def test_get_images_by_indices_single_query(populated_db):
+    """Test that a large index lookup is one SELECT, not one query per index."""
+    traces = []
+    populated_db.conn.set_trace_callback(traces.append)
+    try:
+        images = populated_db.get_images_by_indices(list(range(500)))
+    finally:
+        populated_db.conn.set_trace_callback(None)
+
+    assert len(images) == 5
+    assert len([t for t in traces if t.strip().upper().startswith("SELECT")]) == 1
+
+
 def test_get_unprocessed_images(test_db, sample_images):
     """Test retrieving unprocessed images."""
     # Add some processed and unprocessed images
@@ -128,7 +181,8 @@ def test_get_unprocessed_images(test_db, sample_images):
             width=256,
             height=256,
             format="JPEG",
-            embedding_index=i  # Processed
+            embedding_index=i,  # Processed
+            auto_commit=False
         )
 
     for img_path in sample_images[3:]:
@@ -139,8 +193,10 @@ def test_get_unprocessed_images(test_db, sample_images):
             width=256,
             height=256,
             format="JPEG",
-            embedding_index=None  # Unprocessed
+            embedding_index=None,  # Unprocessed
+            auto_commit=False
         )
+    test_db.commit()
 
     unprocessed = test_db.get_unprocessed_images()
     assert len(unprocessed) == 2
@@ -163,13 +219,80 @@ def test_get_processed_count(test_db, sample_images):
             width=256,
             height=256,
             format="JPEG",
-            embedding_index=i
+            embedding_index=i,
+            auto_commit=False
         )
+    test_db.commit()
 
     processed = test_db.get_processed_count()
     assert processed == 3
 
 
+def test_set_embedding_indices(test_db, sample_images):
+    """Test bulk assignment of embedding indices keeps the other columns."""
+    ids = [
+        test_db.add_image(
+            file_path=str(path),
+            file_name=path.name,
+            file_size=1024,
+            width=256,
+            height=256,
+            format="JPEG",
+            sha256_hash=f"hash{i}"
+        )
+        for i, path in enumerate(sample_images[:3])
+    ]
+
+    test_db.set_embedding_indices([(10, ids[0]), (11, ids[2])])
+
+    assert test_db.get_processed_count() == 2
+    record = test_db.get_image_by_embedding_index(11)
+    assert record['id'] == ids[2]
+    assert record['sha256_hash'] == "hash2"
+    assert test_db.get_image_by_path(str(sample_images[1]))['embedding_index'] is None
+
+
+def test_stats_summary_tracks_changes(test_db, sample_images):
+    """Test that trigger-maintained stats follow inserts, updates and deletes."""
+    hashes = ["a", "a", "b", "a", None]
+    ids = [
+        test_db.add_image(
+            file_path=str(path),
+            file_name=path.name,
+            file_size=1024,
+            width=256,
+            height=256,
+            format="JPEG",
+            sha256_hash=h,
+            perceptual_hash="p"
+        )
+        for path, h in zip(sample_images, hashes)
+    ]
+    test_db.set_embedding_indices([(0, ids[0]), (1, ids[1])])
+    test_db.add_failed_image("/missing.jpg", "error")
+
+    summary = test_db.get_stats_summary()
+    assert summary['total'] == 5
+    assert summary['with_embedding'] == 2
+    assert summary['failed'] == 1
+    assert summary['sha256_rows'] == 4
+    assert summary['sha256_dup_groups'] == 1
+    assert summary['sha256_duplicates'] == 2
+    assert summary['phash_dup_groups'] == 1
+    assert summary['phash_duplicates'] == 4
+
+    test_db.conn.execute("DELETE FROM images WHERE id IN (?, ?)", (ids[0], ids[3]))
+    test_db.conn.execute("UPDATE images SET sha256_hash = 'b' WHERE id = ?", (ids[4],))
+    test_db.conn.commit()
+
+    summary = test_db.get_stats_summary()
+    assert summary['total'] == 3
+    assert summary['with_embedding'] == 1
+    assert summary['sha256_rows'] == 3
+    assert summary['sha256_dup_groups'] == 1  # "b" x2, "a" x1
+    assert summary['sha256_duplicates'] == 1
+
+
 def test_add_failed_image(test_db, sample_image):
     """Test logging failed images."""
     test_db.add_failed_image(str(sample_image), "Test error message")
@@ -182,6 +305,19 @@ def test_add_failed_image(test_db, sample_image):
     assert row['error_message'] == "Test error message"
 
 
+def test_add_failed_image_deferred_commit(test_db, sample_image):
+    """Test that failures logged without auto_commit land on the next commit."""
+    test_db.add_failed_image(str(sample_image), "Deferred error", auto_commit=False)
+    assert test_db.conn.in_transaction
+
+    test_db.commit()
+    assert not test_db.conn.in_transaction
+
+    cursor = test_db.conn.cursor()
+    cursor.execute("SELECT error_message FROM failed_images WHERE file_path = ?", (str(sample_image),))
+    assert cursor.fetchone()['error_message'] == "Deferred error"
+
+
 def test_update_processing_status(test_db):
     """Test updating processing status."""
     test_db.update_processing_status(
@@ -219,3 +355,46 @@ def test_context_manager(test_config):
 
     # Database should be closed after context
     # (We can't easily test this without checking internal state)
+
+
+def test_reopen_persists_rows(test_config, sample_image):
+    """Test that committed rows and stats counters survive reopening the file."""
+    with ImageDatabase(test_config.db_path) as db:
+        db.add_image(
+            file_path=str(sample_image),
+            file_name=sample_image.name,
+            file_size=1024,
+            width=256,
+            height=256,
+            format="JPEG",
+            embedding_index=0
+        )
+
+    with ImageDatabase(test_config.db_path) as db:
+        assert db.get_image_by_path(str(sample_image))['embedding_index'] == 0
+        assert db.get_total_images() == 1
+        assert db.get_processed_count() == 1
+
+
+def test_detect_duplicates(test_db, sample_images):
+    """Test perceptual-hash duplicate detection within a threshold."""
+    hashes = ['ffffffffffffffff', 'fffffffffffffff0', '0000000000000000', 'ffffffffffffffff', None]
+    for path, phash in zip(sample_images, hashes):
+        test_db.add_image(
+            file_path=str(path),
+            file_name=path.name,
+            file_size=1024,
+            width=256,
+            height=256,
+            format="JPEG",
+            perceptual_hash=phash
+        )
+    ids = [test_db.get_image_by_path(str(p))['id'] for p in sample_images]
+
+    duplicates = test_db.detect_duplicates(hash_threshold=5)
+
+    assert duplicates == [
+        (ids[1], ids[0], 4),
+        (ids[3], ids[0], 0),
+        (ids[3], ids[1], 4),
+    ]
@@ -21,6 +21,23 @@ def test_embedding_cache_save_and_load(test_config, sample_embeddings):
     assert len(cache) == len(sample_embeddings)
 
 
+def test_embedding_cache_mmap_load(test_config, sample_embeddings):
+    """Test that mmap_mode='r' maps the file instead of reading it into RAM."""
+    EmbeddingCache(test_config.embeddings_path).save(sample_embeddings)
+
+    cache = EmbeddingCache(test_config.embeddings_path)
+    loaded = cache.load(mmap_mode='r')
+
+    assert isinstance(loaded, np.memmap)
+    assert not loaded.flags['WRITEABLE']
+    assert np.array_equal(loaded, sample_embeddings)
+
+    # Appending materializes the cache as a regular in-memory array
+    cache.add_embeddings(sample_embeddings[:2])
+    assert not isinstance(cache.embeddings, np.memmap)
+    assert len(cache) == len(sample_embeddings) + 2
+
+
 def test_embedding_cache_add_embeddings(test_config, sample_embeddings):
     """Test adding embeddings to cache."""
     cache = EmbeddingCache(test_config.embeddings_path)
@@ -39,6 +56,19 @@ def test_embedding_cache_add_embeddings(test_config, sample_embeddings):
     assert np.array_equal(cache.embeddings[50:], new_embeddings)
 
 
+def test_embedding_cache_many_small_adds(test_config, sample_embeddings):
+    """Test that repeated small appends are joined once, in order."""
+    cache = EmbeddingCache(test_config.embeddings_path)
+    cache.save(sample_embeddings[:100])
+
+    for start in range(100, 500, 4):
+        cache.add_embeddings(sample_embeddings[start:start + 4])
+
+    assert len(cache) == len(sample_embeddings)
+    assert np.array_equal(cache.embeddings, sample_embeddings)
+    assert cache.embeddings is cache.embeddings  # Materialized once, then reused
+
+
 def test_embedding_cache_get_embeddings(test_config, sample_embeddings):
     """Test retrieving embeddings by indices."""
     cache = EmbeddingCache(test_config.embeddings_path)
@@ -84,23 +114,8 @@ def test_embedding_cache_get_without_load(test_config):
 # Integration tests should cover the full model functionality.
 
 
-def test_embedding_model_mock_initialization(mocker):
+def test_embedding_model_mock_initialization(mock_clip_model):
     """Test EmbeddingModel initialization with mocked model."""
-    # Mock open_clip functions
-    mock_model = mocker.MagicMock()
-    mock_preprocess = mocker.MagicMock()
-    mock_tokenize = mocker.MagicMock()
-
-    mocker.patch(
-        'open_clip.create_model_and_transforms',
-        return_value=(mock_model, None, mock_preprocess)
-    )
-    mocker.patch('open_clip.tokenize', mock_tokenize)
-
-    # Mock model output for embedding dimension detection
-    import torch
-    mock_model.encode_image.return_value = torch.zeros(1, 128)
-
     from src.embeddings import EmbeddingModel
 
     model = EmbeddingModel(device='cpu')
@@ -109,6 +124,96 @@ def test_embedding_model_mock_initialization(mocker):
     assert model.device == 'cpu'
 
 
+def test_compiled_encoder_pads_to_fixed_batch(mocker, mock_clip_model):
+    """Test that small batches are padded for the compiled encoder and sliced back."""
+    import torch
+
+    from src.embeddings import EmbeddingModel
+
+    model = EmbeddingModel(device='cpu', compile=True, compile_batch_size=4)
+    assert model._compiled_encode_image is None  # CPU stays eager
+
+    seen_shapes = []
+
+    def fake_compiled(images):
+        seen_shapes.append(tuple(images.shape))
+        return torch.ones(images.shape[0], 128)
+
+    model._compiled_encode_image = fake_compiled
+    out = model._encode_image_tensor(torch.zeros(3, 3, 8, 8))
+
+    assert seen_shapes == [(4, 3, 8, 8)]
+    assert out.shape == (3, 128)
+
+    # A failing compiled graph falls back to eager mode permanently
+    model._compiled_encode_image = mocker.MagicMock(side_effect=RuntimeError("boom"))
+    mock_clip_model.encode_image.return_value = torch.zeros(3, 128)
+    assert model._encode_image_tensor(torch.zeros(3, 3, 8, 8)).shape == (3, 128)
+    assert model._compiled_encode_image is None
+
+
+def test_half_precision_output_normalized_in_fp32(mock_clip_model):
+    """Test that FP16 encoder output comes back as normalized float32."""
+    import torch
+
+    from src.embeddings import EmbeddingModel
+
+    model = EmbeddingModel(device='cpu', mixed_precision=True)
+    assert model.mixed_precision is False  # autocast is CUDA-only
+
+    mock_clip_model.encode_text.return_value = torch.full((2, 128), 3.0, dtype=torch.float16)
+    out = model.encode_text(["a", "b"])
+
+    assert out.dtype == np.float32
+    assert np.allclose(np.linalg.norm(out, axis=1), 1.0)
+
+
+def test_encode_text_batches_prompts(mock_clip_model):
+    """Test that several prompts are tokenized and encoded in a single call."""
+    import torch
+
+    mock_clip_model.encode_text.return_value = torch.ones(3, 128)
+
+    from src.embeddings import EmbeddingModel
+
+    model = EmbeddingModel(device='cpu')
+    out = model.encode_text(("a cat", "a dog", "a car"))
+
+    assert out.shape == (3, 128)
+    model.tokenizer.assert_called_once_with(["a cat", "a dog", "a car"])
+    mock_clip_model.encode_text.assert_called_once()
+
+
+def test_stage_images_is_passthrough_on_cpu(mock_clip_model):
+    """Test that staging is a no-op on CPU and staged batches encode as one batch."""
+    import torch
+
+    from src.embeddings import EmbeddingModel, StagedBatch
+
+    model = EmbeddingModel(device='cpu')
+    images = [torch.zeros(3, 8, 8), torch.zeros(3, 8, 8)]
+    assert model.stage_images(images) is images
+
+    mock_clip_model.encode_image.return_value = torch.ones(2, 128)
+    out = model.encode_images(StagedBatch(torch.zeros(2, 3, 8, 8)), batch_size=1)
+
+    assert out.shape == (2, 128)
+    assert mock_clip_model.encode_image.call_args[0][0].shape == (2, 3, 8, 8)
+
+
+def test_warmup_runs_text_and_image_encoders(mock_clip_model):
+    """Test that warmup exercises both encoders once."""
+    from src.embeddings import EmbeddingModel
+
+    model = EmbeddingModel(device='cpu')
+    mock_clip_model.encode_image.reset_mock()
+
+    model.warmup()
+
+    mock_clip_model.encode_text.assert_called_once()
+    mock_clip_model.encode_image.assert_called_once()
+
+
 def test_embedding_cache_add_to_empty(test_config, sample_embeddings):
     """Test adding embeddings to empty cache."""
     cache = EmbeddingCache(test_config.embeddings_path)
@@ -129,3 +234,37 @@ def test_embedding_cache_file_format(test_config, sample_embeddings):
 
     assert loaded.shape == sample_embeddings.shape
     assert loaded.dtype == sample_embeddings.dtype
+
+
+def test_embedding_cache_float16(test_config, sample_embeddings):
+    """Test that a float16 cache halves storage and stays close to the originals."""
+    cache = EmbeddingCache(test_config.embeddings_path, dtype="float16")
+    cache.save(sample_embeddings)
+
+    loaded = np.load(test_config.embeddings_path)
+    assert loaded.dtype == np.float16
+    assert loaded.nbytes == sample_embeddings.nbytes // 2
+    assert np.allclose(loaded, sample_embeddings, atol=1e-3)
+
+    with pytest.raises(ValueError):
+        EmbeddingCache(test_config.embeddings_path, dtype="int8")
+
+
+def test_embedding_cache_resize_in_place(test_config, sample_embeddings):
+    """Test growing and shrinking the cache file keeps existing rows."""
+    cache = EmbeddingCache(test_config.embeddings_path)
+
+    grown = cache.resize(3, 128)
+    grown[:] = sample_embeddings[:3]
+    grown.flush()
+    del grown
+
+    grown = cache.resize(5, 128)
+    assert np.array_equal(grown[:3], sample_embeddings[:3])
+    assert not grown[3:].any()
+    del grown
+    assert np.load(test_config.embeddings_path).shape == (5, 128)
+
+    cache.resize(2, 128)
+    loaded = np.load(test_config.embeddings_path)
+    assert np.array_equal(loaded, sample_embeddings[:2])
@@ -4,7 +4,8 @@ import pytest
 import numpy as np
 import faiss
 
-from src.faiss_index import FAISSIndex, HybridSearch
+import src.faiss_index as faiss_index
+from src.faiss_index import FAISSIndex, HybridSearch, _as_float32
 
 
 def test_faiss_index_initialization():
@@ -26,6 +27,23 @@ def test_build_flat_index(sample_embeddings):
     assert index.index.ntotal == len(sample_embeddings)
 
 
+def test_build_flat_index_sq8(sample_embeddings, flat_index):
+    """Test that the int8 flat index ranks like the exact float32 index."""
+    index = FAISSIndex(embedding_dim=128)
+    index.build_flat_index(sample_embeddings, use_gpu=False, quant="sq8")
+
+    assert isinstance(index.index, faiss.IndexScalarQuantizer)
+    assert index.index.ntotal == len(sample_embeddings)
+
+    scores, indices = index.search(sample_embeddings[:5], k=10)
+    exact_scores, _ = flat_index.search(sample_embeddings[:5], k=10)
+    assert list(indices[:, 0]) == [0, 1, 2, 3, 4]
+    assert np.allclose(scores, exact_scores, atol=0.05)
+
+    with pytest.raises(ValueError):
+        index.build_flat_index(sample_embeddings, quant="pq")
+
+
 def test_build_ivf_pq_index(sample_embeddings):
     """Test building IVF-PQ index."""
     index = FAISSIndex(embedding_dim=128)
@@ -42,46 +60,96 @@ def test_build_ivf_pq_index(sample_embeddings):
     assert index.index.ntotal == len(sample_embeddings)
 
 
-def test_search_flat_index(sample_embeddings):
-    """Test search with flat index."""
+def test_build_ivf_pq_index_fastscan_toggle(sample_embeddings):
+    """Test that FastScan is the default PQ codec and plain PQ stays available."""
+    fast = FAISSIndex(embedding_dim=128)
+    fast.build_ivf_pq_index(sample_embeddings, nlist=10, m=16, nbits=8)
+    assert isinstance(fast.index, faiss.IndexIVFPQFastScan)
+
+    plain = FAISSIndex(embedding_dim=128)
+    plain.build_ivf_pq_index(sample_embeddings, nlist=10, m=16, nbits=8, fastscan=False)
+    assert isinstance(plain.index, faiss.IndexIVFPQ)
+
+
+def test_build_ivf_sq8_index(sample_embeddings):
+    """Test building IVF index with int8 scalar quantization."""
     index = FAISSIndex(embedding_dim=128)
+    index.build_ivf_pq_index(
+        sample_embeddings,
+        nlist=10,
+        use_gpu=False,
+        quant="sq8"
+    )
+
+    assert isinstance(index.index, faiss.IndexIVFScalarQuantizer)
+    assert index.index.ntotal == len(sample_embeddings)
+
+    distances, indices = index.search(sample_embeddings[0], k=5, nprobe=4)
+    assert indices[0, 0] == 0
+
+
+def test_build_ivf_index_unknown_quantization(sample_embeddings):
+    """Test that an unknown quantization raises error."""
+    index = FAISSIndex(embedding_dim=128)
+
+    with pytest.raises(ValueError):
+        index.build_ivf_pq_index(sample_embeddings, nlist=10, quant="opq")
+
+
+def test_keep_on_gpu_without_gpu(sample_embeddings):
+    """Test that keep_on_gpu falls back to a CPU index when no GPU is present."""
+    if faiss.get_num_gpus() > 0:
+        pytest.skip("GPU available")
+
+    index = FAISSIndex(embedding_dim=128)
+    index.build_flat_index(sample_embeddings, use_gpu=True, keep_on_gpu=True)
+
+    assert index.on_gpu is False
+    distances, indices = index.search(sample_embeddings[0], k=5)
+    assert indices[0, 0] == 0
+
+
+def test_move_to_gpu_without_gpu(sample_embeddings):
+    """Test that move_to_gpu leaves a working CPU index when no GPU is present."""
+    if faiss.get_num_gpus() > 0:
+        pytest.skip("GPU available")
+
+    index = FAISSIndex(embedding_dim=128)
+    with pytest.raises(RuntimeError):
+        index.move_to_gpu()
+
     index.build_flat_index(sample_embeddings, use_gpu=False)
+    assert index.move_to_gpu() is False
+    assert index.on_gpu is False
+    distances, indices = index.search(sample_embeddings[0], k=5)
+    assert indices[0, 0] == 0
+
 
+def test_search_flat_index(flat_index, sample_embeddings):
+    """Test search with flat index."""
     # Search with a query
     query = sample_embeddings[0:1]
-    distances, indices = index.search(query, k=5)
+    distances, indices = flat_index.search(query, k=5)
 
     assert distances.shape == (1, 5)
     assert indices.shape == (1, 5)
     assert indices[0, 0] == 0  # First result should be the query itself
 
 
-def test_search_ivf_pq_index(sample_embeddings):
+def test_search_ivf_pq_index(ivf_pq_index, sample_embeddings):
     """Test search with IVF-PQ index."""
-    index = FAISSIndex(embedding_dim=128)
-    index.build_ivf_pq_index(
-        sample_embeddings,
-        nlist=10,
-        m=16,
-        nbits=8,
-        use_gpu=False
-    )
-
     query = sample_embeddings[0:1]
-    distances, indices = index.search(query, k=5, nprobe=4)
+    distances, indices = ivf_pq_index.search(query, k=5, nprobe=4)
 
     assert distances.shape == (1, 5)
     assert indices.shape == (1, 5)
 
 
-def test_search_single_query(sample_embeddings):
+def test_search_single_query(flat_index, sample_embeddings):
     """Test search with single query vector (1D)."""
-    index = FAISSIndex(embedding_dim=128)
-    index.build_flat_index(sample_embeddings, use_gpu=False)
-
     # Query as 1D array
     query = sample_embeddings[0]
-    distances, indices = index.search(query, k=5)
+    distances, indices = flat_index.search(query, k=5)
 
     assert distances.shape == (1, 5)
     assert indices.shape == (1, 5)
@@ -104,6 +172,35 @@ def test_save_and_load_index(test_config, sample_embeddings):
     assert new_index.is_trained is True
 
 
+def test_loaded_ivf_index_applies_nprobe(test_config, sample_embeddings):
+    """Test that nprobe is applied to an IVF index after loading from disk."""
+    index = FAISSIndex(embedding_dim=128, index_path=test_config.index_path)
+    index.build_ivf_pq_index(sample_embeddings, nlist=10, m=16, nbits=8)
+    index.save()
+
+    loaded = FAISSIndex(embedding_dim=128, index_path=test_config.index_path)
+    loaded.load()
+    loaded.search(sample_embeddings[0], k=5, nprobe=7)
+
+    assert loaded.index.nprobe == 7
+
+
+def test_load_factory_fastscan_index(test_config, sample_embeddings):
+    """Test that a FastScan index built with index_factory loads and searches as IVF."""
+    factory_index = faiss.index_factory(128, "IVF10,PQ16x4fsr", faiss.METRIC_INNER_PRODUCT)
+    factory_index.train(sample_embeddings)
+    factory_index.add(sample_embeddings)
+    faiss.write_index(factory_index, str(test_config.index_path))
+
+    loaded = FAISSIndex(embedding_dim=128, index_path=test_config.index_path)
+    loaded.load()
+    distances, indices = loaded.search(sample_embeddings[0], k=5, nprobe=10)
+
+    assert isinstance(loaded.index, faiss.IndexIVFPQFastScan)
+    assert loaded.index.nprobe == 10
+    assert 0 in indices[0]
+
+
 def test_load_nonexistent_index(test_config):
     """Test loading index that doesn't exist."""
     index = FAISSIndex(embedding_dim=128, index_path=test_config.index_path)
@@ -126,6 +223,18 @@ def test_add_vectors(sample_embeddings):
     assert index.index.ntotal == len(sample_embeddings)
 
 
+def test_as_float32_avoids_copy(sample_embeddings):
+    """Test that contiguous FP32 input is passed through without copying."""
+    assert _as_float32(sample_embeddings) is sample_embeddings
+
+    converted = _as_float32(sample_embeddings.astype(np.float64))
+    assert converted.dtype == np.float32
+    assert converted.flags['C_CONTIGUOUS']
+
+    strided = _as_float32(sample_embeddings[:, ::2])
+    assert strided.flags['C_CONTIGUOUS']
+
+
 def test_search_without_index():
     """Test search without building index first."""
     index = FAISSIndex(embedding_dim=128)
@@ -142,20 +251,10 @@ def test_add_vectors_without_training():
         index.add_vectors(np.random.randn(10, 128).astype(np.float32))
 
 
-def test_hybrid_search(sample_embeddings):
+def test_hybrid_search(ivf_pq_index, sample_embeddings):
     """Test hybrid search (IVF-PQ + exact re-ranking)."""
-    # Build IVF-PQ index
-    ivf_index = FAISSIndex(embedding_dim=128)
-    ivf_index.build_ivf_pq_index(
-        sample_embeddings,
-        nlist=10,
-        m=16,
-        nbits=8,
-        use_gpu=False
-    )
-
     # Create hybrid search
-    hybrid = HybridSearch(ivf_index, sample_embeddings)
+    hybrid = HybridSearch(ivf_pq_index, sample_embeddings)
 
     # Search
     query = sample_embeddings[0]
@@ -171,30 +270,91 @@ def test_hybrid_search(sample_embeddings):
     assert indices[0] == 0  # First result should be the query
 
 
-def test_hybrid_search_quality(sample_embeddings):
-    """Test that hybrid search improves accuracy."""
-    # Build IVF-PQ index
-    ivf_index = FAISSIndex(embedding_dim=128)
-    ivf_index.build_ivf_pq_index(
-        sample_embeddings,
-        nlist=10,
-        m=16,
-        nbits=8,
-        use_gpu=False
+def test_hybrid_search_results_sorted(flat_index, sample_embeddings):
+    """Test that hybrid search returns top-k sorted by descending similarity."""
+    hybrid = HybridSearch(flat_index, sample_embeddings)
+
+    query = sample_embeddings[3]
+    distances, indices = hybrid.search(query, k=20, k_approximate=200)
+
+    expected = np.argsort(-(sample_embeddings @ query))[:20]
+    assert len(indices) == 20
+    assert np.all(np.diff(distances) <= 0)
+    assert set(indices.tolist()) == set(expected.tolist())
+
+
+def test_hybrid_search_batch_matches_single(flat_index, sample_embeddings):
+    """Test that batched hybrid search returns the same hits as per-query search."""
+    hybrid = HybridSearch(flat_index, sample_embeddings)
+
+    queries = sample_embeddings[[3, 7, 11]]
+    batched = hybrid.search_batch(queries, k=10, k_approximate=100)
+
+    assert len(batched) == 3
+    for query, (distances, indices) in zip(queries, batched):
+        expected_distances, expected_indices = hybrid.search(query, k=10, k_approximate=100)
+        assert np.array_equal(indices, expected_indices)
+        assert np.allclose(distances, expected_distances)
+
+
+def test_hybrid_rerank_numba_matches_numpy(flat_index, sample_embeddings, monkeypatch):
+    """Test that the fused numba re-rank agrees with the NumPy/BLAS path."""
+    if faiss_index.numba is None:
+        pytest.skip("numba not installed")
+    hybrid = HybridSearch(flat_index, sample_embeddings)
+    query = sample_embeddings[42]
+
+    fused_distances, fused_indices = hybrid.search(query, k=10, k_approximate=100)
+    monkeypatch.setattr(faiss_index, "numba", None)
+    distances, indices = hybrid.search(query, k=10, k_approximate=100)
+
+    assert fused_indices[0] == 42
+    assert np.array_equal(fused_indices, indices)
+    assert np.allclose(fused_distances, distances, atol=1e-5)
+
+
+def test_range_search_matches_threshold(flat_index, sample_embeddings):
+    """Test that range search returns exactly the vectors above the threshold, best first."""
+    query = sample_embeddings[5]
+    similarities = sample_embeddings @ query
+    threshold = float(np.sort(similarities)[-10])
+
+    scores, indices = flat_index.range_search(query, threshold - 1e-4)
+    hybrid_scores, hybrid_indices = HybridSearch(flat_index, sample_embeddings).range_search(
+        query, threshold - 1e-4, k_approximate=100
     )
 
+    assert set(indices.tolist()) == set(np.flatnonzero(similarities > threshold - 1e-4).tolist())
+    assert np.all(np.diff(scores) <= 0)
+    assert indices[0] == 5
+    assert set(hybrid_indices.tolist()) == set(indices.tolist())
+
+
+def test_hybrid_search_from_path(test_config, flat_index, sample_embeddings):
+    """Test hybrid search with a memory-mapped embeddings file."""
+    np.save(test_config.embeddings_path, sample_embeddings)
+
+    hybrid = HybridSearch(flat_index, test_config.embeddings_path)
+
+    assert isinstance(hybrid.embeddings_cache, np.memmap)
+
+    distances, indices = hybrid.search(sample_embeddings[7], k=5, k_approximate=50)
+    assert indices[0] == 7
+    assert distances.dtype == np.float32
+
+
+def test_hybrid_search_quality(ivf_pq_index, flat_index, sample_embeddings):
+    """Test that hybrid search improves accuracy."""
     # Create hybrid search
-    hybrid = HybridSearch(ivf_index, sample_embeddings)
+    hybrid = HybridSearch(ivf_pq_index, sample_embeddings)
 
     query = sample_embeddings[5]
 
     # Hybrid search
     hybrid_distances, hybrid_indices = hybrid.search(query, k=5)
 
-    # Build exact index for comparison
-    exact_index = FAISSIndex(embedding_dim=128)
-    exact_index.build_flat_index(sample_embeddings, use_gpu=False)
-    exact_distances, exact_indices = exact_index.search(query, k=5)
+    # Exact index for comparison
+    exact_distances, exact_indices = flat_index.search(query, k=5)
 
     # Hybrid should find the correct top result
     assert hybrid_indices[0] == exact_indices[0, 0]
@@ -210,22 +370,13 @@ def test_faiss_index_dimension_mismatch():
         index.build_flat_index(wrong_dim_embeddings)
 
 
-def test_search_with_nprobe(sample_embeddings):
+def test_search_with_nprobe(ivf_pq_index, sample_embeddings):
     """Test that nprobe parameter affects IVF search."""
-    index = FAISSIndex(embedding_dim=128)
-    index.build_ivf_pq_index(
-        sample_embeddings,
-        nlist=10,
-        m=16,
-        nbits=8,
-        use_gpu=False
-    )
-
     query = sample_embeddings[0]
 
     # Search with different nprobe values
-    _, indices_low = index.search(query, k=10, nprobe=1)
-    _, indices_high = index.search(query, k=10, nprobe=8)
+    _, indices_low = ivf_pq_index.search(query, k=10, nprobe=1)
+    _, indices_high = ivf_pq_index.search(query, k=10, nprobe=8)
 
     # Results should be valid
     assert indices_low.shape == (1, 10)
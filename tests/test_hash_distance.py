@@ -0,0 +1,44 @@
+"""Tests for perceptual hash distance module."""
+
+import numpy as np
+import imagehash
+
+import src.hash_distance as hash_distance
+from src.hash_distance import phashes_to_uint64, hamming_all
+
+
+HASHES = ['ffffffffffffffff', '0000000000000000', 'fffffffffffffff0', '8f373714acfcf4d0']
+
+
+def _expected(query_hex, corpus_hex):
+    query = imagehash.hex_to_hash(query_hex)
+    return [query - imagehash.hex_to_hash(h) for h in corpus_hex]
+
+
+def test_phashes_to_uint64():
+    """Test packing hex hashes into uint64."""
+    packed = phashes_to_uint64(HASHES)
+
+    assert packed.dtype == np.uint64
+    assert packed[0] == 0xFFFFFFFFFFFFFFFF
+    assert packed[1] == 0
+
+
+def test_hamming_all_matches_imagehash():
+    """Test distances agree with imagehash's Hamming distance."""
+    packed = phashes_to_uint64(HASHES)
+
+    for i, query in enumerate(HASHES):
+        distances = hamming_all(packed[i], packed)
+        assert distances.dtype == np.uint8
+        assert distances.tolist() == _expected(query, HASHES)
+
+
+def test_hamming_all_numpy_fallback(monkeypatch):
+    """Test the pure NumPy path when numba is unavailable."""
+    monkeypatch.setattr(hash_distance, "numba", None)
+    packed = phashes_to_uint64(HASHES)
+
+    distances = hamming_all(packed[3], packed)
+
+    assert distances.tolist() == _expected(HASHES[3], HASHES)
@@ -1,10 +1,15 @@
 """Tests for image processor module."""
 
+import os
 import pytest
 from pathlib import Path
 from PIL import Image
 
-from src.image_processor import ImageProcessor, scan_images
+import src.image_processor as image_processor
+from src.image_processor import (
+    ImageProcessor, scan_images, walk_images, path_hash, perceptual_hash, extension_set,
+    image_size
+)
 
 
 def test_image_processor_initialization(test_config):
@@ -57,6 +62,39 @@ def test_get_image_info_invalid(test_config, temp_dir):
     assert info is None
 
 
+@pytest.mark.parametrize("use_imagesize", [True, False])
+def test_image_size(sample_image, temp_dir, monkeypatch, use_imagesize):
+    """Test header-only size reads with and without the imagesize package."""
+    if use_imagesize and image_processor.imagesize is None:
+        pytest.skip("imagesize not installed")
+    if not use_imagesize:
+        monkeypatch.setattr(image_processor, "imagesize", None)
+
+    assert image_size(sample_image) == (256, 256)
+
+    invalid_file = temp_dir / "invalid.jpg"
+    invalid_file.write_text("not an image")
+    assert image_size(invalid_file) is None
+
+
+def test_get_image_info_cached(test_config, sample_image, monkeypatch):
+    """Test that unchanged files reuse cached metadata and changed files are re-read."""
+    processor = ImageProcessor(test_config.thumbnails_dir)
+    first = processor.get_image_info(sample_image)
+
+    def fail_open(*args, **kwargs):
+        raise AssertionError("header re-parsed")
+
+    monkeypatch.setattr(image_processor.Image, "open", fail_open)
+    assert processor.get_image_info(sample_image) == first
+    monkeypatch.undo()
+
+    # Replacing the file changes (mtime, size), invalidating the entry
+    Image.new('RGB', (64, 32)).save(sample_image, 'PNG')
+    info = processor.get_image_info(sample_image)
+    assert (info['width'], info['height'], info['format']) == (64, 32, 'PNG')
+
+
 def test_generate_thumbnail(test_config, sample_image):
     """Test thumbnail generation."""
     processor = ImageProcessor(test_config.thumbnails_dir, thumbnail_size=(128, 128))
@@ -85,6 +123,23 @@ def test_generate_thumbnail_caching(test_config, sample_image):
     assert thumbnail_path1 == thumbnail_path2
 
 
+def test_generate_thumbnail_regenerates_when_source_changes(test_config, sample_image):
+    """Test that a source modified after its thumbnail gets a fresh thumbnail."""
+    processor = ImageProcessor(test_config.thumbnails_dir, thumbnail_size=(128, 128))
+    thumbnail_path = processor.generate_thumbnail(sample_image)
+    with Image.open(thumbnail_path) as thumb:
+        assert thumb.size == (128, 128)
+
+    # Replace the source and date it after the thumbnail
+    Image.new('RGB', (256, 128), color='blue').save(sample_image, 'JPEG')
+    future = thumbnail_path.stat().st_mtime_ns + 10**9
+    os.utime(sample_image, ns=(future, future))
+
+    assert processor.generate_thumbnail(sample_image) == thumbnail_path
+    with Image.open(thumbnail_path) as thumb:
+        assert thumb.size == (128, 64)
+
+
 def test_load_image(test_config, sample_image):
     """Test loading an image."""
     processor = ImageProcessor(test_config.thumbnails_dir)
@@ -176,3 +231,125 @@ def test_thumbnail_different_modes(test_config, temp_dir):
     # Verify it was converted to RGB
     with Image.open(thumbnail_path) as thumb:
         assert thumb.mode == 'RGB'
+
+
+def test_path_hash_stable_and_fixed_length(monkeypatch):
+    """Test thumbnail name hashing with xxhash and the MD5 fallback."""
+    path = Path("/photos/2020/beach.jpg")
+
+    assert path_hash(path) == path_hash(str(path))
+    assert len(path_hash(path)) == 32
+    assert path_hash(path) != path_hash(Path("/photos/2020/beach2.jpg"))
+
+    monkeypatch.setattr(image_processor, "xxhash", None)
+    assert len(path_hash(path)) == 32
+
+
+def test_perceptual_hash_matches_imagehash():
+    """Test that the fast pHash is bit-identical to imagehash.phash."""
+    import imagehash
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 256, (120, 90, 3), dtype=np.uint8)),
+        Image.fromarray(np.tile(np.arange(200, dtype=np.uint8), (150, 1))),
+        Image.fromarray(rng.integers(0, 256, (40, 300), dtype=np.uint8)).convert('RGBA'),
+        # Flat image: every low-frequency coefficient but DC ties with the median
+        Image.new('RGB', (64, 64), (128, 128, 128)),
+    ]
+    for img in images:
+        assert perceptual_hash(img) == str(imagehash.phash(img, hash_size=8))
+        assert len(perceptual_hash(img)) == 16
+
+
+def test_compute_sha256_hash(test_config, sample_image):
+    """Test SHA-256 content hashing matches hashlib."""
+    import hashlib
+
+    processor = ImageProcessor(test_config.thumbnails_dir)
+    expected = hashlib.sha256(sample_image.read_bytes()).hexdigest()
+
+    assert processor.compute_sha256_hash(sample_image) == expected
+    assert processor.compute_sha256_hash(Path("/nonexistent.jpg")) is None
+
+
+def test_compute_sha256_hash_batch(test_config, sample_image, temp_dir):
+    """Test batch SHA-256 hashing matches the per-file hash and keeps order."""
+    import hashlib
+
+    processor = ImageProcessor(test_config.thumbnails_dir)
+    empty_file = temp_dir / "empty.jpg"
+    empty_file.touch()
+    paths = [sample_image, empty_file, Path("/nonexistent.jpg")]
+
+    hashes = processor.compute_sha256_hash_batch(paths)
+    assert hashes == [
+        processor.compute_sha256_hash(sample_image),
+        hashlib.sha256(b"").hexdigest(),
+        None,
+    ]
+    assert processor.compute_sha256_hash_batch([]) == []
+
+
+def test_process_for_indexing(test_config, sample_image, temp_dir):
+    """Test fused metadata and perceptual hash extraction."""
+    processor = ImageProcessor(test_config.thumbnails_dir)
+
+    info = processor.process_for_indexing(sample_image)
+    assert info['width'] == 256
+    assert info['height'] == 256
+    assert info['format'] == 'JPEG'
+    assert info['perceptual_hash'] == processor.compute_perceptual_hash(sample_image)
+    assert 'sha256_hash' not in info
+
+    info = processor.process_for_indexing(sample_image, include_file_stats=True)
+    assert info['file_size'] == sample_image.stat().st_size
+    assert info['sha256_hash'] == processor.compute_sha256_hash(sample_image)
+
+    invalid_path = temp_dir / "invalid.jpg"
+    invalid_path.write_text("not an image")
+    with pytest.raises(OSError):
+        processor.process_for_indexing(invalid_path)
+
+
+def test_process_for_indexing_thumbnail(test_config, temp_dir):
+    """Test that the fused path writes the same thumbnail as generate_thumbnail."""
+    processor = ImageProcessor(test_config.thumbnails_dir, thumbnail_size=(128, 128))
+    img_path = temp_dir / "wide.png"
+    Image.new('RGBA', (400, 200), color=(0, 128, 255, 255)).save(img_path)
+
+    info = processor.process_for_indexing(img_path, make_thumbnail=True)
+
+    assert info['thumbnail_path'] == processor._thumbnail_path(img_path)
+    with Image.open(info['thumbnail_path']) as thumb:
+        assert thumb.size == (128, 64)
+        assert thumb.mode == 'RGB'
+    assert info['perceptual_hash'] == processor.compute_perceptual_hash(img_path)
+    assert processor.generate_thumbnail(img_path) == info['thumbnail_path']
+
+
+def test_extension_set_normalizes():
+    """Test that extensions are lowercased and dot-prefixed."""
+    assert extension_set(['.JPG', 'png', '.webp']) == frozenset({'.jpg', '.png', '.webp'})
+
+
+def test_walk_images_skips_dotfiles_without_suffix(temp_dir):
+    """Test that a bare '.jpg' dotfile is not treated as a .jpg image."""
+    (temp_dir / ".jpg").write_bytes(b"x")
+    (temp_dir / "photo.JPG").write_bytes(b"x")
+
+    found = sorted(path.name for path, _ in walk_images(temp_dir, ['jpg']))
+    assert found == ["photo.JPG"]
+
+
+def test_walk_images_yields_dir_entries(temp_dir):
+    """Test that walk_images recurses and exposes cached stat via DirEntry."""
+    (temp_dir / "sub").mkdir()
+    (temp_dir / "a.jpg").write_bytes(b"x" * 10)
+    (temp_dir / "sub" / "b.PNG").write_bytes(b"x" * 20)
+    (temp_dir / "notes.txt").write_text("skip")
+
+    found = {path.name: entry.stat().st_size for path, entry in walk_images(temp_dir, ['.jpg', '.png'])}
+
+    assert found == {"a.jpg": 10, "b.PNG": 20}
@@ -15,7 +15,7 @@ from src.embeddings import EmbeddingCache
 @pytest.mark.integration
 @pytest.mark.requires_model
 @pytest.mark.skip(reason="Requires downloading large CLIP model - run manually with --run-requires-model")
-def test_end_to_end_indexing_and_search(test_config, temp_dir):
+def test_end_to_end_indexing_and_search(test_config, temp_dir, sample_embeddings):
     """Test complete workflow: scan -> register -> search (with mock embeddings)."""
     # Create test images
     img_dir = temp_dir / "test_images"
@@ -37,9 +37,7 @@ def test_end_to_end_indexing_and_search(test_config, temp_dir):
     assert pipeline.db.get_total_images() == 3
 
     # Step 2: Create mock embeddings (since we can't download models in tests)
-    np.random.seed(42)
-    embeddings = np.random.randn(3, 128).astype(np.float32)
-    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = sample_embeddings[:3]  # Unit-norm, shared read-only
 
     # Update database with embedding indices
     for i, img_path in enumerate(image_paths):
@@ -79,25 +77,21 @@ def test_end_to_end_indexing_and_search(test_config, temp_dir):
 
 
 @pytest.mark.integration
-def test_database_and_faiss_consistency(test_config, temp_dir):
+def test_database_and_faiss_consistency(test_config, temp_dir, make_test_images, sample_embeddings):
     """Test that database and FAISS index stay consistent."""
     # Create images
     img_dir = temp_dir / "images"
     img_dir.mkdir()
 
     num_images = 10
-    for i in range(num_images):
-        img_path = img_dir / f"img_{i}.jpg"
-        img = Image.new('RGB', (128, 128), color='red')
-        img.save(img_path)
+    make_test_images(img_dir, num_images, size=(128, 128), prefix="img")
 
     # Index images
     pipeline = IndexingPipeline(test_config)
     pipeline.scan_and_register_images(img_dir)
 
-    # Create mock embeddings
-    embeddings = np.random.randn(num_images, 128).astype(np.float32)
-    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    # Mock embeddings (unit-norm, shared read-only)
+    embeddings = sample_embeddings[:num_images]
 
     # Update database
     for i in range(num_images):
@@ -129,16 +123,13 @@ def test_database_and_faiss_consistency(test_config, temp_dir):
 
 
 @pytest.mark.integration
-def test_resumable_processing(test_config, temp_dir):
+def test_resumable_processing(test_config, temp_dir, make_test_images):
     """Test that processing can be resumed after interruption."""
     img_dir = temp_dir / "images"
     img_dir.mkdir()
 
     # Create images
-    for i in range(5):
-        img_path = img_dir / f"img_{i}.jpg"
-        img = Image.new('RGB', (128, 128), color='red')
-        img.save(img_path)
+    make_test_images(img_dir, 5, size=(128, 128), prefix="img")
 
     pipeline = IndexingPipeline(test_config)
 
@@ -190,17 +181,11 @@ def test_resumable_processing(test_config, temp_dir):
 
 
 @pytest.mark.integration
-def test_hybrid_search_integration(test_config, sample_embeddings):
+def test_hybrid_search_integration(test_config, sample_embeddings, ivf_pq_index):
     """Test hybrid search with IVF-PQ and exact re-ranking."""
-    # Build IVF-PQ index
-    ivf_index = FAISSIndex(test_config.embedding_dim, test_config.index_path)
-    ivf_index.build_ivf_pq_index(
-        sample_embeddings,
-        nlist=test_config.nlist,
-        m=test_config.m_pq,
-        nbits=test_config.nbits_pq,
-        use_gpu=False
-    )
+    # IVF-PQ index trained once per session (nlist/m/nbits match test_config)
+    ivf_index = ivf_pq_index
+    ivf_index.index_path = test_config.index_path
 
     # Save embeddings
     cache = EmbeddingCache(test_config.embeddings_path)
@@ -231,16 +216,13 @@ def test_hybrid_search_integration(test_config, sample_embeddings):
 
 
 @pytest.mark.integration
-def test_pipeline_statistics(test_config, temp_dir):
+def test_pipeline_statistics(test_config, temp_dir, make_test_images):
     """Test that pipeline statistics are accurate."""
     img_dir = temp_dir / "images"
     img_dir.mkdir()
 
     # Create test images
-    for i in range(7):
-        img_path = img_dir / f"img_{i}.jpg"
-        img = Image.new('RGB', (128, 128), color='red')
-        img.save(img_path)
+    make_test_images(img_dir, 7, size=(128, 128), prefix="img")
 
     pipeline = IndexingPipeline(test_config)
 
@@ -278,11 +260,11 @@ def test_pipeline_statistics(test_config, temp_dir):
 
 
 @pytest.mark.integration
-def test_index_persistence(test_config, sample_embeddings):
+def test_index_persistence(test_config, sample_embeddings, flat_index):
     """Test that index can be saved and loaded correctly."""
-    # Build and save index
-    index1 = FAISSIndex(test_config.embedding_dim, test_config.index_path)
-    index1.build_flat_index(sample_embeddings, use_gpu=False)
+    # Save a copy of the session-built index
+    index1 = flat_index
+    index1.index_path = test_config.index_path
     index1.save()
 
     # Search with original index
@@ -1,6 +1,7 @@
 """Tests for pipeline module."""
 
 import pytest
+import numpy as np
 from pathlib import Path
 from PIL import Image
 
@@ -16,16 +17,12 @@ def test_pipeline_initialization(test_config):
     assert pipeline.image_processor is not None
 
 
-def test_scan_and_register_images(test_config, temp_dir):
+def test_scan_and_register_images(test_config, temp_dir, make_test_images):
     """Test scanning and registering images."""
     # Create test images
     img_dir = temp_dir / "images"
     img_dir.mkdir()
-
-    for i in range(5):
-        img_path = img_dir / f"test_{i}.jpg"
-        img = Image.new('RGB', (256, 256), color='red')
-        img.save(img_path)
+    make_test_images(img_dir, 5)
 
     pipeline = IndexingPipeline(test_config)
     num_registered = pipeline.scan_and_register_images(img_dir)
@@ -34,16 +31,13 @@ def test_scan_and_register_images(test_config, temp_dir):
     assert pipeline.db.get_total_images() == 5
 
 
-def test_scan_and_register_skip_existing(test_config, temp_dir):
+def test_scan_and_register_skip_existing(test_config, temp_dir, make_test_images):
     """Test that existing images are skipped."""
     img_dir = temp_dir / "images"
     img_dir.mkdir()
 
     # Create test images
-    for i in range(3):
-        img_path = img_dir / f"test_{i}.jpg"
-        img = Image.new('RGB', (256, 256), color='red')
-        img.save(img_path)
+    make_test_images(img_dir, 3)
 
     pipeline = IndexingPipeline(test_config)
 
@@ -56,6 +50,22 @@ def test_scan_and_register_skip_existing(test_config, temp_dir):
     assert num_registered2 == 0
 
 
+def test_scan_and_register_ignores_registered_paths(test_config, temp_dir, mocker, make_test_images):
+    """Test that paths the scanner lets through are ignored if already registered."""
+    img_dir = temp_dir / "images"
+    img_dir.mkdir()
+    paths = make_test_images(img_dir, 3, size=(64, 64))
+
+    pipeline = IndexingPipeline(test_config)
+    assert pipeline.scan_and_register_images(img_dir) == 3
+
+    # Simulate a stale scan that returns the already-registered files again
+    mocker.patch("src.pipeline.scan_images_smart", return_value=paths)
+    assert pipeline.scan_and_register_images(img_dir) == 0
+    assert pipeline.db.get_total_images() == 3
+    pipeline.close()
+
+
 def test_scan_invalid_images(test_config, temp_dir):
     """Test handling of invalid images during scanning."""
     img_dir = temp_dir / "images"
@@ -77,6 +87,63 @@ def test_scan_invalid_images(test_config, temp_dir):
     assert num_registered == 1
 
 
+def test_generate_embeddings_skips_unloadable_images(test_config, temp_dir, mocker, make_test_images):
+    """Test that images which fail to load are logged and the rest are embedded."""
+    img_dir = temp_dir / "images"
+    img_dir.mkdir()
+    make_test_images(img_dir, 5, size=(64, 64), color='green')
+
+    test_config.batch_size = 2
+    pipeline = IndexingPipeline(test_config)
+    pipeline.scan_and_register_images(img_dir)
+    (img_dir / "test_1.jpg").unlink()
+    (img_dir / "test_4.jpg").unlink()
+
+    pipeline.embedding_model = mocker.MagicMock()
+    pipeline.embedding_model.get_embedding_dim.return_value = 128
+    pipeline.embedding_model.stage_images.side_effect = lambda images: images
+    pipeline.embedding_model.encode_images.side_effect = (
+        lambda images, batch_size: np.ones((len(images), 128), dtype=np.float32)
+    )
+
+    assert pipeline.generate_embeddings(resume=False) == 3
+    saved = np.load(test_config.embeddings_path)
+    assert saved.shape == (3, 128)
+    assert np.allclose(np.linalg.norm(saved, axis=1), 1.0)
+    assert pipeline.db.get_processed_count() == 3
+    pipeline.close()
+
+
+def test_generate_embeddings_stages_next_batch_first(test_config, temp_dir, mocker, make_test_images):
+    """Test that batch N+1 is staged on the device before batch N is encoded."""
+    img_dir = temp_dir / "images"
+    img_dir.mkdir()
+    make_test_images(img_dir, 6, size=(64, 64), color='green')
+
+    test_config.batch_size = 2
+    pipeline = IndexingPipeline(test_config)
+    pipeline.scan_and_register_images(img_dir)
+
+    calls = []
+
+    def stage(images):
+        calls.append(('stage', len(images)))
+        return images
+
+    def encode(images, batch_size):
+        calls.append(('encode', len(images)))
+        return np.ones((len(images), 128), dtype=np.float32)
+
+    pipeline.embedding_model = mocker.MagicMock()
+    pipeline.embedding_model.get_embedding_dim.return_value = 128
+    pipeline.embedding_model.stage_images.side_effect = stage
+    pipeline.embedding_model.encode_images.side_effect = encode
+
+    assert pipeline.generate_embeddings(resume=False) == 6
+    assert [c[0] for c in calls] == ['stage', 'stage', 'encode', 'stage', 'encode', 'encode']
+    pipeline.close()
+
+
 def test_get_stats(test_config, populated_db):
     """Test getting pipeline statistics."""
     # Override the db with populated one
@@ -137,6 +204,74 @@ def test_pipeline_close(test_config):
 # which is slow for unit tests. Integration tests should cover this.
 
 
+def test_generate_embeddings_appends_to_existing(test_config, temp_dir, mocker, make_test_images):
+    """Test that embeddings are written into the pre-sized file in index order."""
+    img_dir = temp_dir / "images"
+    img_dir.mkdir()
+    make_test_images(img_dir, 3, size=(64, 64))
+
+    pipeline = IndexingPipeline(test_config)
+    pipeline.embedding_model = mocker.MagicMock()
+    pipeline.embedding_model.get_embedding_dim.return_value = 128
+    pipeline.embedding_model.stage_images.side_effect = lambda images: images
+    pipeline.embedding_model.encode_images.side_effect = (
+        lambda images, batch_size: np.full((len(images), 128), len(images), dtype=np.float32)
+    )
+
+    pipeline.scan_and_register_images(img_dir)
+    assert pipeline.generate_embeddings(resume=False) == 3
+    first = np.load(test_config.embeddings_path)
+    assert first.shape == (3, 128)
+
+    more_dir = temp_dir / "more_images"
+    more_dir.mkdir()
+    make_test_images(more_dir, 2, size=(64, 64), color='blue', start=3)
+    pipeline.scan_and_register_images(more_dir)
+    assert pipeline.generate_embeddings(resume=False) == 2
+
+    combined = np.load(test_config.embeddings_path)
+    assert combined.shape == (5, 128)
+    assert np.array_equal(combined[:3], first)
+    assert not test_config.embeddings_path.with_suffix('.tmp.npy').exists()
+    pipeline.close()
+
+
+def test_generate_embeddings_keeps_rows_past_processed_count(test_config, temp_dir, mocker, make_test_images):
+    """Test that a cache longer than the processed count is appended to, never overwritten or trimmed."""
+    img_dir = temp_dir / "images"
+    img_dir.mkdir()
+    make_test_images(img_dir, 3, size=(64, 64))
+
+    pipeline = IndexingPipeline(test_config)
+    pipeline.embedding_model = mocker.MagicMock()
+    pipeline.embedding_model.get_embedding_dim.return_value = 128
+    pipeline.embedding_model.stage_images.side_effect = lambda images: images
+    pipeline.embedding_model.encode_images.side_effect = (
+        lambda images, batch_size: np.ones((len(images), 128), dtype=np.float32)
+    )
+    pipeline.scan_and_register_images(img_dir)
+
+    # One image already points at row 4 of a 6-row cache (gapped indices)
+    existing = np.arange(6 * 128, dtype=np.float32).reshape(6, 128)
+    np.save(test_config.embeddings_path, existing)
+    first = pipeline.db.get_unprocessed_images()[0]
+    pipeline.db.set_embedding_indices([(4, first['id'])])
+    assert pipeline.db.get_processed_count() == 1
+    assert pipeline.db.get_next_embedding_index() == 5
+
+    assert pipeline.generate_embeddings(resume=False) == 2
+
+    saved = np.load(test_config.embeddings_path)
+    assert saved.shape == (8, 128)
+    assert np.array_equal(saved[:6], existing)
+    new_indices = sorted(
+        row['embedding_index'] for row in pipeline.db.get_images_by_indices([6, 7])
+    )
+    assert new_indices == [6, 7]
+    assert pipeline.db.get_image_by_embedding_index(4)['id'] == first['id']
+    pipeline.close()
+
+
 def test_scan_nested_directories(test_config, temp_dir):
     """Test scanning nested directory structure."""
     # Create nested structure
@@ -175,3 +310,38 @@ def test_thumbnail_generation_during_scan(test_config, temp_dir):
     assert image_record is not None
     assert image_record['thumbnail_path'] is not None
     assert Path(image_record['thumbnail_path']).exists()
+
+
+def test_scan_without_thumbnails(test_config, temp_dir):
+    """Test that scan_thumbnails=False registers images without writing thumbnails."""
+    img_dir = temp_dir / "images"
+    img_dir.mkdir()
+    img_path = img_dir / "test.jpg"
+    Image.new('RGB', (64, 64), color='blue').save(img_path)
+
+    test_config.scan_thumbnails = False
+    pipeline = IndexingPipeline(test_config)
+    assert pipeline.scan_and_register_images(img_dir) == 1
+
+    assert pipeline.db.get_image_by_path(str(img_path))['thumbnail_path'] is None
+    assert not any(test_config.thumbnails_dir.iterdir())
+
+
+def test_scan_postprocesses_new_thumbnails(test_config, temp_dir, mocker, make_test_images):
+    """Test that the post-processing command runs over new thumbnails in batches."""
+    img_dir = temp_dir / "images"
+    img_dir.mkdir()
+    make_test_images(img_dir, 3, size=(64, 64))
+
+    mocker.patch("src.pipeline.POSTPROCESS_BATCH", 2)
+    run = mocker.patch("src.pipeline.subprocess.run")
+    test_config.thumbnail_postprocess_cmd = ["jpegoptim", "--quiet"]
+    pipeline = IndexingPipeline(test_config)
+    assert pipeline.scan_and_register_images(img_dir) == 3
+
+    batches = [call.args[0][2:] for call in run.call_args_list]
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert all(call.args[0][:2] == ["jpegoptim", "--quiet"] for call in run.call_args_list)
+    thumbnails = {r['thumbnail_path'] for r in pipeline.db.conn.execute("SELECT thumbnail_path FROM images")}
+    assert set(batches[0] + batches[1]) == thumbnails
+    pipeline.close()
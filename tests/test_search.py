@@ -24,6 +24,7 @@ def test_search_result_creation():
     assert result.thumbnail_path == "/path/to/thumb.jpg"
     assert result.width == 800
     assert result.height == 600
+    assert not hasattr(result, '__dict__')
 
 
 def test_search_result_to_dict():
@@ -109,6 +110,20 @@ def test_search_engine_close(test_config):
     # (We can't easily verify without checking internal state)
 
 
+def test_search_engine_close_releases_embeddings(test_config, sample_embeddings):
+    """Test that close drops the memory-mapped embeddings."""
+    test_config.embeddings_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(test_config.embeddings_path, sample_embeddings)
+
+    engine = ImageSearchEngine(test_config)
+    embeddings = engine.embedding_cache.load(mmap_mode='r')
+    assert isinstance(embeddings, np.memmap)
+
+    engine.close()
+    assert engine.embedding_cache.embeddings is None
+    assert engine.hybrid_search is None
+
+
 # Note: Full search tests with real models require model downloads
 # Integration tests should cover end-to-end search functionality
 
@@ -160,6 +175,31 @@ def test_build_results_ordering(test_config, populated_db):
     assert results[1].embedding_index == 2
 
 
+def test_build_results_from_metadata_arrays(test_config, populated_db, sample_images, mocker):
+    """Test that cached metadata answers lookups and only misses hit the DB."""
+    engine = ImageSearchEngine(test_config, use_hybrid=False)
+    engine.db = populated_db
+    engine._load_metadata()
+    assert len(engine._meta_id) == 5
+
+    spy = mocker.spy(populated_db, "get_images_by_indices")
+    results = engine._build_results(np.array([3, 1]), np.array([0.9, 0.8]))
+
+    assert spy.call_count == 0
+    assert [r.embedding_index for r in results] == [3, 1]
+    assert results[0].file_path == str(sample_images[3])
+    assert results[0].width == 256
+
+    # An index added after loading falls back to the database
+    populated_db.add_image(
+        file_path="/new/image.jpg", file_name="image.jpg", file_size=1,
+        width=10, height=20, format="JPEG", embedding_index=5
+    )
+    results = engine._build_results(np.array([5, 0]), np.array([0.9, 0.8]))
+    spy.assert_called_once_with([5])
+    assert [r.file_path for r in results] == ["/new/image.jpg", str(sample_images[0])]
+
+
 def test_build_results_empty(test_config, test_db):
     """Test building results with empty indices."""
     engine = ImageSearchEngine(test_config, use_hybrid=False)
@@ -195,3 +235,20 @@ def test_search_result_metadata_fields():
     d = result.to_dict()
     assert len(d) == 7
     assert all(key in d for key in ['image_id', 'file_path', 'score', 'thumbnail_path', 'width', 'height', 'embedding_index'])
+
+
+def test_search_by_embedding_normalizes_query(test_config, mocker):
+    """Test that only non-unit queries are rescaled before searching."""
+    engine = ImageSearchEngine(test_config, use_hybrid=False)
+    engine.faiss_index = mocker.MagicMock()
+    engine.faiss_index.search.return_value = (np.zeros((1, 0)), np.zeros((1, 0), dtype=np.int64))
+
+    query = np.zeros(128, dtype=np.float32)
+    query[0] = 3.0
+    engine.search_by_embedding(query, top_k=5)
+    searched = engine.faiss_index.search.call_args[0][0]
+    assert np.isclose(np.linalg.norm(searched), 1.0)
+
+    engine.search_by_embedding(query, top_k=5, assume_normalized=True)
+    assert engine.faiss_index.search.call_args[0][0] is query
+    engine.close()
@@ -0,0 +1,114 @@
+"""Tests for smart scanner module."""
+
+import pytest
+from pathlib import Path
+
+import src.smart_scanner as smart_scanner
+from src.smart_scanner import SmartScanner, _parallel_scan
+
+
+@pytest.fixture
+def image_tree(temp_dir):
+    """Create a nested directory tree with image and non-image files."""
+    root = temp_dir / "photos"
+    (root / "2020" / "beach").mkdir(parents=True)
+    (root / "2021").mkdir()
+    for rel in ["a.jpg", "2020/b.PNG", "2020/beach/c.jpeg", "2021/d.jpg", "2021/notes.txt"]:
+        (root / rel).write_bytes(b"x")
+    return root
+
+
+def _files(dirs):
+    return sorted(f for _, _, files in dirs.values() for f in files)
+
+
+def test_parallel_scan_matches_serial(image_tree):
+    """Test that the threaded walk finds the same files as the serial walk."""
+    extensions = ['.jpg', '.jpeg', '.png']
+
+    serial = _files(_parallel_scan(image_tree, extensions, workers=1))
+    parallel = _files(_parallel_scan(image_tree, extensions, workers=4))
+
+    assert parallel == serial
+    assert len(parallel) == 4
+    assert not any(f.endswith("notes.txt") for f in parallel)
+
+
+def test_scan_with_cache_skips_registered(image_tree, temp_dir):
+    """Test that registered paths are filtered and results are sorted Paths."""
+    scanner = SmartScanner(temp_dir / "cache")
+    registered = {str(image_tree / "a.jpg")}
+
+    files = scanner.scan_with_cache(image_tree, ['.jpg', '.jpeg', '.png'], registered, workers=4)
+
+    assert files == sorted(files)
+    assert all(isinstance(f, Path) for f in files)
+    assert image_tree / "a.jpg" not in files
+    assert len(files) == 3
+
+
+def test_parallel_scan_reuses_unchanged_dirs(image_tree):
+    """Test that unchanged directories come from the cache and changed ones are re-read."""
+    extensions = ['.jpg', '.jpeg', '.png']
+    first = _parallel_scan(image_tree, extensions, workers=2)
+
+    # Plant a stale entry for an unchanged directory: it must be reused as-is
+    beach = str(image_tree / "2020" / "beach")
+    fingerprint, subdirs, _ = first[beach]
+    first[beach] = (fingerprint, subdirs, ["cached.jpg"])
+    (image_tree / "2021" / "e.jpg").write_bytes(b"x")
+
+    second = _parallel_scan(image_tree, extensions, workers=2, cached_dirs=first)
+
+    assert second[beach][2] == ["cached.jpg"]
+    assert str(image_tree / "2021" / "e.jpg") in second[str(image_tree / "2021")][2]
+
+
+def test_scan_with_cache_picks_up_new_files(image_tree, temp_dir):
+    """Test that a re-scan sees files added since the cached scan."""
+    scanner = SmartScanner(temp_dir / "cache")
+    extensions = ['.jpg', '.jpeg', '.png']
+
+    assert len(scanner.scan_with_cache(image_tree, extensions)) == 4
+    (image_tree / "2020" / "beach" / "f.jpg").write_bytes(b"x")
+
+    assert image_tree / "2020" / "beach" / "f.jpg" in scanner.scan_with_cache(image_tree, extensions)
+
+
+@pytest.mark.parametrize("compressed", [True, False])
+def test_cache_round_trip(image_tree, temp_dir, monkeypatch, compressed):
+    """Test that the scan cache loads back with and without zstandard."""
+    if compressed and smart_scanner.zstandard is None:
+        pytest.skip("zstandard not installed")
+    if not compressed:
+        monkeypatch.setattr(smart_scanner, "zstandard", None)
+
+    scanner = SmartScanner(temp_dir / "cache")
+    extensions = ['.jpg', '.jpeg', '.png']
+    scanner.scan_with_cache(image_tree, extensions)
+
+    data = scanner._get_cache_path(image_tree).read_bytes()
+    assert data.startswith(smart_scanner.ZSTD_MAGIC) == compressed
+
+    cache = scanner._load_cache(image_tree)
+    loaded = {d: (fp, subdirs, list(files)) for d, (fp, subdirs, files) in cache['dirs'].items()}
+    assert loaded == _parallel_scan(image_tree, extensions)
+
+
+def test_cache_reload_reuses_path_blob(image_tree, temp_dir):
+    """Test that cached file lists are mmapped views and survive a re-save."""
+    scanner = SmartScanner(temp_dir / "cache")
+    extensions = ['.jpg', '.jpeg', '.png']
+    scanner.scan_with_cache(image_tree, extensions)
+
+    cache = scanner._load_cache(image_tree)
+    files = cache['dirs'][str(image_tree / "2020" / "beach")][2]
+    assert isinstance(files, smart_scanner._CachedFiles)
+    assert list(files) == [str(image_tree / "2020" / "beach" / "c.jpeg")]
+
+    # Second scan re-saves from the mmapped views; only one blob generation remains
+    assert len(scanner.scan_with_cache(image_tree, extensions)) == 4
+    assert len(list((temp_dir / "cache").glob("*.paths.bin"))) == 1
+
+    scanner.invalidate_cache(image_tree)
+    assert list((temp_dir / "cache").iterdir()) == []
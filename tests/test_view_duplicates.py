@@ -0,0 +1,141 @@
+"""Tests for the duplicates HTML viewer."""
+
+import base64
+import io
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import view_duplicates
+
+# (perceptual_hash, file name): three copies of 'aaaa', two each of 'bbbb' and
+# 'cccc' (tied, so ordered by hash), one 'dddd'
+DUPLICATE_ROWS = [
+    ('bbbb', 'b2.jpg'), ('aaaa', 'a3.jpg'), ('cccc', 'c1.jpg'), ('aaaa', 'a1.jpg'),
+    ('dddd', 'd1.jpg'), ('bbbb', 'b1.jpg'), ('cccc', 'c2.jpg'), ('aaaa', 'a2.jpg'),
+]
+
+EXPECTED_GROUPS = [
+    ('aaaa', 3, ['a1.jpg', 'a2.jpg', 'a3.jpg']),
+    ('bbbb', 2, ['b1.jpg', 'b2.jpg']),
+    ('cccc', 2, ['c1.jpg', 'c2.jpg']),
+]
+
+
+def _summarize(groups):
+    return [(g['hash'], g['count'], [name for _, name, _, _ in g['images']]) for g in groups]
+
+
+def test_get_duplicate_groups_from_hash_counts(test_db, temp_dir, monkeypatch):
+    """Test group order and contents when the trigger-maintained hash_counts table exists."""
+    for phash, name in DUPLICATE_ROWS:
+        test_db.add_image(
+            file_path=str(temp_dir / name), file_name=name, file_size=1,
+            width=10, height=20, format="JPEG", perceptual_hash=phash
+        )
+    monkeypatch.setattr(view_duplicates, "DB_PATH", str(test_db.db_path))
+    dup_hashes = "SELECT COUNT(*) FROM hash_counts WHERE kind = 'phash' AND cnt > 1"
+    assert test_db.conn.execute(dup_hashes).fetchone()[0] == 3
+
+    assert _summarize(view_duplicates.get_duplicate_groups()) == EXPECTED_GROUPS
+    assert _summarize(view_duplicates.get_duplicate_groups(limit=2)) == EXPECTED_GROUPS[:2]
+    assert _summarize(view_duplicates.get_duplicate_groups(max_size=2)) == EXPECTED_GROUPS[1:]
+
+
+def test_get_duplicate_groups_fallback_without_hash_counts(temp_dir, monkeypatch):
+    """Test that older databases are grouped from the images table in the same order."""
+    db_path = temp_dir / "old.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE images (perceptual_hash TEXT, file_path TEXT, file_name TEXT,
+                             width INTEGER, height INTEGER)
+    """)
+    conn.executemany(
+        "INSERT INTO images VALUES (?, ?, ?, 10, 20)",
+        [(phash, str(temp_dir / name), name) for phash, name in DUPLICATE_ROWS]
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(view_duplicates, "DB_PATH", str(db_path))
+
+    groups = view_duplicates.get_duplicate_groups()
+
+    assert _summarize(groups) == EXPECTED_GROUPS
+    assert groups[0]['images'][0] == (str(temp_dir / 'a1.jpg'), 'a1.jpg', 10, 20)
+
+
+def test_write_groups_json_escapes_script_end():
+    """Test that '</' in paths can't close the JSON <script> block early."""
+    groups = [{
+        'hash': 'aaaa',
+        'count': 2,
+        'images': [('/x/</script><b>.jpg', '</script><b>.jpg', 1, 2), ('/x/ok.jpg', 'ok.jpg', 1, 2)],
+    }]
+    fp = io.StringIO()
+
+    view_duplicates._write_groups_json(groups, fp, max_images_per_group=10)
+
+    block = re.search(r'<script id="groups-data" type="application/json">(.*?)</script>',
+                      fp.getvalue(), re.S).group(1)
+    assert '</' not in block
+    data = json.loads(block)
+    assert data['groups'][0]['images'][0]['name'] == '</script><b>.jpg'
+    assert data['perPage'] == view_duplicates.GROUPS_PER_PAGE
+
+
+def test_write_html_embed(temp_dir, monkeypatch):
+    """Test --embed cards: missing files, byte-identical copies and transparent sources."""
+    # Encode in-process so the patched cache dir and call counter apply
+    monkeypatch.setattr(view_duplicates, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(view_duplicates, "THUMB_CACHE_DIR", temp_dir / "cache")
+    encoded = []
+    real_image_to_preview = view_duplicates.image_to_preview
+
+    def counting_image_to_preview(image_path, max_size=400):
+        encoded.append(image_path)
+        return real_image_to_preview(image_path, max_size=max_size)
+
+    monkeypatch.setattr(view_duplicates, "image_to_preview", counting_image_to_preview)
+
+    # Fully transparent RGBA and palette-with-transparency sources, larger than
+    # the preview so they are resized and re-encoded
+    rgba = temp_dir / "rgba.png"
+    Image.new('RGBA', (800, 600), (0, 0, 0, 0)).save(rgba)
+    palette = temp_dir / "palette.png"
+    Image.new('P', (800, 600), 0).save(palette, transparency=0)
+    copy = temp_dir / "copy.png"
+    copy.write_bytes(rgba.read_bytes())
+    missing = temp_dir / "missing.png"
+
+    groups = [
+        {'hash': 'aaaa', 'count': 3, 'images': [
+            (str(rgba), 'rgba.png', 800, 600),
+            (str(copy), 'copy.png', 800, 600),
+            (str(missing), 'missing.png', 800, 600),
+        ]},
+        {'hash': 'bbbb', 'count': 2, 'images': [
+            (str(palette), 'palette.png', 800, 600),
+            (str(rgba), 'rgba.png', 800, 600),
+        ]},
+    ]
+    fp = io.StringIO()
+
+    view_duplicates.write_html(groups, fp, workers=2, embed=True)
+    page = fp.getvalue()
+
+    # The missing file is rejected before encoding; the copy reuses the original's preview
+    assert sorted(encoded) == sorted([str(rgba), str(palette), str(rgba)])
+    assert page.count('Could not load image') == 1
+    uris = re.findall(r'src="data:(image/(?:webp|jpeg));base64,([^"]+)"', page)
+    assert len(uris) == 4
+    assert uris[0] == uris[1]
+
+    # Transparent areas are flattened onto white, not black
+    for _, data in uris:
+        with Image.open(io.BytesIO(base64.b64decode(data))) as preview:
+            assert max(preview.size) == 400
+            assert all(channel > 240 for channel in preview.convert('RGB').getpixel((10, 10)))
+    assert page.rstrip().endswith('</html>')
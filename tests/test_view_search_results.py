@@ -0,0 +1,45 @@
+"""Tests for the search results HTML viewer."""
+
+import view_search_results
+
+
+class FakeResponse:
+    """Minimal stand-in for a requests.Response."""
+
+    def __init__(self, results, status_code=200):
+        self.status_code = status_code
+        self._results = results
+
+    def json(self):
+        return {"results": self._results}
+
+
+def test_create_html_viewer_renders_escaped_results(monkeypatch):
+    """Test that the page renders and escapes queries, names and paths."""
+    responses = {
+        'cats & "dogs"': FakeResponse([
+            {"file_path": "/photos/my album/<b>.jpg", "file_name": "<b>.jpg", "score": 0.5},
+        ]),
+        "broken": ConnectionError("server down <now>"),
+    }
+    monkeypatch.setattr(view_search_results, "fetch_results", responses.__getitem__)
+
+    page = view_search_results.create_html_viewer(list(responses))
+
+    assert page.startswith("<!DOCTYPE html>")
+    assert "cats &amp; &quot;dogs&quot;" in page
+    assert 'alt="&lt;b&gt;.jpg"' in page
+    assert "file:///photos/my%20album/%3Cb%3E.jpg" in page
+    assert "Error: server down &lt;now&gt;" in page
+    assert "<b>" not in page
+
+
+def test_create_html_viewer_skips_failed_status(monkeypatch):
+    """Test that non-200 responses produce no result section."""
+    monkeypatch.setattr(view_search_results, "fetch_results",
+                        lambda query: FakeResponse([], status_code=500))
+
+    page = view_search_results.create_html_viewer(["protest"])
+
+    assert 'class="query-section"' not in page
+    assert page.rstrip().endswith("</html>")
@@ -1,78 +1,216 @@
 #!/usr/bin/env python3
 """Generate HTML page to visually inspect duplicate images."""
 
+import argparse
+import hashlib
+import html
+import json
+import os
 import sqlite3
+import urllib.parse
 from pathlib import Path
 import base64
-from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+from PIL import Image, ImageOps, features
+from tqdm import tqdm
 import io
 
 DB_PATH = "/Volumes/My Book/images-finder-data/metadata.db"
 OUTPUT_HTML = "/Users/aviz/images-finder/duplicates_viewer.html"
 
+# Encoded --embed thumbnails from earlier runs, keyed by (path, mtime, max_size)
+THUMB_CACHE_DIR = Path(OUTPUT_HTML).parent / "duplicates_viewer_cache"
+
+# Bump when the encoded output changes so stale cache entries aren't reused
+THUMB_CACHE_VERSION = 4
+
+# Refuse to decode images above 100 MP (decompression bombs, huge scans)
+# instead of allocating gigabytes for a 400 px preview. Pillow only raises
+# DecompressionBombError above twice MAX_IMAGE_PIXELS (below that it just warns)
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+# Duplicate groups joined with their images; {groups_cte} selects (hash, cnt)
+GROUPS_QUERY = """
+    WITH groups AS ({groups_cte})
+    SELECT g.hash, g.cnt, i.file_path, i.file_name, i.width, i.height
+    FROM groups g
+    JOIN images i ON i.perceptual_hash = g.hash
+    ORDER BY g.cnt DESC, g.hash, i.file_path
+"""
+
+# Bytes hashed from each end of a file to spot byte-identical copies
+FINGERPRINT_BYTES = 64 * 1024
+
+# Previews are encoded as WebP (typically ~30% smaller than JPEG q85, so a
+# smaller base64 payload) when Pillow was built with libwebp; the JPEG encode is
+# kept whenever it comes out smaller
+WEBP_SUPPORTED = features.check('webp')
+
+# Encode buffers reused across calls; module-level, so each worker process
+# gets its own (calls within a process are sequential)
+_JPEG_BUFFER = io.BytesIO()
+_WEBP_BUFFER = io.BytesIO()
+
 def get_duplicate_groups(limit=50, min_size=2, max_size=20):
     """Get duplicate groups from database."""
     conn = sqlite3.connect(DB_PATH)
+    # Read-mostly scan: memory-map the DB file and keep sorts/temp b-trees in RAM
+    conn.execute("PRAGMA mmap_size = 1073741824")
+    conn.execute("PRAGMA cache_size = -200000")
+    conn.execute("PRAGMA temp_store = MEMORY")
     cur = conn.cursor()
     
-    # Get duplicate groups
-    cur.execute(f"""
-        SELECT perceptual_hash, COUNT(*) as count
-        FROM images 
-        WHERE perceptual_hash IS NOT NULL 
-        GROUP BY perceptual_hash 
-        HAVING COUNT(*) BETWEEN ? AND ?
-        ORDER BY COUNT(*) DESC
-        LIMIT ?
-    """, (min_size, max_size, limit))
-    
-    hashes = cur.fetchall()
-    
-    groups = []
-    for phash, count in hashes:
-        # Get all images in this group
-        cur.execute("""
-            SELECT file_path, file_name, width, height
+    # One statement: pick the groups in a CTE and join their images, sorted so
+    # each group's rows are contiguous. Groups come from the trigger-maintained
+    # hash_counts table (partial index over duplicated hashes only); older
+    # databases fall back to grouping the whole images table
+    try:
+        cur.execute(GROUPS_QUERY.format(groups_cte="""
+            SELECT hash, cnt
+            FROM hash_counts
+            WHERE kind = 'phash' AND cnt > 1 AND cnt BETWEEN ? AND ?
+            ORDER BY cnt DESC, hash
+            LIMIT ?
+        """), (min_size, max_size, limit))
+    except sqlite3.OperationalError:
+        cur.execute(GROUPS_QUERY.format(groups_cte="""
+            SELECT perceptual_hash AS hash, COUNT(*) AS cnt
             FROM images
-            WHERE perceptual_hash = ?
-            ORDER BY file_path
-        """, (phash,))
-        
-        images = cur.fetchall()
+            WHERE perceptual_hash IS NOT NULL
+            GROUP BY perceptual_hash
+            HAVING COUNT(*) BETWEEN ? AND ?
+            ORDER BY cnt DESC, hash
+            LIMIT ?
+        """), (min_size, max_size, limit))
+
+    # Single pass over the streamed rows, one group per run of equal hashes
+    groups = []
+    for (phash, count), rows in groupby(cur, key=itemgetter(0, 1)):
         groups.append({
             'hash': phash,
             'count': count,
-            'images': images
+            'images': [tuple(row[2:]) for row in rows]
         })
-    
+
     conn.close()
     return groups
 
-def image_to_base64(image_path, max_size=400):
-    """Convert image to base64 for HTML embedding."""
+def _thumb_cache_path(image_path, mtime_ns, max_size):
+    """Cache file for one encoded thumbnail (a changed mtime gives a new key)."""
+    key_source = f"{os.path.abspath(image_path)}|{mtime_ns}|{max_size}|{THUMB_CACHE_VERSION}"
+    key = hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+    return THUMB_CACHE_DIR / key[:2] / key
+
+def _write_thumb_cache(cache_path, data):
+    """Store encoded bytes atomically (pool workers may write concurrently)."""
     try:
-        img = Image.open(image_path)
-        
-        # Resize for display
-        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        
-        # Convert to JPEG in memory
-        buffer = io.BytesIO()
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        img.save(buffer, format='JPEG', quality=85)
-        img_data = buffer.getvalue()
-        
-        # Encode to base64
-        return base64.b64encode(img_data).decode('utf-8')
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Cache is best-effort
+
+def content_fingerprint(image_path):
+    """Cheap identity for byte-identical copies: size plus a hash of the first and last 64 KB.
+
+    Returns:
+        ((size, digest), None), or (None, error message) if the file can't be read
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            digest = hashlib.blake2b(f.read(FINGERPRINT_BYTES), digest_size=16)
+            if size > FINGERPRINT_BYTES:
+                f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+                digest.update(f.read())
+        return (size, digest.digest()), None
+    except OSError as e:
+        return None, repr(e)
+
+def _encode(img, buffer, **save_args):
+    """Encode img into a reused buffer and return the bytes."""
+    buffer.seek(0)
+    buffer.truncate()
+    img.save(buffer, **save_args)
+    return buffer.getvalue()
+
+def _flatten_to_rgb(img):
+    """Composite transparent images onto white (plain convert turns them black)."""
+    if img.mode in ('RGBA', 'LA'):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, rgba).convert('RGB')
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+def preview_mime_type(data):
+    """MIME type of bytes returned by image_to_preview (WebP or JPEG)."""
+    return 'image/webp' if data[:4] == b'RIFF' and data[8:12] == b'WEBP' else 'image/jpeg'
+
+def image_to_preview(image_path, max_size=400):
+    """Downscale an image for display and return it as WebP or JPEG bytes.
+
+    Encoded thumbnails are cached under THUMB_CACHE_DIR, so repeat runs skip
+    the decode/resize/encode of unchanged images.
+
+    Returns:
+        (image_bytes, None) on success, (None, error message) if the image
+        couldn't be loaded; errors are reported by the caller, not printed here.
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            cache_path = _thumb_cache_path(image_path, os.fstat(f.fileno()).st_mtime_ns, max_size)
+            try:
+                return cache_path.read_bytes(), None
+            except OSError:
+                pass  # Not cached yet
+
+            # The opened image is closed (decoder and pixel buffer released) as
+            # soon as the preview is encoded; derived copies are working images
+            # that die with this call
+            with Image.open(f) as source:
+                # JPEGs that already fit are passed through verbatim (header-only
+                # check; no decode, no lossy re-encode, nothing worth caching)
+                if source.format == 'JPEG' and max(source.size) <= max_size:
+                    f.seek(0)
+                    return f.read(), None
+
+                # JPEG shrink-on-load: libjpeg decodes at 1/2-1/8 scale, still >= max_size
+                source.draft('RGB', (max_size, max_size))
+
+                # Palette images only resize with NEAREST; expand them first
+                # (keeping transparency as alpha)
+                img = source.convert('RGBA') if source.mode == 'P' else source
+
+                # Resize for display (Pillow premultiplies alpha while resampling)
+                img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+                # Apply EXIF orientation (re-encoding drops the tag); cheap now
+                # that the image is already preview-sized
+                img = ImageOps.exif_transpose(img)
+
+                # Encode in memory (reusing the process's buffers), keeping the smaller.
+                # No exif/icc_profile is passed, so no metadata is carried over
+                rgb = _flatten_to_rgb(img)
+                data = _encode(rgb, _JPEG_BUFFER, format='JPEG', quality=85,
+                               optimize=True, progressive=True, subsampling=2)
+                if WEBP_SUPPORTED:
+                    webp = _encode(rgb, _WEBP_BUFFER, format='WEBP', quality=80, method=4)
+                    if len(webp) < len(data):
+                        data = webp
+        _write_thumb_cache(cache_path, data)
+        return data, None
+    except Image.DecompressionBombError as e:
+        return None, f"Skipped oversized image: {e}"
     except Exception as e:
-        print(f"Error loading {image_path}: {e}")
-        return None
+        return None, repr(e)
 
-def generate_html(groups, max_images_per_group=10):
-    """Generate HTML page to view duplicates."""
-    
-    html = """<!DOCTYPE html>
+HTML_HEADER = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -231,76 +369,307 @@ def generate_html(groups, max_images_per_group=10):
             Click images to see full size in new tab
         </div>
 """
-    
+
+HTML_FOOTER = """
+    </div>
+</body>
+</html>
+"""
+
+# Groups rendered per page by the in-browser pager
+GROUPS_PER_PAGE = 5
+
+# Renders groups from the #groups-data JSON a page at a time, appending the next
+# page when the sentinel below the last group scrolls into view
+PAGER_SCRIPT = """
+        <div id="groups"></div>
+        <div id="sentinel" style="height: 1px;"></div>
+        <script>
+        (function () {
+            const data = JSON.parse(document.getElementById('groups-data').textContent);
+            const container = document.getElementById('groups');
+            const sentinel = document.getElementById('sentinel');
+            let next = 0;
+
+            function el(tag, className, text) {
+                const node = document.createElement(tag);
+                if (className) node.className = className;
+                if (text !== undefined) node.textContent = text;
+                return node;
+            }
+
+            function fileUrl(path) {
+                return 'file://' + path.split('/').map(encodeURIComponent).join('/');
+            }
+
+            function renderGroup(group, number) {
+                const box = el('div', 'duplicate-group');
+                const header = el('div', 'group-header');
+                header.append(el('div', 'group-title', 'Duplicate Group #' + number),
+                              el('div', 'group-count', group.count + ' copies'));
+                const hash = el('div');
+                hash.style.marginBottom = '15px';
+                hash.append(el('span', 'hash-code', 'Hash: ' + group.hash));
+                const grid = el('div', 'images-grid');
+                for (const image of group.images) {
+                    const card = el('div', 'image-card');
+                    const link = el('a');
+                    link.href = fileUrl(image.path);
+                    link.target = '_blank';
+                    const img = el('img');
+                    img.loading = 'lazy';
+                    img.decoding = 'async';
+                    img.src = link.href;
+                    img.alt = image.name;
+                    if (image.width && image.height) {
+                        img.width = image.width;
+                        img.height = image.height;
+                    }
+                    link.append(img);
+                    const info = el('div', 'image-info');
+                    info.append(el('div', 'image-name', image.name),
+                                el('div', 'image-dimensions', image.width + '\u00d7' + image.height),
+                                el('div', 'image-path', image.path));
+                    card.append(link, info);
+                    grid.append(card);
+                }
+                if (group.count > group.images.length) {
+                    const more = el('div', null, '... and ' + (group.count - group.images.length) + ' more copies');
+                    more.style.cssText = 'grid-column: 1/-1; text-align: center; padding: 20px; color: #666;';
+                    grid.append(more);
+                }
+                box.append(header, hash, grid);
+                return box;
+            }
+
+            function renderPage() {
+                const end = Math.min(next + data.perPage, data.groups.length);
+                for (; next < end; next++) container.append(renderGroup(data.groups[next], next + 1));
+                if (next >= data.groups.length) observer.disconnect();
+            }
+
+            const observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) renderPage();
+            }, { rootMargin: '800px' });
+            observer.observe(sentinel);
+        })();
+        </script>
+"""
+
+def _write_groups_json(groups, fp, max_images_per_group):
+    """Write the groups (paths, not pixels) as a JSON data block for the pager."""
+    data = {
+        'perPage': GROUPS_PER_PAGE,
+        'groups': [
+            {
+                'hash': group['hash'],
+                'count': group['count'],
+                'images': [
+                    {'path': path, 'name': name, 'width': width, 'height': height}
+                    for path, name, width, height in group['images'][:max_images_per_group]
+                ],
+            }
+            for group in groups
+        ],
+    }
+    # "</" can't appear inside a <script> element
+    payload = json.dumps(data, ensure_ascii=False).replace('</', '<\\/')
+    fp.write(f"""
+        <script id="groups-data" type="application/json">{payload}</script>
+""")
+    fp.write(PAGER_SCRIPT)
+
+def write_html(groups, fp, max_images_per_group=10, workers=None, embed=False):
+    """Write the duplicates HTML page to an open text file, one image at a time.
+
+    By default the page carries the groups as a JSON block and a small script
+    renders GROUPS_PER_PAGE groups at a time as the reader scrolls; images are
+    referenced by file:// URL with loading="lazy", so first paint doesn't depend
+    on the number of groups and only on-screen images are decoded.
+    With embed=True the page is self-contained: images are decoded, resized and
+    re-encoded in a process pool (one file per task, no shared state) and
+    inlined as base64, written in page order as results arrive. Byte-identical
+    copies within a group (same content_fingerprint) are encoded once.
+    """
+    fp.write(HTML_HEADER)
+
     print(f"Generating HTML for {len(groups)} duplicate groups...")
-    
-    for idx, group in enumerate(groups, 1):
-        print(f"Processing group {idx}/{len(groups)}: {group['count']} images...")
-        
-        html += f"""
+
+    if not embed:
+        _write_groups_json(groups, fp, max_images_per_group)
+    else:
+        page = [(idx, img[0]) for idx, group in enumerate(groups)
+                for img in group['images'][:max_images_per_group]]
+        paths = [path for _, path in page]
+        errors = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Key each image by (group, content). This pass also opens every
+            # file once, so missing/unreadable ones (key None) are reported here
+            # and never reach the encoder
+            keys = []
+            unique_paths = []
+            seen = set()
+            fingerprints = executor.map(content_fingerprint, paths, chunksize=16)
+            for (idx, path), (fingerprint, error) in zip(page, fingerprints):
+                if fingerprint is None:
+                    errors.append((path, error))
+                    keys.append(None)
+                    continue
+                key = (idx, fingerprint)
+                keys.append(key)
+                if key not in seen:
+                    seen.add(key)
+                    unique_paths.append(path)
+
+            # One progress bar over all encoded images instead of a line per
+            # group; closed before the collected errors are printed
+            with tqdm(total=len(unique_paths), desc="Encoding images", unit="img") as progress:
+                results = executor.map(partial(image_to_preview, max_size=400), unique_paths, chunksize=4)
+                unique_previews = _collect_errors(results, unique_paths, errors, progress)
+                previews = _reuse_duplicates(keys, unique_previews)
+                _write_groups(groups, fp, previews, max_images_per_group)
+
+        for path, error in errors:
+            print(f"Error loading {path}: {error}")
+
+    fp.write(HTML_FOOTER)
+
+def _collect_errors(results, paths, errors, progress):
+    """Yield encoded images in order, appending (path, error) for failures to errors.
+
+    progress (a tqdm bar) is advanced as each result arrives rather than when the
+    next one is requested, so it reaches its total on the last image.
+    """
+    for path, (preview, error) in zip(paths, results):
+        progress.update()
+        if error is not None:
+            errors.append((path, error))
+        yield preview
+
+def _reuse_duplicates(keys, unique_previews):
+    """Expand previews of unique images back to page order, repeating shared ones.
+
+    A None key (unreadable file) yields None. Only the current group's previews
+    are kept, since keys never repeat across groups.
+    """
+    encoded = {}
+    group = None
+    for key in keys:
+        if key is None:
+            yield None
+            continue
+        if key[0] != group:
+            encoded.clear()
+            group = key[0]
+        if key not in encoded:
+            encoded[key] = next(unique_previews)
+        yield encoded[key]
+
+def _file_url(path):
+    """file:// URL for a local path (percent-encoded, safe inside an attribute)."""
+    return html.escape(f"file://{urllib.parse.quote(path, safe='/:')}")
+
+# Markup for the --embed page, filled with str.format_map and written straight
+# to the output file. Values are HTML-escaped before formatting; the base64
+# image data is written between _IMG_CARD_OPEN and _IMG_CARD_CLOSE.
+_GROUP_OPEN = """
         <div class="duplicate-group">
             <div class="group-header">
-                <div class="group-title">Duplicate Group #{idx}</div>
-                <div class="group-count">{group['count']} copies</div>
+                <div class="group-title">Duplicate Group #{number}</div>
+                <div class="group-count">{count} copies</div>
             </div>
             <div style="margin-bottom: 15px;">
-                <span class="hash-code">Hash: {group['hash']}</span>
+                <span class="hash-code">Hash: {hash}</span>
             </div>
             <div class="images-grid">
 """
-        
-        # Show up to max_images_per_group images
-        for img_path, img_name, width, height in group['images'][:max_images_per_group]:
-            # Try to load and encode image
-            img_data = image_to_base64(img_path, max_size=400)
-            
-            if img_data:
-                html += f"""
+
+_IMG_CARD_OPEN = """
                 <div class="image-card">
-                    <a href="file://{img_path}" target="_blank">
-                        <img src="data:image/jpeg;base64,{img_data}" alt="{img_name}">
+                    <a href="{url}" target="_blank">
+                        <img src="data:{mime};base64,"""
+
+_IMG_CARD_CLOSE = """" alt="{name}">
                     </a>
                     <div class="image-info">
-                        <div class="image-name">{img_name}</div>
+                        <div class="image-name">{name}</div>
                         <div class="image-dimensions">{width}×{height}</div>
-                        <div class="image-path">{img_path}</div>
+                        <div class="image-path">{path}</div>
                     </div>
                 </div>
 """
-            else:
-                html += f"""
+
+_IMG_CARD_NOIMG = """
                 <div class="image-card">
                     <div style="padding: 20px; text-align: center; color: #999;">
                         <p>⚠️ Could not load image</p>
                         <div class="image-info">
-                            <div class="image-name">{img_name}</div>
-                            <div class="image-path">{img_path}</div>
+                            <div class="image-name">{name}</div>
+                            <div class="image-path">{path}</div>
                         </div>
                     </div>
                 </div>
 """
-        
-        if group['count'] > max_images_per_group:
-            html += f"""
+
+_MORE_COPIES = """
                 <div style="grid-column: 1/-1; text-align: center; padding: 20px; color: #666;">
-                    ... and {group['count'] - max_images_per_group} more copies
+                    ... and {more} more copies
                 </div>
 """
-        
-        html += """
+
+_GROUP_CLOSE = """
             </div>
         </div>
 """
-    
-    html += """
-    </div>
-</body>
-</html>
-"""
-    
-    return html
+
+def _write_groups(groups, fp, previews, max_images_per_group):
+    """Write each group's cards, taking encoded images from previews in page order."""
+    for idx, group in enumerate(groups, 1):
+        fp.write(_GROUP_OPEN.format_map({
+            'number': idx,
+            'count': group['count'],
+            'hash': html.escape(group['hash']),
+        }))
+
+        # Show up to max_images_per_group images
+        for img_path, img_name, width, height in group['images'][:max_images_per_group]:
+            # Encoded by the worker pool (None if the image couldn't be loaded)
+            preview = next(previews)
+            card = {
+                'name': html.escape(img_name),
+                'path': html.escape(img_path),
+                'width': width,
+                'height': height,
+            }
+
+            if preview:
+                fp.write(_IMG_CARD_OPEN.format_map({
+                    'url': _file_url(img_path),
+                    'mime': preview_mime_type(preview),
+                }))
+                # Base64 is ASCII: write the encoded bytes to the underlying binary
+                # stream (after flushing pending text) instead of decoding to str
+                encoded = base64.b64encode(preview)
+                if hasattr(fp, 'buffer'):
+                    fp.flush()
+                    fp.buffer.write(encoded)
+                else:
+                    fp.write(encoded.decode('ascii'))
+                fp.write(_IMG_CARD_CLOSE.format_map(card))
+            else:
+                fp.write(_IMG_CARD_NOIMG.format_map(card))
+
+        if group['count'] > max_images_per_group:
+            fp.write(_MORE_COPIES.format_map({'more': group['count'] - max_images_per_group}))
+
+        fp.write(_GROUP_CLOSE)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--embed', action='store_true',
+                        help='Inline resized images as base64 (self-contained but much larger file)')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("  🔍 DUPLICATE IMAGES VIEWER GENERATOR")
     print("=" * 60)
@@ -311,14 +680,13 @@ if __name__ == "__main__":
     print(f"   Found {len(groups)} duplicate groups")
     print("")
     
-    print("2. Generating HTML with embedded images...")
-    print("   (This may take a few minutes...)")
-    html = generate_html(groups, max_images_per_group=10)
-    print("")
-    
-    print("3. Saving to file...")
+    if args.embed:
+        print("2. Writing HTML with embedded images...")
+        print("   (This may take a few minutes...)")
+    else:
+        print("2. Writing HTML with linked images...")
     with open(OUTPUT_HTML, 'w', encoding='utf-8') as f:
-        f.write(html)
+        write_html(groups, f, max_images_per_group=10, embed=args.embed)
     print(f"   ✓ Saved to: {OUTPUT_HTML}")
     print("")
     
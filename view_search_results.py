@@ -4,16 +4,36 @@ Open search results visually - creates HTML viewer with images.
 """
 
 import requests
+import html
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import urllib.parse
 
 BASE_URL = "http://localhost:8000"
 
+# One pooled keep-alive session for all requests to the local server
+SESSION = requests.Session()
+SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
+# Concurrent search requests (the server overlaps their encode/search work)
+SEARCH_WORKERS = 8
+
+def fetch_results(query):
+    """Run one text search; returns the response, or the exception if the request failed."""
+    try:
+        return SESSION.get(
+            f"{BASE_URL}/search/text",
+            params={"q": query, "top_k": 10},
+            timeout=30
+        )
+    except Exception as e:
+        return e
+
 def create_html_viewer(queries):
     """Create HTML page showing search results."""
     
-    html = """<!DOCTYPE html>
+    page = """<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -112,31 +132,41 @@ def create_html_viewer(queries):
             padding: 40px;
         }
     </style>
+    <script>
+        // Replace an image that failed to load with a placeholder naming the file
+        function imageMissing(img) {
+            const note = document.createElement('div');
+            note.className = 'no-image';
+            note.append('Image not accessible', document.createElement('br'), 'Path: ' + img.alt);
+            img.replaceWith(note);
+        }
+    </script>
 </head>
 <body>
     <div class="header">
         <h1>🔍 Search Results Viewer</h1>
-        <p>Visual results for queries: """ + ", ".join(f'"{q}"' for q in queries) + """</p>
+        <p>Visual results for queries: """ + ", ".join(html.escape(f'"{q}"') for q in queries) + """</p>
     </div>
 """
     
-    for query in queries:
+    # Fetch all queries concurrently over the pooled session; map keeps query order
+    with ThreadPoolExecutor(max_workers=max(1, min(SEARCH_WORKERS, len(queries)))) as executor:
+        responses = list(executor.map(fetch_results, queries))
+
+    for query, response in zip(queries, responses):
         try:
-            response = requests.get(
-                f"{BASE_URL}/search/text",
-                params={"q": query, "top_k": 10},
-                timeout=30
-            )
-            
+            if isinstance(response, Exception):
+                raise response
+
             if response.status_code != 200:
                 continue
             
             data = response.json()
             results = data.get("results", [])
             
-            html += f"""
+            page += f"""
     <div class="query-section">
-        <div class="query-title">Query: "{query}" ({len(results)} results)</div>
+        <div class="query-title">Query: &quot;{html.escape(query)}&quot; ({len(results)} results)</div>
         <div class="results-grid">
 """
             
@@ -147,56 +177,56 @@ def create_html_viewer(queries):
                 score_percent = score * 100
                 
                 # Use file:// URL for local images
-                file_url = f"file://{urllib.parse.quote(file_path, safe='')}"
+                file_url = html.escape(f"file://{urllib.parse.quote(file_path, safe='/:')}")
                 
                 # Get folder name
                 folder = Path(file_path).parent.name if file_path else ""
                 
-                html += f"""
+                page += f"""
             <div class="result-card">
                 <div class="image-container">
-                    <img src="{file_url}" 
-                         alt="{file_name}" 
+                    <img src="{file_url}"
+                         alt="{html.escape(file_name)}"
                          class="result-image"
-                         onclick="window.open('{file_url}', '_blank')"
-                         onerror="this.style.display='none'; this.parentElement.innerHTML='<div class=\\"no-image\\">Image not accessible<br/>Path: {file_name}</div>'">
+                         onclick="window.open(this.src, '_blank')"
+                         onerror="imageMissing(this)">
                 </div>
                 <div class="result-info">
                     <div class="score">{score_percent:.2f}% Match</div>
-                    <div class="file-name">{file_name}</div>
-                    <div class="file-path">{folder}</div>
+                    <div class="file-name">{html.escape(file_name)}</div>
+                    <div class="file-path">{html.escape(folder)}</div>
                 </div>
             </div>
 """
             
-            html += """
+            page += """
         </div>
     </div>
 """
             
         except Exception as e:
-            html += f"""
+            page += f"""
     <div class="query-section">
-        <div class="query-title">Query: "{query}"</div>
-        <p style="color: red;">Error: {e}</p>
+        <div class="query-title">Query: &quot;{html.escape(query)}&quot;</div>
+        <p style="color: red;">Error: {html.escape(str(e))}</p>
     </div>
 """
     
-    html += """
+    page += """
 </body>
 </html>
 """
     
-    return html
+    return page
 
 if __name__ == "__main__":
     queries = ["protest", "crowd", "signs", "men"]
     
     print("Creating HTML viewer with search results...")
-    html = create_html_viewer(queries)
+    page = create_html_viewer(queries)
     
     output_path = Path("/Users/aviz/images-finder/search_results.html")
-    output_path.write_text(html, encoding='utf-8')
+    output_path.write_text(page, encoding='utf-8')
     
     print(f"✅ Created: {output_path}")
     print("Opening in browser...")